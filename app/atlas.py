@@ -0,0 +1,143 @@
+import mmap
+import os
+import struct
+import threading
+from array import array
+from pathlib import Path
+
+from app.calc import (
+    RULES_VERSION,
+    WIDTH_MAX_M,
+    layout_geometry,
+    rows_for_width,
+    stalls_for_counts,
+    stalls_per_row_for_length,
+)
+
+
+# =========================
+# 场地容量图谱：长 × 宽（0~500m，0.5m 步长）预计算排数/车位/布局桩数
+# =========================
+# 布置口径的分段点（车位宽 4m 的整数倍、宽度分段的整数边界）都落在 0.5m 网格上，
+# 因此任意实数长宽向下取到网格点后，查表结果与 layout_geometry 完全一致。
+# 文件按口径版本命名（atlas_<RULES_VERSION>.bin），口径变化后自动重建；查表为 mmap 上的 O(1) 下标访问。
+ATLAS_STEP_M = 0.5
+ATLAS_MAX_M = WIDTH_MAX_M
+ATLAS_MAGIC = b"TSATLAS1"
+_HEADER = struct.Struct("<8s12sdII")
+_HEADER_SIZE = 64
+
+
+class CapacityAtlas:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.path = self.directory / f"atlas_{RULES_VERSION}.bin"
+        self.n = int(round(ATLAS_MAX_M / ATLAS_STEP_M)) + 1
+        self._lock = threading.Lock()
+        self._mm = None
+
+    # ---------- 构建 ----------
+    def build(self):
+        """
+        长度只决定每排车位数、宽度只决定排数，二者组合后才需要 stalls_for_counts：
+        按 (每排车位数, 排数) 去重计算，再按长度逐行拼出二维表，构建为毫秒级。
+        """
+        n = self.n
+        raw_by_length = array("H", (stalls_per_row_for_length(i * ATLAS_STEP_M) for i in range(n)))
+        rows_by_width = array("B", (rows_for_width(j * ATLAS_STEP_M)[0] for j in range(n)))
+
+        stalls_rows = {}
+        n_layout_rows = {}
+        for raw in set(raw_by_length):
+            counts = {rows: stalls_for_counts(raw, rows) for rows in set(rows_by_width)}
+            stalls_rows[raw] = array("H", (counts[r]["stalls_total"] for r in rows_by_width)).tobytes()
+            n_layout_rows[raw] = array("H", (counts[r]["n_layout"] for r in rows_by_width)).tobytes()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(ATLAS_MAGIC, RULES_VERSION.encode("ascii"), ATLAS_STEP_M, n, n).ljust(_HEADER_SIZE, b"\0"))
+            f.write(b"".join(stalls_rows[raw] for raw in raw_by_length))
+            f.write(b"".join(n_layout_rows[raw] for raw in raw_by_length))
+            f.write(raw_by_length.tobytes())
+            f.write(rows_by_width.tobytes())
+        os.replace(tmp, self.path)
+
+        # 旧口径版本的图谱不再使用
+        for old in self.directory.glob("atlas_*.bin"):
+            if old != self.path:
+                old.unlink(missing_ok=True)
+
+    def _valid(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                magic, version, step, n_len, n_wid = _HEADER.unpack(f.read(_HEADER.size))
+        except (OSError, struct.error):
+            return False
+        return (
+            magic == ATLAS_MAGIC and version.decode("ascii") == RULES_VERSION
+            and step == ATLAS_STEP_M and n_len == self.n and n_wid == self.n
+        )
+
+    def _open(self):
+        if self._mm is not None:
+            return
+        with self._lock:
+            if self._mm is not None:
+                return
+            if not self._valid():
+                self.build()
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            cells = self.n * self.n
+            view = memoryview(mm)
+            off = _HEADER_SIZE
+            self._stalls = view[off:off + cells * 2].cast("H")
+            off += cells * 2
+            self._n_layout = view[off:off + cells * 2].cast("H")
+            off += cells * 2
+            self._raw = view[off:off + self.n * 2].cast("H")
+            off += self.n * 2
+            self._rows = view[off:off + self.n]
+            self._mm = mm
+
+    # ---------- 查询 ----------
+    def index(self, value: float) -> int:
+        return int(value / ATLAS_STEP_M)
+
+    def in_range(self, length: float, width: float) -> bool:
+        return 0 <= length <= ATLAS_MAX_M and 0 <= width <= ATLAS_MAX_M
+
+    def n_layout_at(self, i: int, j: int) -> int:
+        """按网格下标取布局桩数（调用方保证下标在范围内）"""
+        self._open()
+        return self._n_layout[i * self.n + j]
+
+    def lookup(self, length: float, width: float) -> dict:
+        """O(1) 查容量；超出 0~500m 时回退到按口径直接计算"""
+        if not self.in_range(length, width):
+            geo = layout_geometry(length, width)
+            return {
+                "site_length_m": length,
+                "site_width_m": width,
+                "stalls_per_row_raw": geo["stalls_per_row_raw"],
+                "row_count": geo["row_count"],
+                "stalls_total": geo["stalls_total"],
+                "n_layout": geo["n_layout"],
+                "rules_version": RULES_VERSION,
+                "source": "rules",
+            }
+        self._open()
+        i = self.index(length)
+        j = self.index(width)
+        k = i * self.n + j
+        return {
+            "site_length_m": length,
+            "site_width_m": width,
+            "stalls_per_row_raw": self._raw[i],
+            "row_count": self._rows[j],
+            "stalls_total": self._stalls[k],
+            "n_layout": self._n_layout[k],
+            "rules_version": RULES_VERSION,
+            "source": "atlas",
+        }
@@ -1,4 +1,9 @@
+import hashlib
 import math
+from functools import lru_cache
+
+from app.profiling import profiled
+from app.tariff import TARIFF_REGIONS, peak_load_share, tariff_economics
 
 def _f(x, default=0.0):
     """安全取 float（None/缺失/NaN 都兜住）"""
@@ -18,11 +23,205 @@ def _i(x, default=0):
     except Exception:
         return int(default)
 
+# =========================
+# 口径（你定义的工程经验）
+# =========================
+STALL_WIDTH_M = 4.0                  # 单车位宽（重卡车宽口径）
+REQ_LEN_MIN_M = STALL_WIDTH_M * 2    # 长度<12：不具备建站（按2个车位宽）
+REQ_WIDTH_MIN_M = 30.0               # 宽度<30：转弯半径不足，不具备建站
+TX_SLOTS_PER_ROW = 2                 # 每排变压器占用车位格数（可改为4/5...）
+TX_SLOTS_SINGLE_ROW = 2              # 单排：中间固定 2 个车位给变压器
+
+# 电力口径（新）
+PILE_KVA_RULE = 200.0                # 仍保留：仅用于“旧字段 transformer_required_kva”的兼容（见输出）
+PILE_KVA_PER_KW = 1.0                # 电力容量=桩数×单桩功率×1.0（400kW 桩配 400kVA）
+GRID_POWER_FACTOR = 0.95             # 电网接入容量 kVA → 可用有功 kW
+
+# 宽度分段口径（延伸到 500m；>500 提示人工评估）
+# 规则：从 30m 开始，区间宽度按 +15 / +30 交替增长，对应排数逐段 +1
+WIDTH_MAX_M = 500.0
+WIDTH_BANDS = [
+    (30, 45, 1),
+    (45, 75, 2),
+    (75, 90, 3),
+    (90, 120, 4),
+    (120, 135, 5),
+    (135, 165, 6),
+    (165, 180, 7),
+    (180, 210, 8),
+    (210, 225, 9),
+    (225, 255, 10),
+    (255, 270, 11),
+    (270, 300, 12),
+    (300, 315, 13),
+    (315, 345, 14),
+    (345, 360, 15),
+    (360, 390, 16),
+    (390, 405, 17),
+    (405, 435, 18),
+    (435, 450, 19),
+    (450, 480, 20),
+    (480, 495, 21),
+    (495, 500, 22),  # 到 500m 为止（含 500）
+]
+
+# 布局口径版本：由上述常量生成，口径一改即变（预计算的容量图谱、缓存等据此失效）
+RULES_VERSION = hashlib.sha256(repr((
+    STALL_WIDTH_M, REQ_LEN_MIN_M, REQ_WIDTH_MIN_M, TX_SLOTS_PER_ROW, TX_SLOTS_SINGLE_ROW,
+    PILE_KVA_PER_KW, WIDTH_MAX_M, WIDTH_BANDS,
+)).encode("utf-8")).hexdigest()[:12]
+
+
+def stalls_per_row_for_length(length: float) -> int:
+    """长度决定：每排可布置车位数 = floor(长度/STALL_WIDTH_M)"""
+    return int(length // STALL_WIDTH_M) if length >= REQ_LEN_MIN_M else 0
+
+
+def rows_for_width(w: float):
+    """宽度决定：可布置几排（分段表查表）。返回 (rows, note)；w>500 返回(0,人工评估提示)"""
+    if w < REQ_WIDTH_MIN_M:
+        return 0, f"场地宽度{w:.1f}m<{REQ_WIDTH_MIN_M:.0f}m：转弯半径不足，不具备建站条件。"
+    if w > WIDTH_MAX_M:
+        return 0, f"场地宽度{w:.1f}m>500m：超出当前口径范围，请人工评估。"
+    for a, b, rows in WIDTH_BANDS:
+        if (w >= a and w < b) or (b == WIDTH_MAX_M and w == WIDTH_MAX_M):
+            return rows, f"{a}m≤宽度{w:.1f}m<{b}m：可布置{rows}排车位。"
+    return 0, f"场地宽度{w:.1f}m：未命中宽度分段口径，请人工评估。"
+
+
+def stalls_for_counts(stalls_per_row_raw: int, row_count: int) -> dict:
+    """
+    由“每排原始车位数 × 排数”得到车位与桩数（只依赖这两个整数，长宽经此可分离）。
+    单排按绘图口径：总车位取偶数、中间留变压器、左右两侧均为偶数；多排每排扣除变压器占位。
+    """
+    stalls_per_row_draw = stalls_per_row_raw
+    stalls_left = 0
+    stalls_right = 0
+    notes = []
+
+    if row_count == 1:
+        s = stalls_per_row_raw
+        if s < 2:
+            stalls_per_row_draw = 0
+            notes.append("单排可用车位数不足2，无法按变压器居中口径布置。")
+        else:
+            # 1) 单排：raw 为奇数则最右边 1 个不画（保证总车位偶数）
+            if s % 2 == 1:
+                old_s = s
+                s -= 1
+                notes.append(f"单排要求车位总数为偶数，已从{old_s}调整为{s}（最右侧1车位不绘制、不布桩）。")
+
+            # 2) 单排：中间固定 2 个车位给变压器
+            remain = s - TX_SLOTS_SINGLE_ROW  # 变压器占2车位后剩余车位
+            left = remain // 2
+            right = remain - left
+
+            # 3) 单排：左右两侧都必须是偶数车位（避免3+3）
+            if left % 2 == 1:
+                left -= 1
+                right += 1
+
+            stalls_left = left
+            stalls_right = right
+            stalls_per_row_draw = s
+            notes.append(f"单排中间预留{TX_SLOTS_SINGLE_ROW}车位放变压器；左右两侧车位需为偶数，已拆分为{left}+{right}。")
+
+    # 车位数量（单排按绘图口径，多排按原口径）
+    if row_count == 1:
+        # 单排：可服务车位 = 左侧 + 右侧（中间变压器车位不计）
+        stalls_total = stalls_left + stalls_right
+    else:
+        # 多排：每排可服务车位 = 原始车位 - 变压器占位
+        usable_per_row = max(0, stalls_per_row_raw - TX_SLOTS_PER_ROW)
+        stalls_total = usable_per_row * row_count
+
+    return {
+        "stalls_per_row_draw": stalls_per_row_draw,
+        "stalls_left": stalls_left,
+        "stalls_right": stalls_right,
+        "stalls_total": stalls_total,
+        # 桩数量（布局口径）：桩 = 车位/2（取整）
+        "n_layout": stalls_total // 2,
+        "notes": notes,
+    }
+
+
+def layout_geometry(site_length: float, site_width: float) -> dict:
+    """场地长宽 → 排数、车位、布局桩数（布置口径的唯一实现，calc_plan 与容量图谱共用）"""
+    stalls_per_row_raw = stalls_per_row_for_length(site_length)
+    row_count, layout_note = rows_for_width(site_width)
+    counts = stalls_for_counts(stalls_per_row_raw, row_count)
+    for note in counts.pop("notes"):
+        layout_note = (layout_note + "；" if layout_note else "") + note
+    return {
+        "stalls_per_row_raw": stalls_per_row_raw,
+        "row_count": row_count,
+        "layout_note": layout_note,
+        **counts,
+    }
+
+
+GEOMETRY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def _site_geometry(site_length: float, site_width: float, rules_version: str) -> dict:
+    geo = layout_geometry(site_length, site_width)
+    notes = []
+    if site_length < REQ_LEN_MIN_M:
+        notes.append(f"场地长度{site_length:.1f}m<{REQ_LEN_MIN_M:.0f}m：场地不足，不具备建站条件。")
+    if site_width < REQ_WIDTH_MIN_M:
+        notes.append(f"场地宽度{site_width:.1f}m<{REQ_WIDTH_MIN_M:.0f}m：转弯半径不足，不具备建站条件。")
+    if geo["layout_note"]:
+        notes.append(geo["layout_note"])
+    notes.append(
+        f"布置口径：每排原始车位数=floor(长度/{STALL_WIDTH_M:.0f})={geo['stalls_per_row_raw']}；绘图每排车位数={geo['stalls_per_row_draw']}；"
+        f"排数={geo['row_count']}；车位={geo['stalls_total']}；桩(布局)=车位/2={geo['n_layout']}。"
+    )
+    geo.update({
+        "site_length_m": site_length,
+        "site_width_m": site_width,
+        "site_area_sqm": site_length * site_width,
+        "notes": tuple(notes),
+    })
+    return geo
+
+
+def site_geometry(site_length: float, site_width: float) -> dict:
+    """
+    几何阶段：长宽 → 排数、车位、布局桩数及布置说明，只依赖长宽与布置口径，
+    按 (长, 宽, RULES_VERSION) 缓存；返回副本，调用方可随意修改。
+    """
+    return dict(_site_geometry(float(site_length), float(site_width), RULES_VERSION))
+
+
+@profiled
 def calc_plan(d: dict) -> dict:
+    """完整测算 = 几何阶段（缓存）+ 经营阶段"""
+    return calc_finance(site_geometry(_f(d.get("site_length_m"), 0), _f(d.get("site_width_m"), 0)), d)
+
+
+def calc_variants(base: dict, variants, with_notes: bool = False) -> list:
+    """
+    同一场地下批量计算经营变体（敏感性扫描、目标求解等只改经营参数的场景）：
+    几何阶段只取一次，每个变体只算经营阶段；变体里带了长宽时按其长宽取几何（同样走缓存）。
+    默认不生成说明文字（notes 为空列表），需要时传 with_notes=True。
+    """
+    geo = site_geometry(_f(base.get("site_length_m"), 0), _f(base.get("site_width_m"), 0))
+    results = []
+    for overrides in variants:
+        data = dict(base)
+        data.update(overrides)
+        g = geo
+        if "site_length_m" in overrides or "site_width_m" in overrides:
+            g = site_geometry(_f(data.get("site_length_m"), 0), _f(data.get("site_width_m"), 0))
+        results.append(calc_finance(g, data, with_notes=with_notes))
+    return results
+
+
+def calc_finance(geo: dict, d: dict, with_notes: bool = True) -> dict:
+    """经营阶段：在给定几何结果（site_geometry）上计算电力约束、投资、收入与回收期"""
     # --- 输入（全部兜底，避免 KeyError） ---
-    site_length = _f(d.get("site_length_m"), 0)
-    site_width  = _f(d.get("site_width_m"), 0)
-
     pile_kva_per = _f(d.get("pile_kva_per"), 400)
     guns_per_pile = _i(d.get("guns_per_pile"), 2)
     kwh_per_gun_per_day = _f(d.get("kwh_per_gun_per_day"), 1000)
@@ -38,134 +237,64 @@ def calc_plan(d: dict) -> dict:
     staff_count = _i(d.get("staff_count"), 0)
     salary_yuan_per_month = _f(d.get("salary_yuan_per_month"), 0)
 
-    # --- 核心约束（按场地布置→车位→桩数→电力） ---
-    site_area = site_length * site_width
-
-    # =========================
-    # 口径（你定义的工程经验）
-    # =========================
-    STALL_WIDTH_M = 4.0                  # 单车位宽（重卡车宽口径）
-    REQ_LEN_MIN_M = STALL_WIDTH_M * 2    # 长度<12：不具备建站（按2个车位宽）
-    REQ_WIDTH_MIN_M = 30.0               # 宽度<30：转弯半径不足，不具备建站
-    TX_SLOTS_PER_ROW = 2                 # 每排变压器占用车位格数（可改为4/5...）
-
-    # 电力口径（新）
-    PILE_KVA_RULE = 200.0                # 仍保留：仅用于“旧字段 transformer_required_kva”的兼容（见输出）
-    PILE_KVA_POWER = 400.0               # 电力容量=桩数*400kVA（你要求）
-
-    # 1) 长度决定：每排可布置车位数 = floor(长度/STALL_WIDTH_M)
-    stalls_per_row_raw = int(site_length // STALL_WIDTH_M) if site_length >= REQ_LEN_MIN_M else 0
-
-    # 2) 宽度决定：可布置几排（数据驱动：分段表 + 查表）
-    row_count = 0
-    layout_note = ""
-
-    # 宽度分段口径（延伸到 500m；>500 提示人工评估）
-    # 规则：从 30m 开始，区间宽度按 +15 / +30 交替增长，对应排数逐段 +1
-    WIDTH_BANDS = [
-        (30, 45, 1),
-        (45, 75, 2),
-        (75, 90, 3),
-        (90, 120, 4),
-        (120, 135, 5),
-        (135, 165, 6),
-        (165, 180, 7),
-        (180, 210, 8),
-        (210, 225, 9),
-        (225, 255, 10),
-        (255, 270, 11),
-        (270, 300, 12),
-        (300, 315, 13),
-        (315, 345, 14),
-        (345, 360, 15),
-        (360, 390, 16),
-        (390, 405, 17),
-        (405, 435, 18),
-        (435, 450, 19),
-        (450, 480, 20),
-        (480, 495, 21),
-        (495, 500, 22),  # 到 500m 为止（含 500）
-    ]
-
-    def _rows_for_width(w: float):
-        """返回 (rows, note)；w>500 返回(0,人工评估提示)"""
-        if w < REQ_WIDTH_MIN_M:
-            return 0, f"场地宽度{w:.1f}m<{REQ_WIDTH_MIN_M:.0f}m：转弯半径不足，不具备建站条件。"
-        if w > 500:
-            return 0, f"场地宽度{w:.1f}m>500m：超出当前口径范围，请人工评估。"
-        for a, b, rows in WIDTH_BANDS:
-            if (w >= a and w < b) or (b == 500 and w == 500):
-                return rows, f"{a}m≤宽度{w:.1f}m<{b}m：可布置{rows}排车位。"
-        return 0, f"场地宽度{w:.1f}m：未命中宽度分段口径，请人工评估。"
-
-    row_count, layout_note = _rows_for_width(site_width)
-
-    # 3) 单排绘图口径修正：变压器左右两侧车位数都要求为偶数
-    stalls_per_row_draw = stalls_per_row_raw
-    stalls_left = 0
-    stalls_right = 0
-
-    if row_count == 1:
-        s = stalls_per_row_raw
-        if s < 2:
-            stalls_per_row_draw = 0
-            layout_note = (layout_note + "；" if layout_note else "") + "单排可用车位数不足2，无法按变压器居中口径布置。"
-        else:
-                # 1) 单排：raw 为奇数则最右边 1 个不画（保证总车位偶数）
-                if s % 2 == 1:
-                    old_s = s
-                    s -= 1
-                    layout_note = (
-                        layout_note + "；" if layout_note else ""
-                    ) + f"单排要求车位总数为偶数，已从{old_s}调整为{s}（最右侧1车位不绘制、不布桩）。"
-
-                # 2) 单排：中间固定 2 个车位给变压器
-                TX_SLOTS = 2
-                if s < TX_SLOTS:
-                    stalls_per_row_draw = 0
-                    stalls_left = 0
-                    stalls_right = 0
-                    layout_note = (layout_note + "；" if layout_note else "") + "单排车位数不足2，无法布置中置变压器。"
-                else:
-                    remain = s - TX_SLOTS  # 变压器占2车位后剩余车位
-                    left = remain // 2
-                    right = remain - left
-
-                    # 3) 单排：左右两侧都必须是偶数车位（避免3+3）
-                    if left % 2 == 1:
-                        left -= 1
-                        right += 1
-
-                    stalls_left = left
-                    stalls_right = right
-                    stalls_per_row_draw = s
-                    layout_note = (
-                        layout_note + "；" if layout_note else ""
-                    ) + f"单排中间预留{TX_SLOTS}车位放变压器；左右两侧车位需为偶数，已拆分为{left}+{right}。"
-
-
-    # 4) 车位数量（单排按绘图口径，多排按原口径）
-    if row_count == 1:
-        # 单排：可服务车位 = 左侧 + 右侧（中间 TX_SLOTS_PER_ROW 车位给变压器）
-        stalls_total = stalls_left + stalls_right
-    else:
-        # 多排：每排可服务车位 = 原始车位 - 变压器占位
-        usable_per_row = max(0, stalls_per_row_raw - TX_SLOTS_PER_ROW)
-        stalls_total = usable_per_row * row_count
-
-    # 5) 桩数量（布局口径）：桩 = 车位/2（取整）
-    n_layout = stalls_total // 2
+    # 分时电价（可选）：填了地区才计入电费收入与购电成本
+    tariff_region = str(d.get("tariff_region") or "").strip()
+    electricity_sell = d.get("electricity_sell_yuan_per_kwh")
+    electricity_sell = None if electricity_sell is None else _f(electricity_sell, 0)
+    charging_efficiency = _f(d.get("charging_efficiency"), 0.95)
+
+    # 电网接入上限与储能（可选）：不填接入容量=不限电力
+    grid_cap_kva = _f(d.get("grid_cap_kva"), 0)
+    storage_kw = _f(d.get("storage_kw"), 0)
+    storage_kwh = _f(d.get("storage_kwh"), 0)
+    storage_cost_kw = _f(d.get("storage_cost_yuan_per_kw"), 300)
+    storage_cost_kwh = _f(d.get("storage_cost_yuan_per_kwh"), 900)
+    n_power_max = d.get("n_power_max")
+
+    # 设备选型（可选，见 app/equipment.py）：指定桩数上限、变压器配置容量与价格
+    pile_count = d.get("pile_count")
+    transformer_kva = _f(d.get("transformer_kva"), 0)
+    transformer_cost = _f(d.get("transformer_cost_yuan"), 0)
+    storage_saving_year = _f(d.get("storage_saving_year_yuan"), 0)
 
-    # 5) 电力约束：现在“变压器容量不再输入”，先不做上限约束（无限大）
-    #    如果未来你要引入“电网接入上限/客户可获批容量”，再把 n_power 改为 floor(可获批kVA/400)。
+    # --- 核心约束（按场地布置→车位→桩数→电力） ---
+    site_area = geo["site_area_sqm"]
+
+    stalls_per_row_raw = geo["stalls_per_row_raw"]
+    stalls_per_row_draw = geo["stalls_per_row_draw"]
+    row_count = geo["row_count"]
+    layout_note = geo["layout_note"]
+    stalls_left = geo["stalls_left"]
+    stalls_right = geo["stalls_right"]
+    stalls_total = geo["stalls_total"]
+    n_layout = geo["n_layout"]
+
+    # 5) 电力约束：未填电网接入容量 → 不做上限约束（无限大）
+    #    填了接入容量：峰值小时平均负荷（单桩年电量 × 峰值小时占比 / 充电效率）不超过 接入有功 + 储能功率；
+    #    储能优化（app/storage.py）经逐时调度校验后直接给出 n_power_max。
     n_power = 10**10
+    peak_kw_per_pile = 0.0
+    if grid_cap_kva > 0:
+        eff = charging_efficiency if charging_efficiency > 0 else 1.0
+        pile_energy_year = guns_per_pile * kwh_per_gun_per_day * days_per_year
+        peak_kw_per_pile = pile_energy_year * peak_load_share(d.get("hourly_load_kwh")) / eff
+        if n_power_max is not None:
+            n_power = max(0, _i(n_power_max, 0))
+        elif peak_kw_per_pile > 0:
+            n_power = int((grid_cap_kva * GRID_POWER_FACTOR + storage_kw) // peak_kw_per_pile)
 
    
     # 6) 推荐桩数：二者取最小
     n_recommend = max(0, min(n_layout, n_power))
+    if pile_count is not None:
+        n_recommend = max(0, min(n_recommend, _i(pile_count, 0)))
 
-    # 7) 电力容量（kVA）：按你新口径 = 桩数 * 400kVA
-    power_capacity_kva = n_recommend * PILE_KVA_POWER
+    # 7) 电力容量（kVA）：桩数 × 单桩功率（kVA/kW=1.0）；选定变压器时按变压器配置容量
+    power_capacity_kva = n_recommend * pile_kva_per * PILE_KVA_PER_KW
+    if transformer_kva > 0 and n_recommend > 0:
+        power_capacity_kva = transformer_kva
+    if grid_cap_kva > 0:
+        power_capacity_kva = min(power_capacity_kva, grid_cap_kva)
 
     
     # --- CAPEX（你要求：桩=0 → 投资=0） ---
@@ -173,12 +302,14 @@ def calc_plan(d: dict) -> dict:
         invest_power = 0.0
         invest_civil = 0.0
         invest_pile = 0.0
+        invest_storage = 0.0
         invest_total = 0.0
     else:
-        invest_power = power_cost * power_capacity_kva
+        invest_power = power_cost * power_capacity_kva + transformer_cost
         invest_civil = civil_cost * site_area
         invest_pile = pile_cost * n_recommend
-        invest_total = invest_power + invest_civil + invest_pile
+        invest_storage = storage_cost_kw * storage_kw + storage_cost_kwh * storage_kwh
+        invest_total = invest_power + invest_civil + invest_pile + invest_storage
 
     # --- 收入（服务费口径） ---
     energy_year = n_recommend * guns_per_pile * kwh_per_gun_per_day * days_per_year
@@ -188,6 +319,21 @@ def calc_plan(d: dict) -> dict:
     if revenue_year > 0 and invest_total > 0:
         payback_years = invest_total / revenue_year
 
+    # --- 分时电价：电费收入 - 购电成本（8760 小时负荷 × 分时电价） ---
+    tariff = None
+    if tariff_region in TARIFF_REGIONS and n_recommend > 0:
+        tariff = tariff_economics(
+            energy_year,
+            tariff_region,
+            service_fee,
+            sell_price=electricity_sell,
+            efficiency=charging_efficiency,
+            hourly_kwh=d.get("hourly_load_kwh"),
+        )
+    energy_cost_year = tariff["energy_cost_year_yuan"] if tariff else 0.0
+    electricity_revenue_year = tariff["electricity_revenue_year_yuan"] if tariff else 0.0
+    energy_margin_year = electricity_revenue_year - energy_cost_year
+
     # --- OPEX: 租金、人工、净现金流（你要求：桩=0 → 全部0） ---
     if n_recommend <= 0:
         rent_year_yuan = 0.0
@@ -196,41 +342,52 @@ def calc_plan(d: dict) -> dict:
     else:
         rent_year_yuan = site_area * rent_yuan_per_sqm_month * 12
         labor_year_yuan = staff_count * salary_yuan_per_month * 12
-        revenue_net_year_yuan = revenue_year - rent_year_yuan - labor_year_yuan
+        revenue_net_year_yuan = (
+            revenue_year + energy_margin_year + storage_saving_year - rent_year_yuan - labor_year_yuan
+        )
 
     payback_net_years = None
     if revenue_net_year_yuan > 0 and invest_total > 0:
         payback_net_years = invest_total / revenue_net_year_yuan
 
-    # --- notes / 提示（边界&口径解释） ---
+    # --- notes / 提示（边界&口径解释；几何部分已在几何阶段生成） ---
     notes = []
-
-    if site_length < REQ_LEN_MIN_M:
-        notes.append(f"场地长度{site_length:.1f}m<{REQ_LEN_MIN_M:.0f}m：场地不足，不具备建站条件。")
-    if site_width < REQ_WIDTH_MIN_M:
-        notes.append(f"场地宽度{site_width:.1f}m<{REQ_WIDTH_MIN_M:.0f}m：转弯半径不足，不具备建站条件。")
-
-    if layout_note:
-        notes.append(layout_note)
-
-    notes.append(
-        f"布置口径：每排原始车位数=floor(长度/{STALL_WIDTH_M:.0f})={stalls_per_row_raw}；绘图每排车位数={stalls_per_row_draw}；排数={row_count}；车位={stalls_total}；桩(布局)=车位/2={n_layout}。"
-    )
-
-    notes.append(
-        f"电力口径：电力容量=桩数×400kVA={n_recommend}×400={power_capacity_kva:.0f}kVA；电力投资=单价×电力容量={power_cost:.0f}×{power_capacity_kva:.0f}。"
-    )
-
-    
-    if n_recommend <= 0:
-        notes.append("推荐桩数为0：不建议硬化场地/投资建设（CAPEX按0处理）。")
-    else:
-        if n_recommend < n_layout:
-            notes.append("受电力或面积约束：推荐桩数小于布局可布置桩数。")
-        if n_recommend < n_power:
-            notes.append("受面积或布局约束：推荐桩数小于电力可支持桩数。")        
-        if revenue_net_year_yuan <= 0:
-            notes.append("经营口径净现金流<=0：租金/人工假设较高或服务费较低，项目可能不具备回收性。")
+    if with_notes:
+        notes.extend(geo["notes"])
+        if grid_cap_kva > 0:
+            notes.append(
+                f"电力口径：电网接入上限{grid_cap_kva:.0f}kVA（有功按×{GRID_POWER_FACTOR}），储能{storage_kw:.0f}kW/{storage_kwh:.0f}kWh；"
+                f"单桩峰值小时负荷约{peak_kw_per_pile:.0f}kW，电力可支持桩数{n_power}；"
+                f"电力容量={power_capacity_kva:.0f}kVA，电力投资={power_cost:.0f}×{power_capacity_kva:.0f}+变压器{transformer_cost:.0f}，"
+                f"储能投资{invest_storage:.0f}元。"
+            )
+        elif transformer_kva > 0:
+            notes.append(
+                f"电力口径：变压器配置{transformer_kva:.0f}kVA；电力投资=单价×电力容量+变压器={power_cost:.0f}×{power_capacity_kva:.0f}+{transformer_cost:.0f}。"
+            )
+        else:
+            notes.append(
+                f"电力口径：电力容量=桩数×{pile_kva_per:.0f}kVA={n_recommend}×{pile_kva_per:.0f}={power_capacity_kva:.0f}kVA；电力投资=单价×电力容量={power_cost:.0f}×{power_capacity_kva:.0f}。"
+            )
+
+        if tariff:
+            notes.append(
+                f"电价口径：{tariff['region_name']}分时电价，加权购电均价{tariff['avg_price_yuan_per_kwh']:.3f}元/kWh，"
+                f"充电效率{charging_efficiency:.0%}；年购电成本{energy_cost_year:.0f}元，电费收入{electricity_revenue_year:.0f}元，"
+                f"电费价差{energy_margin_year:.0f}元计入净现金流。"
+            )
+        elif tariff_region and tariff_region not in TARIFF_REGIONS:
+            notes.append(f"电价地区“{tariff_region}”未配置分时电价，电费价差未计入。")
+
+        if n_recommend <= 0:
+            notes.append("推荐桩数为0：不建议硬化场地/投资建设（CAPEX按0处理）。")
+        else:
+            if n_recommend < n_layout:
+                notes.append("受电力或面积约束：推荐桩数小于布局可布置桩数。")
+            if n_recommend < n_power:
+                notes.append("受面积或布局约束：推荐桩数小于电力可支持桩数。")        
+            if revenue_net_year_yuan <= 0:
+                notes.append("经营口径净现金流<=0：租金/人工假设较高或服务费较低，项目可能不具备回收性。")
 
     # --- 输出（字段永远存在，前端不会 NaN） ---
     return {
@@ -248,6 +405,9 @@ def calc_plan(d: dict) -> dict:
         "n_layout": n_layout,
 
         "n_power": n_power,        
+        "grid_cap_kva": grid_cap_kva or None,
+        "storage_kw": storage_kw,
+        "storage_kwh": storage_kwh,
         "n_recommend": n_recommend,
 
         # 新增：给前端“推荐配置”展示电力容量
@@ -260,12 +420,19 @@ def calc_plan(d: dict) -> dict:
         "invest_power_yuan": invest_power,
         "invest_civil_yuan": invest_civil,
         "invest_pile_yuan": invest_pile,
+        "invest_storage_yuan": invest_storage,
         "invest_total_yuan": invest_total,
 
         "energy_year_kwh": energy_year,
         "revenue_year_yuan": revenue_year,
         "payback_years": payback_years,
 
+        "energy_cost_year_yuan": energy_cost_year,
+        "electricity_revenue_year_yuan": electricity_revenue_year,
+        "energy_margin_year_yuan": energy_margin_year,
+        "storage_saving_year_yuan": storage_saving_year if n_recommend > 0 else 0.0,
+        "tariff": tariff,
+
         "rent_year_yuan": rent_year_yuan,
         "labor_year_yuan": labor_year_yuan,
         "revenue_net_year_yuan": revenue_net_year_yuan,
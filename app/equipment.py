@@ -0,0 +1,249 @@
+import bisect
+import itertools
+from functools import lru_cache
+
+from app.calc import GRID_POWER_FACTOR, PILE_KVA_PER_KW, calc_plan, layout_geometry, _f, _i
+from app.tariff import TARIFF_REGIONS, peak_load_share, tariff_economics
+
+
+# =========================
+# 设备目录（示例价格，实际以最新报价为准）
+# =========================
+PILE_MODELS = {
+    "DC240-2": {"name": "240kW一体机（双枪）", "kw": 240.0, "guns": 2, "price": 32000.0},
+    "DC400-2": {"name": "400kW一体机（双枪）", "kw": 400.0, "guns": 2, "price": 45000.0},
+    "DC480-4": {"name": "480kW分体式（4枪）", "kw": 480.0, "guns": 4, "price": 68000.0},
+    "DC600-2": {"name": "600kW液冷超充（双枪）", "kw": 600.0, "guns": 2, "price": 85000.0},
+    "DC800-4": {"name": "800kW分体式液冷（4枪）", "kw": 800.0, "guns": 4, "price": 118000.0},
+}
+
+TRANSFORMER_MODELS = {
+    "SCB13-630": {"kva": 630.0, "price": 160000.0},
+    "SCB13-800": {"kva": 800.0, "price": 185000.0},
+    "SCB13-1000": {"kva": 1000.0, "price": 215000.0},
+    "SCB13-1250": {"kva": 1250.0, "price": 250000.0},
+    "SCB13-1600": {"kva": 1600.0, "price": 300000.0},
+    "SCB13-2000": {"kva": 2000.0, "price": 360000.0},
+    "SCB13-2500": {"kva": 2500.0, "price": 430000.0},
+}
+
+MAX_TRANSFORMERS = 6                 # 单站最多变压器台数
+GUN_MAX_HOURS_PER_DAY = 16.0         # 单枪日电量不超过 枪功率 × 该时长
+DEFAULT_DISCOUNT_RATE = 0.08
+DEFAULT_HORIZON_YEARS = 10
+OBJECTIVES = ("payback", "npv")
+
+
+@lru_cache(maxsize=None)
+def _transformer_rows() -> tuple:
+    """不超过 MAX_TRANSFORMERS 台的变压器组合：每个总容量保留最便宜的一种，按容量升序 (kva, price, combo)"""
+    combos = {}
+    for count in range(1, MAX_TRANSFORMERS + 1):
+        for combo in itertools.combinations_with_replacement(TRANSFORMER_MODELS, count):
+            kva = sum(TRANSFORMER_MODELS[k]["kva"] for k in combo)
+            price = sum(TRANSFORMER_MODELS[k]["price"] for k in combo)
+            if kva not in combos or price < combos[kva][0]:
+                combos[kva] = (price, combo)
+    return tuple((kva, price, combo) for kva, (price, combo) in sorted(combos.items()))
+
+
+@lru_cache(maxsize=64)
+def _transformer_table(max_kva=None) -> tuple:
+    """容量不超过 max_kva 的组合 + 后缀最小表：best_from[i] 为容量≥kvas[i] 的最便宜组合"""
+    rows = [r for r in _transformer_rows() if max_kva is None or r[0] <= max_kva + 1e-9]
+    best_from = [None] * len(rows)
+    best = None
+    for i in range(len(rows) - 1, -1, -1):
+        if best is None or rows[i][1] < best[1]:
+            best = rows[i]
+        best_from[i] = best
+    return tuple(r[0] for r in rows), tuple(best_from)
+
+
+def cheapest_transformers(required_kva: float, max_kva=None):
+    """容量≥required_kva（且≤max_kva）的最便宜变压器组合 (kva, price, combo)；无解返回 None"""
+    kvas, best_from = _transformer_table(max_kva)
+    i = bisect.bisect_left(kvas, required_kva - 1e-9)
+    return best_from[i] if i < len(kvas) else None
+
+
+def transformer_label(combo) -> str:
+    counts = {}
+    for k in combo:
+        counts[k] = counts.get(k, 0) + 1
+    return "+".join(f"{k}×{c}" if c > 1 else k for k, c in counts.items())
+
+
+def list_catalog() -> dict:
+    return {
+        "piles": [{"model": k, **v} for k, v in PILE_MODELS.items()],
+        "transformers": [{"model": k, **v} for k, v in TRANSFORMER_MODELS.items()],
+        "max_transformers": MAX_TRANSFORMERS,
+    }
+
+
+def annuity_factor(rate: float, years: int) -> float:
+    """年金现值系数：每年 1 元、共 years 年按 rate 折现的现值（rate ≤ 0 时为年数）"""
+    if rate <= 0:
+        return float(years)
+    return (1 - (1 + rate) ** -years) / rate
+
+
+def energy_margin_per_kwh(d: dict) -> float:
+    """分时电价下电费价差与电量成正比：按 1kWh 算出单位价差（未选电价地区为 0）"""
+    region = str(d.get("tariff_region") or "").strip()
+    if region not in TARIFF_REGIONS:
+        return 0.0
+    sell = d.get("electricity_sell_yuan_per_kwh")
+    unit = tariff_economics(
+        1.0, region, _f(d.get("service_fee_yuan_per_kwh"), 0.3),
+        sell_price=None if sell is None else _f(sell, 0),
+        efficiency=_f(d.get("charging_efficiency"), 0.95),
+        hourly_kwh=d.get("hourly_load_kwh"),
+    )
+    return unit["energy_margin_year_yuan"]
+
+
+def optimize_equipment(
+    d: dict,
+    objective: str = "payback",
+    discount_rate: float = DEFAULT_DISCOUNT_RATE,
+    horizon_years: int = DEFAULT_HORIZON_YEARS,
+    models=None,
+) -> dict:
+    """
+    搜索 桩型号 × 桩数 × 变压器组合，按净回收期最短（payback）或 NPV 最大（npv）选出配置。
+    - 桩数上限：车位数 // 每桩枪数，且不超过电网接入约束；
+    - 变压器：容量≥桩数×单桩功率（kVA/kW 口径同 calc_plan）的最便宜组合（不超过接入容量）；
+    - 同一变压器组合内投资与净现金流均随桩数线性变化，回收期/NPV 单调，
+      只需评估各容量档的端点，单站评估数百次、毫秒级，可用于批量筛选。
+    最优配置回代 calc_plan，得到完整测算。
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective 应为 {' / '.join(OBJECTIVES)}")
+    catalog = {k: PILE_MODELS[k] for k in (models or PILE_MODELS) if k in PILE_MODELS}
+    if not catalog:
+        raise ValueError("未选择有效的桩型号")
+
+    site_length = _f(d.get("site_length_m"), 0)
+    site_width = _f(d.get("site_width_m"), 0)
+    site_area = site_length * site_width
+    stalls_total = layout_geometry(site_length, site_width)["stalls_total"]
+
+    kwh_per_gun_per_day = _f(d.get("kwh_per_gun_per_day"), 1000)
+    service_fee = _f(d.get("service_fee_yuan_per_kwh"), 0.3)
+    days_per_year = _i(d.get("days_per_year"), 330)
+    power_cost = _f(d.get("power_cost_yuan_per_kva"), 600)
+    civil_cost = _f(d.get("civil_cost_yuan_per_sqm"), 200)
+    efficiency = _f(d.get("charging_efficiency"), 0.95)
+    rent_year = site_area * _f(d.get("rent_yuan_per_sqm_month"), 0) * 12
+    labor_year = _i(d.get("staff_count"), 0) * _f(d.get("salary_yuan_per_month"), 0) * 12
+    storage_kw = _f(d.get("storage_kw"), 0)
+    storage_capex = (
+        _f(d.get("storage_cost_yuan_per_kw"), 300) * storage_kw
+        + _f(d.get("storage_cost_yuan_per_kwh"), 900) * _f(d.get("storage_kwh"), 0)
+    )
+    fixed_net = _f(d.get("storage_saving_year_yuan"), 0) - rent_year - labor_year
+    grid_cap_kva = _f(d.get("grid_cap_kva"), 0)
+    max_kva = grid_cap_kva if grid_cap_kva > 0 else None
+
+    margin_per_kwh = energy_margin_per_kwh(d)
+
+    annuity = annuity_factor(discount_rate, horizon_years)
+    kvas, _ = _transformer_table(max_kva)
+    evaluated = 0
+    per_model = []
+
+    for model, spec in catalog.items():
+        kw, guns, price = spec["kw"], spec["guns"], spec["price"]
+        kwh_gun = min(kwh_per_gun_per_day, kw / guns * GUN_MAX_HOURS_PER_DAY)
+        energy_per_pile = guns * kwh_gun * days_per_year
+        net_per_pile = energy_per_pile * (service_fee + margin_per_kwh)
+        kva_per_pile = kw * PILE_KVA_PER_KW
+
+        n_max = stalls_total // guns
+        if grid_cap_kva > 0 and efficiency > 0:
+            # 与 calc_plan 同口径的峰值小时约束
+            peak_kw = energy_per_pile * peak_load_share(d.get("hourly_load_kwh")) / efficiency
+            if peak_kw > 0:
+                n_max = min(n_max, int((grid_cap_kva * GRID_POWER_FACTOR + storage_kw) // peak_kw))
+        if n_max <= 0:
+            continue
+
+        candidates = {1, n_max}
+        for kva in kvas:
+            n = int(kva // kva_per_pile)
+            for c in (n, n + 1):
+                if 1 <= c <= n_max:
+                    candidates.add(c)
+
+        best = None
+        for n in candidates:
+            tr = cheapest_transformers(n * kva_per_pile, max_kva)
+            if tr is None:
+                continue
+            evaluated += 1
+            invest = power_cost * tr[0] + tr[1] + civil_cost * site_area + price * n + storage_capex
+            net = n * net_per_pile + fixed_net
+            payback = invest / net if net > 0 else None
+            npv = -invest + net * annuity
+            if objective == "payback":
+                score = (payback if payback is not None else float("inf"), -npv)
+            else:
+                score = (-npv, payback if payback is not None else float("inf"))
+            if best is None or score < best["_score"]:
+                best = {
+                    "_score": score,
+                    "pile_model": model,
+                    "pile_name": spec["name"],
+                    "pile_kw": kw,
+                    "guns_per_pile": guns,
+                    "pile_count": n,
+                    "kwh_per_gun_per_day": kwh_gun,
+                    "transformer_kva": tr[0],
+                    "transformer_cost_yuan": tr[1],
+                    "transformer_config": transformer_label(tr[2]),
+                    "invest_total_yuan": invest,
+                    "revenue_net_year_yuan": net,
+                    "payback_net_years": payback,
+                    "npv_yuan": npv,
+                }
+        if best is not None:
+            per_model.append(best)
+
+    if not per_model:
+        return {"objective": objective, "best": None, "by_model": [], "evaluations": evaluated, "plan": None}
+
+    per_model.sort(key=lambda r: r["_score"])
+    for row in per_model:
+        row.pop("_score")
+    best = per_model[0]
+
+    data = dict(d)
+    data.update({
+        "pile_kva_per": best["pile_kw"],
+        "guns_per_pile": best["guns_per_pile"],
+        "pile_cost_yuan_each": PILE_MODELS[best["pile_model"]]["price"],
+        "kwh_per_gun_per_day": best["kwh_per_gun_per_day"],
+        "pile_count": best["pile_count"],
+        "transformer_kva": best["transformer_kva"],
+        "transformer_cost_yuan": best["transformer_cost_yuan"],
+        "pile_model": best["pile_model"],
+        "transformer_config": best["transformer_config"],
+    })
+    plan = calc_plan(data)
+    plan["notes"].append(
+        f"设备选型（按{'净回收期' if objective == 'payback' else f'{horizon_years}年NPV（折现率{discount_rate:.0%}）'}）："
+        f"{best['pile_name']}×{best['pile_count']}台，变压器{best['transformer_config']}（{best['transformer_kva']:.0f}kVA）。"
+    )
+
+    return {
+        "objective": objective,
+        "discount_rate": discount_rate,
+        "horizon_years": horizon_years,
+        "best": best,
+        "by_model": per_model,
+        "evaluations": evaluated,
+        "inputs": data,
+        "plan": plan,
+    }
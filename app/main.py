@@ -1,27 +1,103 @@
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 from docx import Document
+import asyncio
+import csv
+import io
+import json
+import math
 import tempfile
 import os
 from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
 
 import base64
-import shutil
+import hashlib
 import subprocess
 from datetime import datetime
+from functools import lru_cache
 from docx.shared import Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
 
-from app.schemas import CalcRequest
-from app.calc import calc_plan
+from app.schemas import (
+    CalcRequest, EquipmentRequest, HeatmapRequest, PhasingRequest, SimulateRequest, SobolRequest, StorageRequest,
+    SizingRequest, SweepRequest, VariantsRequest,
+)
+from app.calc import calc_plan, calc_variants, site_geometry, RULES_VERSION
+from app.atlas import ATLAS_STEP_M, CapacityAtlas
+from app.simulate import calc_plan_simulated
+from app.storage import optimize_storage
+from app.phasing import plan_phasing
+from app.sizing import size_site
+from app.regions import SUGGEST_LIMIT, region_index
+from app.equipment import OBJECTIVES as EQUIPMENT_OBJECTIVES, PILE_MODELS, list_catalog, optimize_equipment
+from app.tariff import list_regions
+from app.store import ProjectStore
+from app.sweep import (
+    FIELD_LABELS, ROW_FIELDS, SWEEP_FIELDS, SweepSummary, cast_field, evaluate_chunk, grid_size, iter_chunks, iter_grid,
+    iter_monte_carlo,
+)
+from app.xlsx_export import XLSX_MAX_ROWS, XLSX_MEDIA_TYPE, stream_xlsx
+from app.static_assets import PrecompressedStatic
+from app.screening import (
+    EQUIPMENT_FIELDS, RESULT_FIELDS, SCREEN_CHUNK_ROWS, SCREEN_ENCODINGS, ScreeningError,
+    header_line, iter_records, map_header, parse_records, screen_rows, validation_error_text,
+)
+from app.singleflight import SingleFlight
+from app.sobol import default_ranges, sobol_indices
+from app.profiling import PROFILE_TOKEN, ProfilingMiddleware, authorized, profiled, read_profile_summary
 
 app = FastAPI(title="Truck Charging Site V1", version="0.3.0")
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
 BASE_DIR = Path(__file__).resolve().parent.parent
+STATIC_DIR = BASE_DIR / "static"
+
+# 静态资源启动时一次性加载并预压缩（gzip/br），支持 ETag/304
+static_files = PrecompressedStatic(STATIC_DIR)
+app.mount("/static", static_files, name="static")
+
+# 按请求剖析：仅在设置 TRUCKSITE_PROFILE_TOKEN 时注册中间件（见 app/profiling.py）
+if PROFILE_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+
+# 项目库（SQLite）：默认 data/trucksite.sqlite3，可用环境变量 TRUCKSITE_DB_PATH 指定
+project_store = ProjectStore(os.environ.get("TRUCKSITE_DB_PATH") or BASE_DIR / "data" / "trucksite.sqlite3")
+MAX_BULK_PROJECTS = 5000
+MAX_SWEEP_SCENARIOS = 5_000_000
+MAX_BATCH_XLSX_ROWS = 50_000
+# GET /api/calculate 的 HTTP 缓存：结果只取决于输入与测算模型版本，允许浏览器/反向代理缓存
+CALC_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+# 参与测算的模块：公式、电价表、地区预设、设备目录、仿真与请求默认值都在这些源文件里
+CALC_MODEL_MODULES = ("calc", "equipment", "regions", "schemas", "simulate", "storage", "tariff")
+
+
+def _calc_model_version() -> str:
+    """测算模型版本 = 应用版本 + 布局口径 + 测算模块源码的哈希；任一公式或数据表改动，ETag 随之改变"""
+    h = hashlib.sha256(f"{app.version}|{RULES_VERSION}".encode("utf-8"))
+    for name in CALC_MODEL_MODULES:
+        h.update((Path(__file__).resolve().parent / f"{name}.py").read_bytes())
+    return h.hexdigest()[:16]
+
+
+CALC_MODEL_VERSION = _calc_model_version()
+
+# 报告版本 = 测算模型版本 + 报告模板（正文、样式、附件均在本文件生成）；项目库只复用同版本的报告
+REPORT_TEMPLATE_VERSION = hashlib.sha256(Path(__file__).resolve().read_bytes()).hexdigest()[:16]
+REPORT_VERSION = f"{CALC_MODEL_VERSION}.{REPORT_TEMPLATE_VERSION}"
+
+# 场地容量图谱（data/atlas_<口径版本>.bin），首次查询时构建
+capacity_atlas = CapacityAtlas(BASE_DIR / "data")
+HEATMAP_METRICS = ("n_layout", "payback_net_years", "revenue_net_year_yuan")
+MAX_HEATMAP_CELLS = 260_000            # 桩数热力图（纯查表，可覆盖 1m 步长全图）
+MAX_HEATMAP_FINANCE_CELLS = 40_000     # 回收期/净现金流热力图（逐格计算经营指标）
+CAPACITY_MAX_M = 10_000.0              # 容量查询的长宽上限（超出图谱范围时逐次计算）
+
 PRODUCT_ASSETS_DIR = BASE_DIR / "assets" / "product"
 ALLOWED_IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp"}
 FINANCE_TEXT = """
@@ -82,31 +158,778 @@ FINANCE_TEXT = """
 """.strip()
 
 
-@app.get("/")
-def home():
-    return FileResponse("static/index.html")
+@app.api_route("/", methods=["GET", "HEAD"])
+def home(request: Request):
+    return static_files.response("index.html", request.headers, request.method)
 
 
 @app.post("/api/calculate")
 def calculate(req: CalcRequest):
+    # 地区预设已在 CalcRequest 校验时补齐（见 schemas.CalcRequest._fill_region_defaults），这里只附上说明
     data = req.model_dump()
     print("DEBUG /api/calculate keys:", sorted(list(data.keys())))
-    result = calc_plan(data)
+    return _calculate(data, req._region_preset)
+
+
+def _calculate(data: dict, preset: Optional[dict]) -> dict:
+    if data.get("trucks_per_day"):
+        result = calc_plan_simulated(data)
+    else:
+        result = calc_plan(data)
+    if preset:
+        result["region_preset"] = preset
+        result["notes"].append(preset["note"])
     return result
 
 
+def _query_value(value) -> str:
+    """规范化查询参数值：整数值的浮点数写成整数（120.0 → 120），其余取 repr/str"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+def canonical_calc_query(req: CalcRequest) -> str:
+    """规范查询串：只含显式给出的非空字段，按字段名排序，值按校验后的类型规范化"""
+    data = req.model_dump()
+    pairs = [(k, _query_value(data[k])) for k in sorted(req.model_fields_set) if data[k] is not None]
+    return "&".join(f"{quote(k)}={quote(v, safe='')}" for k, v in pairs)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 用弱比较（RFC 9110）：忽略 W/ 前缀"""
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in [t[2:] if t.startswith("W/") else t for t in tags]
+
+
+@app.get("/api/calculate")
+def calculate_get(request: Request):
+    """
+    可缓存的 GET 形式：参数同 POST /api/calculate（查询串）。
+    - 非规范查询串（未排序、数值写法不同等）308 重定向到规范 URL，使同一测算只对应一个缓存键；
+    - 强 ETag = 规范化输入（含默认值与地区预设补齐）+ 测算模型版本 的哈希，If-None-Match 命中时不测算、直接 304；
+    - Cache-Control 允许浏览器与反向代理缓存。
+    """
+    params = request.query_params
+    repeated = sorted({k for k in params.keys() if len(params.getlist(k)) > 1})
+    if repeated:
+        raise HTTPException(status_code=422, detail=f"参数重复：{', '.join(repeated)}")
+    unknown = sorted(k for k in params.keys() if k not in CalcRequest.model_fields)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"未知的参数：{', '.join(unknown)}")
+    # 空值视同未填写（可选字段留空）
+    try:
+        req = CalcRequest.model_validate({k: v for k, v in params.items() if v != ""})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+    canonical = canonical_calc_query(req)
+    if request.url.query != canonical:
+        return Response(
+            status_code=308,
+            headers={"Location": f"{request.url.path}?{canonical}", "Cache-Control": CALC_CACHE_CONTROL},
+        )
+
+    data = req.model_dump()
+    preset = req._region_preset
+    key = json.dumps(
+        {"model": CALC_MODEL_VERSION, "inputs": data, "preset": preset},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    etag = f'"{hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": CALC_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(content=jsonable_encoder(_calculate(data, preset)), headers=headers)
+
+
+@app.post("/api/calculate/variants")
+def calculate_variants(req: VariantsRequest):
+    """同一场地批量计算经营变体：几何阶段只算一次（按长宽缓存），每个变体只算经营阶段"""
+    base = req.model_dump(exclude={"variants", "fields"})
+    base["trucks_per_day"] = None
+    fields = req.fields or list(ROW_FIELDS)
+
+    # 与情景扫描相同：各字段的上下限按 CalcRequest 规则校验一次，逐项不再重复校验
+    bounds = {}
+    for overrides in req.variants:
+        for k, v in overrides.items():
+            lo, hi = bounds.get(k, (v, v))
+            bounds[k] = (min(lo, v), max(hi, v))
+    _validate_bounds(base, bounds)
+
+    variants = [{k: cast_field(k, v) for k, v in overrides.items()} for overrides in req.variants]
+    results = calc_variants(base, variants)
+    unknown = [k for k in fields if k not in results[0]]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"未知的结果字段：{', '.join(unknown)}")
+
+    geometry = site_geometry(req.site_length_m, req.site_width_m)
+    geometry["notes"] = list(geometry["notes"])
+    return {
+        "geometry": geometry,
+        "rules_version": RULES_VERSION,
+        "count": len(results),
+        "results": [
+            {**overrides, **{k: result[k] for k in fields}}
+            for overrides, result in zip(variants, results)
+        ],
+    }
+
+
+# =========================
+# 实时测算通道（WebSocket）：会话内保存当前输入，客户端只发变更字段
+# =========================
+LIVE_CALC_DEBOUNCE_S = 0.08    # 合并窗口：窗口内连续到达的变更只算一次
+_MISSING = object()
+_BAD_FRAME = object()          # 无法解析的消息（非 JSON 或二进制帧）
+
+
+@app.websocket("/ws/calc")
+async def live_calc(ws: WebSocket):
+    """
+    客户端消息：{"type": "update"|"reset", "seq": n, "fields": {...}}
+      - update：合并变更字段；reset：整体替换当前输入
+    服务端消息：{"type": "result", "seq": n, "changed": {...}} 只含与上次结果不同的字段；
+              {"type": "error", "seq": n, "detail": [...]} 输入校验失败（保留上次结果）
+              {"type": "error", "seq": null, "detail": "..."} 消息无法解析（忽略该条，会话继续）
+    """
+    await ws.accept()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def reader():
+        try:
+            while True:
+                try:
+                    msg = json.loads(await ws.receive_text())
+                except (KeyError, ValueError):
+                    msg = _BAD_FRAME
+                await queue.put(msg)
+        except (WebSocketDisconnect, RuntimeError):
+            await queue.put(None)
+
+    async def reject_bad_frame():
+        await ws.send_json({"type": "error", "seq": None, "detail": "消息应为 JSON 文本"})
+
+    reader_task = asyncio.create_task(reader())
+    inputs: dict = {}
+    last_result: dict = {}
+
+    def apply(msg) -> bool:
+        if not isinstance(msg, dict):
+            return False
+        fields = msg.get("fields")
+        if not isinstance(fields, dict):
+            return False
+        if msg.get("type") == "reset":
+            inputs.clear()
+        inputs.update(fields)
+        return True
+
+    try:
+        while True:
+            msg = await queue.get()
+            if msg is None:
+                return
+            if msg is _BAD_FRAME:
+                await reject_bad_frame()
+                continue
+            changed = apply(msg)
+            seq = msg.get("seq") if isinstance(msg, dict) else None
+
+            # 合并窗口内的后续消息（按键连发时只算最后一版）
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + LIVE_CALC_DEBOUNCE_S
+            while True:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    msg = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if msg is None:
+                    return
+                if msg is _BAD_FRAME:
+                    await reject_bad_frame()
+                    continue
+                changed = apply(msg) or changed
+                seq = msg.get("seq", seq) if isinstance(msg, dict) else seq
+
+            if not changed:
+                continue
+
+            try:
+                data = CalcRequest.model_validate(inputs).model_dump()
+            except ValidationError as e:
+                await ws.send_json({
+                    "type": "error",
+                    "seq": seq,
+                    "detail": e.errors(include_url=False, include_context=False, include_input=False),
+                })
+                continue
+
+            if data.get("trucks_per_day"):
+                result = await run_in_threadpool(calc_plan_simulated, data)
+            else:
+                result = calc_plan(data)
+
+            diff = {k: v for k, v in result.items() if last_result.get(k, _MISSING) != v}
+            last_result = result
+            await ws.send_json({"type": "result", "seq": seq, "changed": diff})
+    except WebSocketDisconnect:
+        return
+    finally:
+        reader_task.cancel()
+
+
+# =========================
+# 情景扫描（SSE 流式推送）：按块计算、逐块推送行与滚动汇总，客户端断开即停止
+# =========================
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _validate_bounds(base: dict, bounds: dict):
+    """各因子的上下限按 CalcRequest 规则校验一次（逐行不再重复校验；取整口径与逐行测算的 cast_field 一致）"""
+    unknown = [k for k in bounds if k not in SWEEP_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"不支持扫描的字段：{', '.join(unknown)}")
+    for k, (lo, hi) in bounds.items():
+        for v in (lo, hi):
+            try:
+                CalcRequest.model_validate({**base, k: cast_field(k, v)})
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+
+def _sweep_plan(req: SweepRequest):
+    """校验扫描参数，返回 (基准输入, 情景生成器, 情景总数)"""
+    base = req.model_dump(exclude={"factors", "ranges", "samples", "seed", "chunk_size"})
+
+    if req.factors:
+        factors = {k: v for k, v in req.factors.items() if v}
+        bounds = {k: (min(v), max(v)) for k, v in factors.items()}
+        total = grid_size(factors)
+        scenarios = iter_grid(factors)
+    elif req.ranges and req.samples > 0:
+        bounds = {}
+        for k, v in req.ranges.items():
+            if len(v) != 2:
+                raise HTTPException(status_code=422, detail=f"ranges.{k} 应为 [下限, 上限]")
+            bounds[k] = (min(v), max(v))
+        total = req.samples
+        scenarios = iter_monte_carlo(bounds, req.samples, req.seed)
+    else:
+        raise HTTPException(status_code=422, detail="请提供 factors（网格）或 ranges + samples（蒙特卡洛）")
+
+    _validate_bounds(base, bounds)
+    if total > MAX_SWEEP_SCENARIOS:
+        raise HTTPException(status_code=413, detail=f"情景数{total}超过上限{MAX_SWEEP_SCENARIOS}")
+    return base, scenarios, total
+
+
+@app.post("/api/sweep/stream")
+async def sweep_stream(req: SweepRequest, request: Request):
+    base, scenarios, total = _sweep_plan(req)
+    chunk_size = req.chunk_size
+
+    async def events():
+        summary = SweepSummary()
+        yield _sse("meta", {"total": total, "chunk_size": chunk_size})
+        idx = 1
+        for chunk in iter_chunks(scenarios, chunk_size):
+            if await request.is_disconnected():
+                return
+            rows = await run_in_threadpool(evaluate_chunk, base, chunk, idx)
+            idx += len(rows)
+            summary.update(rows)
+            yield _sse("rows", {"rows": rows, "summary": summary.as_dict()})
+        yield _sse("done", summary.as_dict())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/sensitivity/sobol")
+async def sensitivity_sobol(req: SobolRequest):
+    """
+    全局敏感性：各数值字段同时在范围内变化（未给 ranges 时取基准 ±spread），
+    返回净回收期/净年现金流的一阶与总效应 Sobol 指数及排名表。
+    """
+    base = req.model_dump(exclude={"ranges", "spread", "samples", "seed"})
+    base["trucks_per_day"] = None
+    if req.ranges:
+        bounds = {}
+        for k, v in req.ranges.items():
+            if len(v) != 2:
+                raise HTTPException(status_code=422, detail=f"ranges.{k} 应为 [下限, 上限]")
+            bounds[k] = (min(v), max(v))
+    else:
+        bounds = default_ranges(base, req.spread)
+    _validate_bounds(base, bounds)
+    try:
+        return await run_in_threadpool(sobol_indices, base, bounds, req.samples, req.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+# =========================
+# Excel 导出（逐行流式写出，不在内存中构建表格）
+# =========================
+def xlsx_response(columns: list, rows, filename: str, sheet_name: str) -> StreamingResponse:
+    # 同步生成器由 Starlette 放到线程池逐块迭代，边计算边压缩边下载
+    return StreamingResponse(
+        stream_xlsx(columns, rows, sheet_name=sheet_name, headers=[FIELD_LABELS.get(c, c) for c in columns]),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/api/sweep/xlsx")
+def sweep_xlsx(req: SweepRequest):
+    """情景扫描（网格 / 蒙特卡洛）结果导出 Excel：每行一个情景，因子列 + 结果列"""
+    base, scenarios, total = _sweep_plan(req)
+    if total >= XLSX_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"情景数{total}超过 Excel 单表行数上限{XLSX_MAX_ROWS - 1}")
+    names = list(req.factors or req.ranges)
+    columns = ["idx"] + names + list(ROW_FIELDS)
+
+    def rows():
+        idx = 1
+        for chunk in iter_chunks(scenarios, req.chunk_size):
+            out = evaluate_chunk(base, chunk, idx)
+            idx += len(out)
+            yield from out
+
+    if req.factors:
+        return xlsx_response(columns, rows(), "trucksite_sweep.xlsx", "情景扫描（网格）")
+    return xlsx_response(columns, rows(), "trucksite_montecarlo.xlsx", "情景扫描（蒙特卡洛）")
+
+
+@app.post("/api/batch/xlsx")
+async def batch_xlsx(request: Request):
+    """批量测算导出 Excel：请求体为 CalcRequest 输入的 JSON 数组，校验失败的行写入错误列"""
+    raw_items = await request.json()
+    if not isinstance(raw_items, list):
+        raise HTTPException(status_code=422, detail="请求体应为 JSON 数组")
+    if len(raw_items) > MAX_BATCH_XLSX_ROWS:
+        raise HTTPException(status_code=413, detail=f"单次最多导出{MAX_BATCH_XLSX_ROWS}个场地")
+    columns = ["idx", "site_location", "site_length_m", "site_width_m"] + list(ROW_FIELDS) + ["error"]
+
+    def rows():
+        for idx, raw in enumerate(raw_items, start=1):
+            row = {"idx": idx}
+            if not isinstance(raw, dict):
+                row["error"] = "应为 JSON 对象"
+                yield row
+                continue
+            try:
+                inputs = CalcRequest.model_validate(raw).model_dump()
+            except ValidationError as e:
+                row.update({k: raw.get(k) for k in ("site_location", "site_length_m", "site_width_m")})
+                row["error"] = validation_error_text(e)
+                yield row
+                continue
+            result = _plan_for(inputs)
+            row.update({k: inputs.get(k) for k in ("site_location", "site_length_m", "site_width_m")})
+            row.update({k: result.get(k) for k in ROW_FIELDS})
+            yield row
+
+    return xlsx_response(columns, rows(), "trucksite_batch.xlsx", "批量测算")
+
+
+# =========================
+# 地块清单批量筛选：上传 CSV（流式读取）→ 流式返回带测算结果的 CSV
+# =========================
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    边读请求体边写响应：StreamingResponse 默认并发监听 receive() 判断断开，会抢走尚未读取的请求体分块；
+    这里请求体由响应生成器自己读取（客户端断开时 request.stream() 抛出 ClientDisconnect，由生成器捕获后结束）。
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def _csv_error_row(width: int, message: str) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerow([""] * width + [message])
+    return buf.getvalue().encode("utf-8")
+
+
+@app.post("/api/screen/csv")
+async def screen_csv(request: Request, encoding: str = "utf-8-sig", equipment: Optional[str] = None):
+    """
+    CSV 表头须含场地长度、宽度列（字段名或中文别名，见 app/screening.py）；
+    查询参数可给出所有行共用的 CalcRequest 字段（如 service_fee_yuan_per_kwh=0.35），行内非空单元格优先。
+    equipment=payback/npv：逐行做设备选型，输出追加型号、桩数、变压器配置。
+    """
+    if encoding not in SCREEN_ENCODINGS:
+        raise HTTPException(status_code=422, detail=f"encoding 应为 {' / '.join(SCREEN_ENCODINGS)}")
+    if equipment is not None and equipment not in EQUIPMENT_OBJECTIVES:
+        raise HTTPException(status_code=422, detail=f"equipment 应为 {' / '.join(EQUIPMENT_OBJECTIVES)}")
+    base = {k: v for k, v in request.query_params.items() if k in CalcRequest.model_fields}
+    try:
+        CalcRequest.model_validate({"site_length_m": 0, "site_width_m": 0, **base})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+    # 先读出表头，表头有误时仍可返回 4xx
+    records = iter_records(request.stream(), encoding)
+    try:
+        header = []
+        async for record in records:
+            header = parse_records([record])[0] if record.strip() else []
+            if header:
+                break
+        fields = map_header(header)
+    except ScreeningError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ClientDisconnect:
+        return Response(status_code=400)    # 上传中断：客户端已不在，无需响应内容
+
+    async def body():
+        yield ("\ufeff" + header_line(header, equipment)).encode("utf-8")    # 带 BOM，Excel 直接打开不乱码
+        batch = []
+        try:
+            async for record in records:
+                batch.append(record)
+                if len(batch) >= SCREEN_CHUNK_ROWS:
+                    text = await run_in_threadpool(screen_rows, fields, parse_records(batch), base, equipment)
+                    batch = []
+                    yield text.encode("utf-8")
+            if batch:
+                yield (await run_in_threadpool(screen_rows, fields, parse_records(batch), base, equipment)).encode("utf-8")
+        except (ScreeningError, csv.Error) as e:
+            width = len(header) + len(RESULT_FIELDS) - 1 + (len(EQUIPMENT_FIELDS) if equipment else 0)
+            yield _csv_error_row(width, f"解析中止：{e}")
+        except ClientDisconnect:
+            return    # 上传中断：结束响应，不再写出
+
+    return DuplexStreamingResponse(
+        body(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="trucksite_screening.csv"'},
+    )
+
+
+# =========================
+# 场地容量：O(1) 查表 + (长, 宽) 热力图
+# =========================
+@app.get("/api/capacity")
+def capacity(length: float, width: float):
+    if not (math.isfinite(length) and math.isfinite(width)):
+        raise HTTPException(status_code=422, detail="长宽须为有限数值")
+    if length < 0 or width < 0:
+        raise HTTPException(status_code=422, detail="长宽不能为负")
+    if length > CAPACITY_MAX_M or width > CAPACITY_MAX_M:
+        raise HTTPException(status_code=422, detail=f"长宽不超过 {CAPACITY_MAX_M:.0f}m")
+    return capacity_atlas.lookup(length, width)
+
+
+def _grid_axis(lo: float, hi: float, step: float) -> list:
+    """网格坐标：按 0.5m 对齐，含上限"""
+    lo_i = int(lo / ATLAS_STEP_M)
+    hi_i = int(hi / ATLAS_STEP_M)
+    step_i = max(1, int(round(step / ATLAS_STEP_M)))
+    return list(range(lo_i, hi_i + 1, step_i))
+
+
+def _heatmap(req: HeatmapRequest) -> dict:
+    metric = req.metric
+    if metric not in HEATMAP_METRICS:
+        raise HTTPException(status_code=422, detail=f"metric 应为 {' / '.join(HEATMAP_METRICS)}")
+    if req.length_min_m > req.length_max_m or req.width_min_m > req.width_max_m:
+        raise HTTPException(status_code=422, detail="长宽范围下限不能大于上限")
+
+    len_idx = _grid_axis(req.length_min_m, req.length_max_m, req.step_m)
+    wid_idx = _grid_axis(req.width_min_m, req.width_max_m, req.step_m)
+    cells = len(len_idx) * len(wid_idx)
+    limit = MAX_HEATMAP_CELLS if metric == "n_layout" else MAX_HEATMAP_FINANCE_CELLS
+    if cells > limit:
+        raise HTTPException(status_code=413, detail=f"网格{cells}格超过上限{limit}，请增大步长或缩小范围")
+
+    lengths = [i * ATLAS_STEP_M for i in len_idx]
+    widths = [j * ATLAS_STEP_M for j in wid_idx]
+    if metric == "n_layout":
+        values = [[capacity_atlas.n_layout_at(i, j) for j in wid_idx] for i in len_idx]
+    else:
+        # 热力图按给定成本口径计算，不做需求仿真
+        base = req.model_dump(exclude={"metric", "length_min_m", "length_max_m", "width_min_m", "width_max_m", "step_m"})
+        base["trucks_per_day"] = None
+        values = []
+        for length in lengths:
+            row = []
+            for width in widths:
+                base["site_length_m"] = length
+                base["site_width_m"] = width
+                row.append(calc_plan(base)[metric])
+            values.append(row)
+
+    site = None
+    if req.site_length_m > 0 and req.site_width_m > 0:
+        site = capacity_atlas.lookup(req.site_length_m, req.site_width_m)
+        if metric != "n_layout":
+            site[metric] = calc_plan({**req.model_dump(), "trucks_per_day": None})[metric]
+
+    return {
+        "metric": metric,
+        "rules_version": RULES_VERSION,
+        "lengths_m": lengths,
+        "widths_m": widths,
+        "values": values,      # values[长度下标][宽度下标]
+        "site": site,
+    }
+
+
+@app.post("/api/capacity/heatmap")
+async def capacity_heatmap(req: HeatmapRequest):
+    return await run_in_threadpool(_heatmap, req)
+
+
+@app.post("/api/storage/optimize")
+def storage_optimize(req: StorageRequest):
+    profile = req.hourly_load_profile
+    if req.grid_cap_kva is None:
+        raise HTTPException(status_code=422, detail="请填写电网接入容量 grid_cap_kva")
+    if profile is not None and len(profile) not in (24, 8760):
+        raise HTTPException(status_code=422, detail="hourly_load_profile 应为 24 或 8760 个值")
+    data = req.model_dump(exclude={"hourly_load_profile", "life_years", "unserved_tolerance", "max_storage_hours"})
+    return optimize_storage(
+        data,
+        hourly_load_kwh=profile,
+        life_years=req.life_years,
+        unserved_tolerance=req.unserved_tolerance,
+        max_hours=req.max_storage_hours,
+    )
+
+
+@app.get("/api/equipment")
+def equipment_catalog():
+    return list_catalog()
+
+
+@app.post("/api/equipment/optimize")
+def equipment_optimize(req: EquipmentRequest):
+    data = req.model_dump(exclude={"objective", "discount_rate", "horizon_years", "models"})
+    try:
+        return optimize_equipment(
+            data,
+            objective=req.objective,
+            discount_rate=req.discount_rate,
+            horizon_years=req.horizon_years,
+            models=req.models,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.post("/api/sizing/min-site")
+def sizing_min_site(req: SizingRequest):
+    """反算：目标桩数 → 面积最小的场地长宽（逐宽度分段解析求解，可固定长或宽、限定长宽比）"""
+    data = req.model_dump(exclude={"target_piles", "aspect_min", "aspect_max", "pareto_max_piles"})
+    try:
+        return size_site(
+            req.target_piles,
+            length=req.site_length_m,
+            width=req.site_width_m,
+            aspect_min=req.aspect_min,
+            aspect_max=req.aspect_max,
+            pareto_max_piles=req.pareto_max_piles,
+            d=data,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.post("/api/phasing/optimize")
+def phasing_optimize(req: PhasingRequest):
+    if bool(req.ramp_kwh_per_day) == bool(req.ramp_trucks_per_day):
+        raise HTTPException(status_code=422, detail="请提供 ramp_kwh_per_day 或 ramp_trucks_per_day 其中之一")
+    data = req.model_dump(exclude={
+        "ramp_kwh_per_day", "ramp_trucks_per_day", "discount_rate", "phase_fixed_cost_yuan", "transformer_model", "tail_years",
+    })
+    try:
+        return plan_phasing(
+            data,
+            demand_kwh_per_day=req.ramp_kwh_per_day,
+            trucks_per_day=req.ramp_trucks_per_day,
+            discount_rate=req.discount_rate,
+            phase_fixed_cost=req.phase_fixed_cost_yuan,
+            transformer_model=req.transformer_model,
+            tail_years=req.tail_years,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/api/tariffs")
+def tariffs():
+    return list_regions()
+
+
+@app.get("/api/regions/suggest")
+def regions_suggest(q: str = "", limit: int = SUGGEST_LIMIT):
+    """地区输入联想：汉字/全拼/首字母前缀 + 单字错漏的模糊匹配，返回带地区预设参数的候选"""
+    limit = max(1, min(limit, 50))
+    return {"query": q, "items": region_index.suggest(q, limit)}
+
+
+@app.get("/api/regions/resolve")
+def regions_resolve(location: str = ""):
+    """
+    从场站位置文本识别地区及其预设参数（/api/calculate 自动补齐默认值用同一口径）。
+    无法确定地区时 place 为空，candidates 列出文本中出现的地名供用户选择。
+    """
+    place = region_index.resolve(location)
+    return {"location": location, "place": place, "candidates": [] if place else region_index.candidates(location)}
+
+
+@app.post("/api/simulate")
+def simulate(req: SimulateRequest):
+    data = req.model_dump()
+    battery_mix = [(kwh, p) for kwh, p in req.battery_mix] if req.battery_mix else None
+    result = calc_plan_simulated(
+        data,
+        hourly_profile=req.hourly_profile,
+        weekday_factors=req.weekday_factors,
+        battery_mix=battery_mix,
+        arrival_soc=(min(req.arrival_soc_min, req.arrival_soc_max), max(req.arrival_soc_min, req.arrival_soc_max)),
+        target_soc=req.target_soc,
+        max_c_rate=req.max_c_rate,
+        handling_minutes=req.handling_minutes,
+        patience_minutes=req.patience_minutes,
+        seed=req.seed,
+        include_hourly=req.include_hourly,
+    )
+    return result
+
+
+# =========================
+# 报告样式：正文/标题/表格/金融附件等命名样式，模板只生成一次
+# =========================
+STYLE_BASE = "Report Base"              # 宋体/Times New Roman 14pt，1.5倍行距，不缩进
+STYLE_BODY = "Report Body"              # 正文：首行缩进2字符
+STYLE_HEADING = "Report Heading"        # 一级标题/加粗文字
+STYLE_COVER_TITLE = "Report Cover Title"  # 封面标题：22pt加粗居中
+STYLE_FINANCE = "Report Finance"        # 金融附件正文：单倍行距，段前段后0，首行缩进
+STYLE_BLANK = "Report Blank"            # 章节间空行
+STYLE_TABLE_TEXT = "Report Table Text"  # 表格文字：居中，段前段后6pt，单倍行距
+STYLE_TABLE_HEADER = "Report Table Header"
+STYLE_TABLE = "Report Table"            # 表格：黑色单线边框，整表居中
+
+
+@lru_cache(maxsize=1)
+def report_template_bytes() -> bytes:
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    from docx.shared import Pt
+
+    doc = Document()
+    styles = doc.styles
+
+    def add_paragraph_style(name, base, size_pt=None, bold=None, line_spacing=None,
+                            first_line_indent=None, space_before=None, space_after=None, align=None):
+        style = styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = base
+        style.quick_style = True
+        if size_pt is not None:
+            style.font.size = Pt(size_pt)
+        if bold is not None:
+            style.font.bold = bold
+        fmt = style.paragraph_format
+        if line_spacing is not None:
+            fmt.line_spacing = line_spacing
+        if first_line_indent is not None:
+            fmt.first_line_indent = first_line_indent
+        if space_before is not None:
+            fmt.space_before = space_before
+        if space_after is not None:
+            fmt.space_after = space_after
+        if align is not None:
+            fmt.alignment = align
+        return style
+
+    # 中文：宋体；英文/数字：Times New Roman
+    base = add_paragraph_style(STYLE_BASE, styles["Normal"], size_pt=14, bold=False, line_spacing=1.5)
+    base.font.name = "Times New Roman"
+    base.element.get_or_add_rPr().get_or_add_rFonts().set(qn("w:eastAsia"), "宋体")
+
+    indent_2ch = Pt(28)  # 首行缩进 2 字符（宋体14号下约等于 28pt）
+    add_paragraph_style(STYLE_BODY, base, first_line_indent=indent_2ch)
+    add_paragraph_style(STYLE_HEADING, base, bold=True)
+    add_paragraph_style(STYLE_COVER_TITLE, base, size_pt=22, bold=True, align=WD_ALIGN_PARAGRAPH.CENTER)
+    add_paragraph_style(STYLE_FINANCE, base, line_spacing=1.0, first_line_indent=indent_2ch,
+                        space_before=Pt(0), space_after=Pt(0))
+    add_paragraph_style(STYLE_BLANK, styles["Normal"], line_spacing=1.5)
+    table_text = add_paragraph_style(STYLE_TABLE_TEXT, base, line_spacing=1.0, space_before=Pt(6),
+                                     space_after=Pt(6), align=WD_ALIGN_PARAGRAPH.CENTER)
+    add_paragraph_style(STYLE_TABLE_HEADER, table_text, bold=True)
+
+    table_style = styles.add_style(STYLE_TABLE, WD_STYLE_TYPE.TABLE)
+    table_style.base_style = styles["Normal Table"]
+    tbl_pr = OxmlElement("w:tblPr")
+    jc = OxmlElement("w:jc")
+    jc.set(qn("w:val"), "center")
+    tbl_pr.append(jc)
+    borders = OxmlElement("w:tblBorders")
+    for edge in ("top", "left", "bottom", "right", "insideH", "insideV"):
+        elem = OxmlElement(f"w:{edge}")
+        elem.set(qn("w:val"), "single")
+        elem.set(qn("w:sz"), "8")
+        elem.set(qn("w:space"), "0")
+        elem.set(qn("w:color"), "000000")
+        borders.append(elem)
+    tbl_pr.append(borders)
+    table_style.element.append(tbl_pr)
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def normalize_attachments_selected(value):
+    if isinstance(value, list):
+        items = value
+    elif isinstance(value, str):
+        items = [value]
+    else:
+        items = []
+
+    normalized = []
+    for item in items:
+        if not isinstance(item, str):
+            continue
+        v = item.strip().lower()
+        if v in {"layout", "product", "finance"} and v not in normalized:
+            normalized.append(v)
+    return normalized
+
+
+@profiled
 def build_report_doc(raw_data: dict) -> Document:
     req = CalcRequest.model_validate(raw_data)
     data = req.model_dump()
     result = calc_plan(data)
 
-    # ===== 生成 Word =====
-    doc = Document()
+    # ===== 生成 Word（基于预置样式的模板） =====
+    doc = Document(io.BytesIO(report_template_bytes()))
 
     from docx.shared import Pt
     from docx.enum.text import WD_ALIGN_PARAGRAPH
     from docx.enum.section import WD_SECTION_START
-    from docx.enum.table import WD_ALIGN_VERTICAL, WD_ROW_HEIGHT_RULE, WD_TABLE_ALIGNMENT
+    from docx.enum.table import WD_ALIGN_VERTICAL, WD_ROW_HEIGHT_RULE
     from docx.oxml import OxmlElement
     from docx.oxml.ns import qn
 
@@ -119,131 +942,80 @@ def build_report_doc(raw_data: dict) -> Document:
     title_text = f"{site_location}重卡充电站初步设计方案"
 
     # =========================
-    # 通用：字体 + 段落格式
+    # 通用：段落/表格按命名样式引用（样式在模板中只定义一次）
     # =========================
     INDENT_2CH = Pt(28)  # 首行缩进 2 字符（宋体14号下约等于 28pt）
-    LINE_SPACING = 1.5   # 1.5倍行距
     BULLET = "■"         # 统一条目标识符号
 
-    def set_cn_font(run, size_pt=14, bold=False, font_name="宋体"):
-        """
-        中文：宋体
-        英文/数字：Times New Roman
-        """
-        run.font.size = Pt(size_pt)
-        run.bold = bold
-
-        r = run._element
-        rPr = r.get_or_add_rPr()
-        rFonts = rPr.get_or_add_rFonts()
-
-        # 中文字体
-        rFonts.set(qn('w:eastAsia'), font_name)
-
-        # 英文 & 数字字体
-        rFonts.set(qn('w:ascii'), 'Times New Roman')
-        rFonts.set(qn('w:hAnsi'), 'Times New Roman')
-
-
-    def format_para(p, first_line_indent=False):
-        p.paragraph_format.line_spacing = LINE_SPACING
-        if first_line_indent:
-            p.paragraph_format.first_line_indent = INDENT_2CH
-
-    def add_cover_line(text, size_pt=14, bold=False, align_center=True):
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER if align_center else WD_ALIGN_PARAGRAPH.LEFT
-        run = p.add_run(text)
-        set_cn_font(run, size_pt=size_pt, bold=bold, font_name="宋体")
-        format_para(p, first_line_indent=False)
+    styles = doc.styles
+    st_base = styles[STYLE_BASE].style_id
+    st_body = styles[STYLE_BODY].style_id
+    st_heading = styles[STYLE_HEADING].style_id
+    st_cover_title = styles[STYLE_COVER_TITLE].style_id
+    st_finance = styles[STYLE_FINANCE].style_id
+    st_blank = styles[STYLE_BLANK].style_id
+    st_table_text = styles[STYLE_TABLE_TEXT].style_id
+    st_table_header = styles[STYLE_TABLE_HEADER].style_id
+    st_table = styles[STYLE_TABLE]
+
+    def styled(p, style_id):
+        # 直接写 pStyle：python-docx 的 p.style 赋值每次都会线性扫描全部样式
+        p._p.get_or_add_pPr().style = style_id
+        return p
+
+    def add_styled(text, style_id):
+        return styled(doc.add_paragraph(text), style_id)
+
+    def add_cover_line(text, bold=False, align_center=True):
+        p = add_styled(text, st_heading if bold else st_base)
+        if align_center:
+            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
     def add_title(text):
         # 一级标题：宋体14pt加粗，不缩进，1.5倍行距
-        p = doc.add_paragraph()
-        run = p.add_run(text)
-        set_cn_font(run, size_pt=14, bold=True, font_name="宋体")
-        format_para(p, first_line_indent=False)
+        add_styled(text, st_heading)
 
     def add_body(text):
         # 正文：宋体14pt不加粗，首行缩进2字符，1.5倍行距
-        p = doc.add_paragraph()
-        run = p.add_run(text)
-        set_cn_font(run, size_pt=14, bold=False, font_name="宋体")
-        format_para(p, first_line_indent=True)
+        add_styled(text, st_body)
 
     def add_finance_body(text):
         # 金融附件正文：宋体14pt，单倍行距，段前段后0磅，首行缩进2字符
-        p = doc.add_paragraph()
-        run = p.add_run(text)
-        set_cn_font(run, size_pt=14, bold=False, font_name="宋体")
-        p.paragraph_format.line_spacing = 1.0
-        p.paragraph_format.space_before = Pt(0)
-        p.paragraph_format.space_after = Pt(0)
-        p.paragraph_format.first_line_indent = INDENT_2CH
+        add_styled(text, st_finance)
 
     def add_item(text):
         # 条目：用 ■ 符号；不做首行缩进（避免符号被挤歪），1.5倍行距
-        p = doc.add_paragraph()
-        run = p.add_run(f"{BULLET} {text}")
-        set_cn_font(run, size_pt=14, bold=False, font_name="宋体")
-        format_para(p, first_line_indent=False)
+        add_styled(f"{BULLET} {text}", st_base)
 
     def add_blank_line():
         # 章节结束空一行
-        p = doc.add_paragraph("")
-        p.paragraph_format.line_spacing = LINE_SPACING
-
-    def format_report_table(table):
-        table.alignment = WD_TABLE_ALIGNMENT.CENTER
-
-        tbl = table._tbl
-        tbl_pr = tbl.tblPr
-        borders = OxmlElement('w:tblBorders')
-        for edge in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'):
-            elem = OxmlElement(f'w:{edge}')
-            elem.set(qn('w:val'), 'single')
-            elem.set(qn('w:sz'), '8')
-            elem.set(qn('w:space'), '0')
-            elem.set(qn('w:color'), '000000')
-            borders.append(elem)
-        tbl_pr.append(borders)
-
-        for row in table.rows:
-            for cell in row.cells:
-                cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-                for p in cell.paragraphs:
-                    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    p.paragraph_format.space_before = Pt(6)
-                    p.paragraph_format.space_after = Pt(6)
-                    p.paragraph_format.line_spacing = 1
+        add_styled("", st_blank)
 
     def add_simple_table(headers, rows):
+        # 边框、居中由表格样式提供；单元格文字只引用段落样式
         table = doc.add_table(rows=1, cols=len(headers))
+        table.style = st_table
         for i, text in enumerate(headers):
-            cell_p = table.rows[0].cells[i].paragraphs[0]
-            cell_p.paragraph_format.line_spacing = LINE_SPACING
-            run = cell_p.add_run(str(text))
-            set_cn_font(run, size_pt=14, bold=True, font_name="宋体")
+            cell = table.rows[0].cells[i]
+            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+            cell_p = cell.paragraphs[0]
+            styled(cell_p, st_table_header)
+            cell_p.add_run(str(text))
         for row in rows:
             cells = table.add_row().cells
             for i, text in enumerate(row):
+                cells[i].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
                 cell_p = cells[i].paragraphs[0]
-                run = cell_p.add_run(str(text))
-                set_cn_font(run, size_pt=14, bold=False, font_name="宋体")
-
-        format_report_table(table)
+                styled(cell_p, st_table_text)
+                cell_p.add_run(str(text))
 
     def add_body_bold(text, first_line_indent=False):
-        p = doc.add_paragraph()
-        run = p.add_run(text)
-        set_cn_font(run, size_pt=14, bold=True, font_name="宋体")
-        format_para(p, first_line_indent=first_line_indent)
+        p = add_styled(text, st_heading)
+        if first_line_indent:
+            p.paragraph_format.first_line_indent = INDENT_2CH
 
     def add_numbered(text):
-        p = doc.add_paragraph()
-        run = p.add_run(text)
-        set_cn_font(run, size_pt=14, bold=False, font_name="宋体")
-        format_para(p, first_line_indent=False)
+        add_styled(text, st_base)
 
     def _hide_table_borders(table):
         tbl = table._tbl
@@ -271,26 +1043,20 @@ def build_report_doc(raw_data: dict) -> Document:
         mid_cell = table.cell(1, 0)
         mid_cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
         mid_para = mid_cell.paragraphs[0]
-        mid_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = mid_para.add_run(title_text)
-        set_cn_font(run, size_pt=22, bold=True, font_name="宋体")
-        format_para(mid_para, first_line_indent=False)
+        styled(mid_para, st_cover_title)
+        mid_para.add_run(title_text)
 
         # 底部：编制单位/日期（左对齐+底部对齐）
         bottom_cell = table.cell(2, 0)
         bottom_cell.vertical_alignment = WD_ALIGN_VERTICAL.BOTTOM
 
         p1 = bottom_cell.paragraphs[0]
+        styled(p1, st_base)
         p1.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        r1 = p1.add_run("编制单位：广东盈通智联数字技术有限公司")
-        set_cn_font(r1, size_pt=14, bold=False, font_name="宋体")
-        format_para(p1, first_line_indent=False)
+        p1.add_run("编制单位：广东盈通智联数字技术有限公司")
 
-        p2 = bottom_cell.add_paragraph()
+        p2 = styled(bottom_cell.add_paragraph(f"编制日期：{datetime.now().strftime('%Y年%m月%d日')}"), st_base)
         p2.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        r2 = p2.add_run(f"编制日期：{datetime.now().strftime('%Y年%m月%d日')}")
-        set_cn_font(r2, size_pt=14, bold=False, font_name="宋体")
-        format_para(p2, first_line_indent=False)
 
     def _set_section_page_start(section, start_num=1):
         sect_pr = section._sectPr
@@ -308,11 +1074,10 @@ def build_report_doc(raw_data: dict) -> Document:
 
         header = section.header
         p = header.paragraphs[0] if header.paragraphs else header.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
         p.clear()
-        run = p.add_run("广东盈通智联数字技术有限公司")
-        set_cn_font(run, size_pt=14, bold=False, font_name="宋体")
-        format_para(p, first_line_indent=False)
+        styled(p, st_base)
+        p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        p.add_run("广东盈通智联数字技术有限公司")
 
     def _add_footer_page_field(section):
         footer = section.footer
@@ -338,36 +1103,11 @@ def build_report_doc(raw_data: dict) -> Document:
         run._r.append(fld_separate)
         run._r.append(fld_end)
     
-    def normalize_attachments_selected(value):
-        if isinstance(value, list):
-            items = value
-        elif isinstance(value, str):
-            items = [value]
-        else:
-            items = []
-
-        normalized = []
-        for item in items:
-            if not isinstance(item, str):
-                continue
-            v = item.strip().lower()
-            if v in {"layout", "product", "finance"} and v not in normalized:
-                normalized.append(v)
-        return normalized
-
     def add_attach_title(text):
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        run = p.add_run(text)
-        set_cn_font(run, size_pt=14, bold=True, font_name="宋体")
-        format_para(p, first_line_indent=False)
+        add_styled(text, st_heading)
 
     def add_attach_hint(text):
-        p = doc.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        run = p.add_run(text)
-        set_cn_font(run, size_pt=14, bold=False, font_name="宋体")
-        format_para(p, first_line_indent=False)
+        add_styled(text, st_base)
 
     def parse_layout_png_data_url(layout_png_data_url: str):
         if not layout_png_data_url:
@@ -491,15 +1231,20 @@ def build_report_doc(raw_data: dict) -> Document:
     add_body("根据场地条件、重卡充电需求以及设备功率配置，初步建议建设方案如下：")
 
     device_count = int(result.get('n_recommend', 0) or 0)
-    gun_count = device_count * 2
+    gun_count = device_count * int(data.get('guns_per_pile') or 2)
+    pile_spec = PILE_MODELS.get(data.get('pile_model') or "")
+    device_name = pile_spec["name"] if pile_spec else f"{float(data.get('pile_kva_per') or 400):g}kW一体机"
+    transformer_text = f"{int(result.get('power_capacity_kva', 0) or 0)}kVA"
+    if data.get('transformer_config'):
+        transformer_text += f"（{data['transformer_config']}）"
 
     add_simple_table(
         ["项目", "参数"],
         [
-            ["充电设备", "400kW一体机"],
+            ["充电设备", device_name],
             ["设备数量", f"{device_count}台"],
             ["充电枪数量", f"{gun_count}把"],
-            ["配套变压器容量", f"{int(result.get('power_capacity_kva', 0) or 0)}kVA"],
+            ["配套变压器容量", transformer_text],
             ["配套充电车位", f"{int(result.get('stalls', 0) or 0)}个"],
         ],
     )
@@ -546,18 +1291,20 @@ def build_report_doc(raw_data: dict) -> Document:
     payback = result.get('payback_net_years', None)
     payback_text = f"{round(float(payback), 2)}" if payback is not None else "N/A"
 
-    add_simple_table(
-        ["指标", "数值"],
-        [
-            ["年充电量", f"{int(result.get('energy_year_kwh', 0) or 0)}kWh"],
-            ["服务费", f"{round(float(data.get('service_fee_yuan_per_kwh', 0) or 0), 2)}元/kWh"],
-            ["年收入", f"{annual_revenue}万元"],
-            ["年租金", f"{annual_rent}万元"],
-            ["人工费用", f"{labor_cost}万元"],
-            ["净年现金流", f"{net_cashflow}万元"],
-            ["投资回收期", f"{payback_text}年"],
-        ],
-    )
+    revenue_rows = [
+        ["年充电量", f"{int(result.get('energy_year_kwh', 0) or 0)}kWh"],
+        ["服务费", f"{round(float(data.get('service_fee_yuan_per_kwh', 0) or 0), 2)}元/kWh"],
+        ["年收入", f"{annual_revenue}万元"],
+        ["年租金", f"{annual_rent}万元"],
+        ["人工费用", f"{labor_cost}万元"],
+        ["净年现金流", f"{net_cashflow}万元"],
+        ["投资回收期", f"{payback_text}年"],
+    ]
+    if result.get('tariff'):
+        energy_margin = round(float(result.get('energy_margin_year_yuan', 0) or 0) / 10000, 2)
+        revenue_rows.insert(3, ["电费价差", f"{energy_margin}万元"])
+
+    add_simple_table(["指标", "数值"], revenue_rows)
 
     add_body_bold("测算假设条件", first_line_indent=False)
     add_body("单枪充电量：1000度/枪/天")
@@ -626,39 +1373,21 @@ def build_report_doc(raw_data: dict) -> Document:
     return doc
 
 
-@app.post("/api/report_word")
-async def report_word(request: Request):
-    raw_data = await request.json()
-    if not isinstance(raw_data, dict):
-        raw_data = {}
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+REPORT_FILENAME = "trucksite_preliminary_design"
 
-    print("DEBUG /api/report_word keys:", sorted(list(raw_data.keys())))
-    doc = build_report_doc(raw_data)
-
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-    doc.save(tmp.name)
-    tmp.close()
-
-    return FileResponse(
-        tmp.name,
-        filename="trucksite_preliminary_design.docx",
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    )
-
-
-@app.post("/api/report_pdf")
-async def report_pdf(req: CalcRequest, request: Request):
-    data = req.model_dump()
 
-    raw_data = await request.json()
-    if not isinstance(raw_data, dict):
-        raw_data = {}
+@profiled
+def render_report_docx(raw_data: dict) -> bytes:
+    doc = build_report_doc(raw_data)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
 
-    merged_data = dict(data)
-    merged_data.update(raw_data)
 
-    print("DEBUG /api/report_pdf keys:", sorted(list(merged_data.keys())))
-    doc = build_report_doc(merged_data)
+@profiled
+def render_report_pdf(raw_data: dict) -> bytes:
+    doc = build_report_doc(raw_data)
 
     # 依赖 LibreOffice（soffice）进行 headless 转换：
     # Ubuntu 安装：
@@ -688,14 +1417,190 @@ async def report_pdf(req: CalcRequest, request: Request):
         if not pdf_path.exists() or pdf_path.stat().st_size <= 0:
             raise HTTPException(status_code=500, detail="PDF转换失败: 输出文件不存在或为空")
 
-        # 方案2：先在临时目录转换，再拷贝到 delete=False 临时文件返回
-        # 这样 TemporaryDirectory 可安全清理，同时 FileResponse 仍有稳定文件可读
-        out_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        out_pdf.close()
-        shutil.copyfile(str(pdf_path), out_pdf.name)
+        # 在临时目录内读出字节后再清理，响应不再依赖磁盘上的临时文件
+        return pdf_path.read_bytes()
+
+
+# 报告请求合并：相同规范化输入的并发导出（双击、多人同时导出同一方案）只渲染一次
+report_flight = SingleFlight()
+
+
+def report_key(raw_data: dict, fmt: str) -> str:
+    """
+    报告的规范化 key：CalcRequest 校验后的输入（含默认值）+ 附件选择 + 布局图哈希。
+    布局图只在选了布局附件时参与（否则不影响报告内容）；校验失败时按原始输入计算（渲染会同样报错）。
+    """
+    try:
+        inputs = CalcRequest.model_validate(raw_data).model_dump()
+    except ValidationError:
+        inputs = {k: v for k, v in raw_data.items() if k in CalcRequest.model_fields}
+    attachments = normalize_attachments_selected(raw_data.get("attachments_selected", []))
+    layout_hash = ""
+    if "layout" in attachments:
+        image = (raw_data.get("layout_png_data_url") or "").strip()
+        layout_hash = hashlib.sha256(image.encode("utf-8")).hexdigest()
+    canonical = json.dumps(
+        {"fmt": fmt, "version": REPORT_VERSION, "inputs": inputs, "attachments": attachments, "layout": layout_hash},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
 
-    return FileResponse(
-        out_pdf.name,
-        filename="trucksite_preliminary_design.pdf",
-        media_type="application/pdf",
+
+async def render_report(raw_data: dict, fmt: str) -> bytes:
+    render = render_report_pdf if fmt == "pdf" else render_report_docx
+    return await report_flight.do(report_key(raw_data, fmt), render, raw_data)
+
+
+def report_response(content: bytes, fmt: str) -> Response:
+    media_type = "application/pdf" if fmt == "pdf" else DOCX_MEDIA_TYPE
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{REPORT_FILENAME}.{fmt}"'},
     )
+
+
+@app.post("/api/report_word")
+async def report_word(request: Request):
+    raw_data = await request.json()
+    if not isinstance(raw_data, dict):
+        raw_data = {}
+
+    print("DEBUG /api/report_word keys:", sorted(list(raw_data.keys())))
+    return report_response(await render_report(raw_data, "docx"), "docx")
+
+
+@app.post("/api/report_pdf")
+async def report_pdf(req: CalcRequest, request: Request):
+    data = req.model_dump()
+
+    raw_data = await request.json()
+    if not isinstance(raw_data, dict):
+        raw_data = {}
+
+    merged_data = dict(data)
+    merged_data.update(raw_data)
+
+    print("DEBUG /api/report_pdf keys:", sorted(list(merged_data.keys())))
+    return report_response(await render_report(merged_data, "pdf"), "pdf")
+
+
+@app.get("/api/report/metrics")
+def report_metrics():
+    """报告请求合并统计：coalesced 为等待在途渲染、未重复渲染的请求数"""
+    return report_flight.metrics()
+
+
+@app.get("/api/profiles/{profile_id}")
+def get_profile(profile_id: str, request: Request):
+    """读取剖析摘要（需同样携带剖析口令）"""
+    token = request.headers.get("x-profile") or request.query_params.get("profile") or ""
+    if not authorized(token):
+        raise HTTPException(status_code=404, detail="Not Found")
+    summary = read_profile_summary(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在或已滚动删除")
+    return Response(content=summary, media_type="text/plain; charset=utf-8")
+
+
+# =========================
+# 项目库：保存测算、条件查询、报告产物复用
+# =========================
+def _validated_inputs(raw_data: dict) -> dict:
+    """CalcRequest 校验后的字段 + 报告用的附加字段（附件选择、布局图等）"""
+    try:
+        req = CalcRequest.model_validate(raw_data)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    inputs = dict(raw_data)
+    inputs.update(req.model_dump())
+    return inputs
+
+
+def _plan_for(inputs: dict) -> dict:
+    if inputs.get("trucks_per_day"):
+        return calc_plan_simulated(inputs)
+    return calc_plan(inputs)
+
+
+@app.post("/api/projects")
+async def save_project(request: Request):
+    raw_data = await request.json()
+    if not isinstance(raw_data, dict):
+        raise HTTPException(status_code=422, detail="请求体应为 JSON 对象")
+    inputs = _validated_inputs(raw_data)
+    result = _plan_for(inputs)
+    saved = project_store.save_project(inputs, result)
+    return {**saved, "result": result}
+
+
+@app.post("/api/projects/bulk")
+async def save_projects_bulk(request: Request):
+    raw_items = await request.json()
+    if not isinstance(raw_items, list):
+        raise HTTPException(status_code=422, detail="请求体应为 JSON 数组")
+    if len(raw_items) > MAX_BULK_PROJECTS:
+        raise HTTPException(status_code=413, detail=f"单次最多保存{MAX_BULK_PROJECTS}个项目")
+
+    items = []
+    for idx, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            raise HTTPException(status_code=422, detail=f"第{idx + 1}项应为 JSON 对象")
+        inputs = _validated_inputs(raw)
+        items.append((inputs, _plan_for(inputs)))
+    ids = project_store.bulk_save(items)
+    return {"count": len(ids), "ids": ids}
+
+
+@app.get("/api/projects")
+def list_projects(
+    location: str = "",
+    n_min: Optional[int] = None,
+    n_max: Optional[int] = None,
+    payback_max: Optional[float] = None,
+    created_from: Optional[float] = None,
+    created_to: Optional[float] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+):
+    try:
+        return project_store.query_projects(
+            location_prefix=location.strip(),
+            n_min=n_min,
+            n_max=n_max,
+            payback_max=payback_max,
+            created_from=created_from,
+            created_to=created_to,
+            sort=sort,
+            desc=order.lower() != "asc",
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/projects/{project_id}")
+def get_project(project_id: int):
+    project = project_store.get_project(project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="项目不存在")
+    return project
+
+
+@app.get("/api/projects/{project_id}/report")
+async def get_project_report(project_id: int, format: str = "docx"):
+    fmt = format.lower()
+    if fmt not in {"docx", "pdf"}:
+        raise HTTPException(status_code=400, detail="format 仅支持 docx / pdf")
+
+    content = project_store.get_report(project_id, fmt, REPORT_VERSION)
+    if content is None:
+        project = project_store.get_project(project_id)
+        if project is None:
+            raise HTTPException(status_code=404, detail="项目不存在")
+        content = await render_report(project["inputs"], fmt)
+        project_store.save_report(project_id, fmt, content, REPORT_VERSION)
+    return report_response(content, fmt)
@@ -0,0 +1,197 @@
+import math
+
+from app.calc import PILE_KVA_PER_KW, calc_plan, _f, _i
+from app.equipment import DEFAULT_DISCOUNT_RATE, TRANSFORMER_MODELS, annuity_factor, energy_margin_per_kwh
+from app.simulate import mean_energy_per_truck
+
+
+# =========================
+# 分期建设规划：按逐年需求爬坡，选择每年新增桩数（及变压器容量），使 NPV 最大
+# =========================
+# 口径：
+# - 桩数上限取 calc_plan 的推荐桩数（布局 + 电力约束）；已建桩只增不减；
+# - 每年交付电量 = min(当年日需求, 已建桩数 × 每桩枪数 × 单枪日电量上限) × 年运营天数；
+# - 首期投入全部土建（场地硬化），租金、人工自首期建成当年起计；
+# - 每期（当年有新增）另计一次进场/报装/调试固定费用，体现“分期越多、固定成本越高”；
+# - 指定变压器型号时按整台扩容（台数 = ceil(桩数×单桩kVA / 单台kVA)），否则按 kVA 连续计电力投资（同 calc_plan）；
+# - 投资发生在年初、经营现金流在年末，按折现率折现。
+PHASE_FIXED_COST_YUAN = 50_000.0
+PHASING_TAIL_YEARS = 5                # 规划期末的终值：按末年经营现金流再折现的年数
+MAX_PHASING_YEARS = 30
+
+
+def plan_phasing(
+    d: dict,
+    demand_kwh_per_day=None,
+    trucks_per_day=None,
+    discount_rate: float = DEFAULT_DISCOUNT_RATE,
+    phase_fixed_cost: float = PHASE_FIXED_COST_YUAN,
+    transformer_model: str = None,
+    tail_years: int = PHASING_TAIL_YEARS,
+) -> dict:
+    """
+    动态规划：状态 = (年份, 已建桩数)，决策 = 当年建到多少桩；
+    V[t][n] = max_{n' ≥ n} { -投资(n→n')/(1+r)^t + 经营现金流(t, n')/(1+r)^(t+1) + V[t+1][n'] }。
+    经营现金流按 (年份, 桩数) 记忆化；投资可拆为累计投资之差，用后缀最大值把每年的转移降到 O(桩数)，
+    15 年 × 数百桩为毫秒级。
+    """
+    if trucks_per_day:
+        per_truck = mean_energy_per_truck()
+        demand = [max(0.0, _f(x)) * per_truck for x in trucks_per_day]
+    else:
+        demand = [max(0.0, _f(x)) for x in (demand_kwh_per_day or [])]
+    if not demand:
+        raise ValueError("请提供逐年需求：demand_kwh_per_day（日电量 kWh）或 trucks_per_day（日车次）")
+    if len(demand) > MAX_PHASING_YEARS:
+        raise ValueError(f"规划年限不超过{MAX_PHASING_YEARS}年")
+    if transformer_model is not None and transformer_model not in TRANSFORMER_MODELS:
+        raise ValueError(f"未知的变压器型号：{transformer_model}")
+
+    base = calc_plan({**d, "trucks_per_day": None})
+    n_max = base["n_recommend"]
+    years = len(demand)
+
+    guns_per_pile = _i(d.get("guns_per_pile"), 2)
+    kwh_per_gun_per_day = _f(d.get("kwh_per_gun_per_day"), 1000)
+    days_per_year = _i(d.get("days_per_year"), 330)
+    unit_margin = _f(d.get("service_fee_yuan_per_kwh"), 0.3) + energy_margin_per_kwh(d)
+    pile_cost = _f(d.get("pile_cost_yuan_each"), 45000)
+    power_cost = _f(d.get("power_cost_yuan_per_kva"), 600)
+    kva_per_pile = _f(d.get("pile_kva_per"), 400) * PILE_KVA_PER_KW
+    civil_total = _f(d.get("civil_cost_yuan_per_sqm"), 200) * base["site_area_sqm"]
+    fixed_year = (
+        base["site_area_sqm"] * _f(d.get("rent_yuan_per_sqm_month"), 0) * 12
+        + _i(d.get("staff_count"), 0) * _f(d.get("salary_yuan_per_month"), 0) * 12
+    )
+    capacity_per_pile = guns_per_pile * kwh_per_gun_per_day
+
+    if transformer_model:
+        spec = TRANSFORMER_MODELS[transformer_model]
+
+        def transformer_units(n: int) -> int:
+            return math.ceil(n * kva_per_pile / spec["kva"] - 1e-9)
+
+        def transformer_kva(n: int) -> float:
+            return transformer_units(n) * spec["kva"]
+
+        def power_cost_cum(n: int) -> float:
+            return transformer_units(n) * (spec["price"] + power_cost * spec["kva"])
+    else:
+        def transformer_units(n: int):
+            return None
+
+        def transformer_kva(n: int) -> float:
+            return n * kva_per_pile
+
+        def power_cost_cum(n: int) -> float:
+            return power_cost * kva_per_pile * n
+
+    # 建到 n 桩的累计设备投资（桩 + 电力）；一期从 n0 扩到 n1 的投资 = 固定费用 + cum[n1] - cum[n0]（首期另加土建）
+    cum = [pile_cost * n + power_cost_cum(n) for n in range(n_max + 1)]
+
+    def capex(n0: int, n1: int) -> float:
+        if n1 == n0:
+            return 0.0
+        cost = phase_fixed_cost + cum[n1] - cum[n0]
+        if n0 == 0:
+            cost += civil_total
+        return cost
+
+    memo = {}
+
+    def operating(t: int, n: int) -> tuple:
+        """(年交付电量, 年经营现金流)，按 (年份, 桩数) 记忆化"""
+        key = (t, n)
+        if key not in memo:
+            if n <= 0:
+                memo[key] = (0.0, 0.0)
+            else:
+                energy = min(demand[t], n * capacity_per_pile) * days_per_year
+                memo[key] = (energy, energy * unit_margin - fixed_year)
+        return memo[key]
+
+    disc = [(1 + discount_rate) ** -t for t in range(years + 1)]
+    # 终值：规划期末按末年需求再经营 tail_years 年（避免期末几年“建了来不及回收”而一律不建）
+    tail = annuity_factor(discount_rate, tail_years) * disc[years]
+
+    # 逆推：value[n] 为第 t 年初已建 n 桩时、此后各年的最大折现值。
+    # 扩建投资可拆成 cum[n1] - cum[n]，故 max_{n1>n} 只需 g[n1] = 经营 + 后续价值 - cum[n1] 的后缀最大值，每年 O(桩数)。
+    value = [operating(years - 1, n)[1] * tail for n in range(n_max + 1)]
+    choice = [[0] * (n_max + 1) for _ in range(years)]
+    for t in range(years - 1, -1, -1):
+        g = [operating(t, n1)[1] * disc[t + 1] + value[n1] - cum[n1] * disc[t] for n1 in range(n_max + 1)]
+        suffix_best, suffix_arg = -math.inf, n_max
+        new_value = [0.0] * (n_max + 1)
+        for n in range(n_max, -1, -1):
+            stay = operating(t, n)[1] * disc[t + 1] + value[n]
+            best, best_n = stay, n
+            if suffix_best > -math.inf:
+                build = suffix_best + (cum[n] - phase_fixed_cost - (civil_total if n == 0 else 0.0)) * disc[t]
+                if build > stay + 1e-6:
+                    best, best_n = build, suffix_arg
+            new_value[n] = best
+            choice[t][n] = best_n
+            if g[n] > suffix_best + 1e-6:
+                suffix_best, suffix_arg = g[n], n
+        value = new_value
+
+    def schedule(targets: list) -> dict:
+        rows = []
+        n = 0
+        cumulative = 0.0
+        npv = 0.0
+        payback_year = None
+        for t, n1 in enumerate(targets):
+            invest = capex(n, n1)
+            energy, op_cf = operating(t, n1)
+            cash = op_cf - invest
+            cumulative += cash
+            npv += -invest * disc[t] + op_cf * disc[t + 1]
+            if payback_year is None and cumulative >= 0 and n1 > 0:
+                payback_year = t + 1
+            rows.append({
+                "year": t + 1,
+                "demand_kwh_per_day": demand[t],
+                "piles_added": n1 - n,
+                "piles_installed": n1,
+                "transformer_kva": transformer_kva(n1),
+                "transformer_units": transformer_units(n1),
+                "capex_yuan": invest,
+                "energy_served_kwh": energy,
+                "served_ratio": energy / (demand[t] * days_per_year) if demand[t] > 0 else None,
+                "operating_cash_flow_yuan": op_cf,
+                "cash_flow_yuan": cash,
+                "cumulative_cash_yuan": cumulative,
+            })
+            n = n1
+        terminal = operating(years - 1, n)[1] * tail
+        return {
+            "npv_yuan": npv + terminal,
+            "terminal_value_yuan": terminal,
+            "capex_total_yuan": sum(r["capex_yuan"] for r in rows),
+            "phases": sum(1 for r in rows if r["piles_added"] > 0),
+            "payback_year": payback_year,
+            "years": rows,
+        }
+
+    targets = []
+    n = 0
+    for t in range(years):
+        n = choice[t][n]
+        targets.append(n)
+    phased = schedule(targets)
+    full = schedule([n_max] * years)
+
+    return {
+        "n_max": n_max,
+        "horizon_years": years,
+        "discount_rate": discount_rate,
+        "phase_fixed_cost_yuan": phase_fixed_cost,
+        "tail_years": tail_years,
+        "transformer_model": transformer_model,
+        "kwh_per_truck": mean_energy_per_truck() if trucks_per_day else None,
+        "states_evaluated": len(memo),
+        "plan": phased,
+        "full_build": full,
+        "npv_gain_yuan": phased["npv_yuan"] - full["npv_yuan"],
+    }
@@ -0,0 +1,175 @@
+import contextvars
+import cProfile
+import functools
+import hmac
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import parse_qs
+
+
+# =========================
+# 按请求开启的性能剖析（cProfile）
+# =========================
+# 仅当设置了 TRUCKSITE_PROFILE_TOKEN 时启用：请求带 X-Profile: <token> 头或 ?profile=<token> 参数即剖析该请求。
+# 未设置口令时 profiled() 原样返回函数、中间件不注册，对正常请求零开销。
+PROFILE_TOKEN = os.environ.get("TRUCKSITE_PROFILE_TOKEN", "")
+PROFILE_DIR = Path(
+    os.environ.get("TRUCKSITE_PROFILE_DIR")
+    or Path(__file__).resolve().parent.parent / "data" / "profiles"
+)
+PROFILE_MAX_FILES = 50                 # 最多保留的剖析结果份数（按时间滚动删除最旧的）
+PROFILE_MAX_BYTES = 50 * 1024 * 1024   # 剖析目录总大小上限
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_TOP_N = 60                     # 文本摘要中列出的函数数
+PROFILE_LOCK_TIMEOUT_S = 30.0          # 等待其他剖析结束的上限，超时则本次调用不剖析
+
+# Python 3.12 起整个进程同一时刻只能有一个 cProfile 处于启用状态（sys.monitoring 工具槽），
+# 并发的剖析请求在此串行；等待超时或被其他剖析工具占用时照常执行、不剖析
+_profile_lock = threading.Lock()
+
+_session = contextvars.ContextVar("trucksite_profile_session", default=None)
+
+
+class ProfileSession:
+    """一次请求的剖析数据：各线程内的顶层 profiled 调用各自一个 Profile，结束时合并"""
+
+    def __init__(self, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.path = path
+        self.started = time.time()
+        self.profiles = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def run(self, fn, args, kwargs):
+        if getattr(self._local, "active", False):
+            # 已在本线程的剖析范围内（嵌套调用），直接执行
+            return fn(*args, **kwargs)
+        if not _profile_lock.acquire(timeout=PROFILE_LOCK_TIMEOUT_S):
+            return fn(*args, **kwargs)
+        try:
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:
+                # 其他剖析工具已启用（如外部 profiler）
+                return fn(*args, **kwargs)
+            self._local.active = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof.disable()
+                self._local.active = False
+                with self._lock:
+                    self.profiles.append(prof)
+        finally:
+            _profile_lock.release()
+
+
+def profiled(fn):
+    """标记需要剖析的入口函数；未启用剖析时原样返回"""
+    if not PROFILE_TOKEN:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        session = _session.get()
+        if session is None:
+            return fn(*args, **kwargs)
+        return session.run(fn, args, kwargs)
+
+    return wrapper
+
+
+def authorized(value: str) -> bool:
+    """剖析口令校验（常量时间比较）；未设置口令时一律拒绝"""
+    return bool(value) and hmac.compare_digest(value.encode("utf-8"), PROFILE_TOKEN.encode("utf-8"))
+
+
+def _rotate(directory: Path):
+    """按修改时间删除最旧的剖析结果，使份数与总大小都在上限内"""
+    groups = {}
+    for p in directory.glob("*.*"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        g = groups.setdefault(p.stem, [0.0, 0, []])
+        g[0] = max(g[0], st.st_mtime)
+        g[1] += st.st_size
+        g[2].append(p)
+    ordered = sorted(groups.values(), key=lambda g: g[0], reverse=True)
+    total = 0
+    for i, (_, size, files) in enumerate(ordered):
+        total += size
+        if i >= PROFILE_MAX_FILES or total > PROFILE_MAX_BYTES:
+            for f in files:
+                f.unlink(missing_ok=True)
+
+
+def save_session(session: ProfileSession, elapsed: float):
+    """写出 <id>.prof（pstats 格式，可用 snakeviz 等查看）与 <id>.txt（累计耗时排序的摘要）"""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    buf = io.StringIO()
+    buf.write(f"path: {session.path}\nstarted: {session.started:.3f}\nelapsed_s: {elapsed:.4f}\n\n")
+    if session.profiles:
+        stats = pstats.Stats(session.profiles[0], stream=buf)
+        for prof in session.profiles[1:]:
+            stats.add(prof)
+        stats.dump_stats(str(PROFILE_DIR / f"{session.id}.prof"))
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    else:
+        buf.write("本请求未经过被剖析的函数\n")
+    (PROFILE_DIR / f"{session.id}.txt").write_text(buf.getvalue(), encoding="utf-8")
+    _rotate(PROFILE_DIR)
+
+
+def read_profile_summary(profile_id: str):
+    if not profile_id.isalnum():
+        return None
+    path = PROFILE_DIR / f"{profile_id}.txt"
+    return path.read_text(encoding="utf-8") if path.exists() else None
+
+
+class ProfilingMiddleware:
+    """ASGI 中间件：口令匹配的请求在剖析会话中执行，响应头返回 X-Profile-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        value = ""
+        for name, raw in scope.get("headers", []):
+            if name == PROFILE_HEADER.encode("latin-1"):
+                value = raw.decode("latin-1")
+                break
+        if not value and b"profile=" in scope.get("query_string", b""):
+            value = (parse_qs(scope["query_string"].decode("latin-1")).get("profile") or [""])[0]
+        if not authorized(value):
+            return await self.app(scope, receive, send)
+
+        session = ProfileSession(scope.get("path", ""))
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER.lower().encode("latin-1"), session.id.encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        token = _session.set(session)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _session.reset(token)
+            save_session(session, time.perf_counter() - t0)
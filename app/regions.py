@@ -0,0 +1,430 @@
+from app.tariff import TARIFF_REGIONS
+
+
+# =========================
+# 地区参数预设：省/市（部分区县）→ 默认租金、服务费、单枪日电量、运营天数、分时电价地区
+# =========================
+# 数值为各地物流园区/干线场站的经验口径（示例），用户输入优先，仅补齐请求中未填写的字段。
+# 拼音随表维护（音节以空格分隔），不依赖拼音库；检索同时支持汉字、全拼、首字母。
+PRESET_LABELS = {
+    "rent_yuan_per_sqm_month": "租金",
+    "service_fee_yuan_per_kwh": "服务费",
+    "kwh_per_gun_per_day": "单枪日电量",
+    "days_per_year": "年运营天数",
+    "tariff_region": "分时电价地区",
+}
+
+# 省级默认：(拼音, 租金 元/㎡/月, 服务费 元/kWh, 单枪日电量 kWh, 年运营天数)；分时电价地区仅列已有电价表的省份
+PROVINCE_PRESETS = {
+    "北京": ("bei jing", 4.0, 0.45, 900.0, 330),
+    "天津": ("tian jin", 2.2, 0.40, 1100.0, 330),
+    "上海": ("shang hai", 4.5, 0.45, 950.0, 330),
+    "重庆": ("chong qing", 1.8, 0.35, 1000.0, 330),
+    "河北": ("he bei", 1.2, 0.35, 1200.0, 340),
+    "山西": ("shan xi", 1.0, 0.35, 1300.0, 340),
+    "内蒙古": ("nei meng gu", 0.8, 0.35, 1300.0, 330),
+    "辽宁": ("liao ning", 1.2, 0.35, 950.0, 320),
+    "吉林": ("ji lin", 1.0, 0.35, 850.0, 310),
+    "黑龙江": ("hei long jiang", 0.9, 0.35, 800.0, 300),
+    "江苏": ("jiang su", 2.2, 0.40, 1100.0, 340),
+    "浙江": ("zhe jiang", 2.5, 0.40, 1100.0, 340),
+    "安徽": ("an hui", 1.3, 0.35, 1000.0, 335),
+    "福建": ("fu jian", 1.8, 0.38, 950.0, 335),
+    "江西": ("jiang xi", 1.1, 0.35, 900.0, 330),
+    "山东": ("shan dong", 1.3, 0.35, 1150.0, 340),
+    "河南": ("he nan", 1.1, 0.35, 1100.0, 340),
+    "湖北": ("hu bei", 1.3, 0.35, 1000.0, 335),
+    "湖南": ("hu nan", 1.2, 0.35, 950.0, 335),
+    "广东": ("guang dong", 2.5, 0.40, 1050.0, 340),
+    "广西": ("guang xi", 1.1, 0.35, 900.0, 330),
+    "海南": ("hai nan", 1.8, 0.40, 700.0, 330),
+    "四川": ("si chuan", 1.3, 0.35, 950.0, 335),
+    "贵州": ("gui zhou", 1.0, 0.35, 800.0, 330),
+    "云南": ("yun nan", 1.0, 0.35, 800.0, 330),
+    "西藏": ("xi zang", 1.0, 0.40, 500.0, 300),
+    "陕西": ("shan xi", 1.2, 0.35, 1100.0, 335),
+    "甘肃": ("gan su", 0.8, 0.35, 900.0, 320),
+    "青海": ("qing hai", 0.7, 0.35, 700.0, 310),
+    "宁夏": ("ning xia", 0.8, 0.35, 1000.0, 320),
+    "新疆": ("xin jiang", 0.8, 0.35, 1000.0, 310),
+}
+
+PROVINCE_TARIFFS = {
+    "广东": "guangdong",
+    "江苏": "jiangsu",
+    "浙江": "zhejiang",
+    "山东": "shandong",
+    "河北": "hebei",
+    "四川": "sichuan",
+}
+
+# 地市：省 → {市: 拼音}；直辖市的下级为区
+CITIES = {
+    "北京": {"大兴": "da xing", "顺义": "shun yi", "通州": "tong zhou", "房山": "fang shan", "朝阳": "chao yang"},
+    "天津": {"滨海": "bin hai", "武清": "wu qing", "东丽": "dong li", "西青": "xi qing", "北辰": "bei chen"},
+    "上海": {"浦东": "pu dong", "嘉定": "jia ding", "松江": "song jiang", "青浦": "qing pu", "宝山": "bao shan",
+           "闵行": "min hang"},
+    "重庆": {"渝北": "yu bei", "江津": "jiang jin", "沙坪坝": "sha ping ba", "九龙坡": "jiu long po",
+           "巴南": "ba nan"},
+    "河北": {
+        "石家庄": "shi jia zhuang", "唐山": "tang shan", "秦皇岛": "qin huang dao", "邯郸": "han dan",
+        "邢台": "xing tai", "保定": "bao ding", "张家口": "zhang jia kou", "承德": "cheng de",
+        "沧州": "cang zhou", "廊坊": "lang fang", "衡水": "heng shui",
+    },
+    "山西": {"太原": "tai yuan", "大同": "da tong", "长治": "chang zhi", "临汾": "lin fen", "吕梁": "lv liang",
+           "运城": "yun cheng", "晋城": "jin cheng"},
+    "内蒙古": {"呼和浩特": "hu he hao te", "包头": "bao tou", "鄂尔多斯": "e er duo si", "乌海": "wu hai"},
+    "辽宁": {"沈阳": "shen yang", "大连": "da lian", "鞍山": "an shan", "营口": "ying kou"},
+    "吉林": {"长春": "chang chun", "吉林": "ji lin"},
+    "黑龙江": {"哈尔滨": "ha er bin", "大庆": "da qing"},
+    "江苏": {
+        "南京": "nan jing", "无锡": "wu xi", "徐州": "xu zhou", "常州": "chang zhou", "苏州": "su zhou",
+        "南通": "nan tong", "连云港": "lian yun gang", "淮安": "huai an", "盐城": "yan cheng",
+        "扬州": "yang zhou", "镇江": "zhen jiang", "泰州": "tai zhou", "宿迁": "su qian",
+    },
+    "浙江": {
+        "杭州": "hang zhou", "宁波": "ning bo", "温州": "wen zhou", "嘉兴": "jia xing", "湖州": "hu zhou",
+        "绍兴": "shao xing", "金华": "jin hua", "衢州": "qu zhou", "舟山": "zhou shan", "台州": "tai zhou",
+        "丽水": "li shui",
+    },
+    "安徽": {"合肥": "he fei", "芜湖": "wu hu", "蚌埠": "beng bu", "马鞍山": "ma an shan", "阜阳": "fu yang"},
+    "福建": {"福州": "fu zhou", "厦门": "xia men", "泉州": "quan zhou", "漳州": "zhang zhou"},
+    "江西": {"南昌": "nan chang", "赣州": "gan zhou", "九江": "jiu jiang"},
+    "山东": {
+        "济南": "ji nan", "青岛": "qing dao", "淄博": "zi bo", "枣庄": "zao zhuang", "东营": "dong ying",
+        "烟台": "yan tai", "潍坊": "wei fang", "济宁": "ji ning", "泰安": "tai an", "威海": "wei hai",
+        "日照": "ri zhao", "临沂": "lin yi", "德州": "de zhou", "聊城": "liao cheng", "滨州": "bin zhou",
+        "菏泽": "he ze",
+    },
+    "河南": {"郑州": "zheng zhou", "洛阳": "luo yang", "新乡": "xin xiang", "许昌": "xu chang",
+           "南阳": "nan yang", "商丘": "shang qiu", "周口": "zhou kou"},
+    "湖北": {"武汉": "wu han", "宜昌": "yi chang", "襄阳": "xiang yang", "十堰": "shi yan"},
+    "湖南": {"长沙": "chang sha", "株洲": "zhu zhou", "岳阳": "yue yang", "衡阳": "heng yang"},
+    "广东": {
+        "广州": "guang zhou", "深圳": "shen zhen", "珠海": "zhu hai", "汕头": "shan tou", "佛山": "fo shan",
+        "韶关": "shao guan", "湛江": "zhan jiang", "肇庆": "zhao qing", "江门": "jiang men",
+        "茂名": "mao ming", "惠州": "hui zhou", "梅州": "mei zhou", "汕尾": "shan wei", "河源": "he yuan",
+        "阳江": "yang jiang", "清远": "qing yuan", "东莞": "dong guan", "中山": "zhong shan",
+        "潮州": "chao zhou", "揭阳": "jie yang", "云浮": "yun fu",
+    },
+    "广西": {"南宁": "nan ning", "柳州": "liu zhou", "桂林": "gui lin", "钦州": "qin zhou"},
+    "海南": {"海口": "hai kou", "三亚": "san ya"},
+    "四川": {
+        "成都": "cheng du", "自贡": "zi gong", "攀枝花": "pan zhi hua", "泸州": "lu zhou", "德阳": "de yang",
+        "绵阳": "mian yang", "广元": "guang yuan", "遂宁": "sui ning", "内江": "nei jiang", "乐山": "le shan",
+        "南充": "nan chong", "眉山": "mei shan", "宜宾": "yi bin", "广安": "guang an", "达州": "da zhou",
+        "雅安": "ya an", "巴中": "ba zhong", "资阳": "zi yang", "阿坝": "a ba", "甘孜": "gan zi",
+        "凉山": "liang shan",
+    },
+    "贵州": {"贵阳": "gui yang", "遵义": "zun yi", "六盘水": "liu pan shui"},
+    "云南": {"昆明": "kun ming", "曲靖": "qu jing", "玉溪": "yu xi"},
+    "西藏": {"拉萨": "la sa"},
+    "陕西": {"西安": "xi an", "榆林": "yu lin", "咸阳": "xian yang", "宝鸡": "bao ji"},
+    "甘肃": {"兰州": "lan zhou", "酒泉": "jiu quan"},
+    "青海": {"西宁": "xi ning"},
+    "宁夏": {"银川": "yin chuan"},
+    "新疆": {"乌鲁木齐": "wu lu mu qi", "哈密": "ha mi", "昌吉": "chang ji"},
+}
+
+# 区县（物流集中的几个）：(省, 市) → {区: 拼音}
+DISTRICTS = {
+    ("广东", "广州"): {"白云": "bai yun", "番禺": "pan yu", "黄埔": "huang pu", "花都": "hua du",
+                     "增城": "zeng cheng", "南沙": "nan sha"},
+    ("广东", "深圳"): {"龙岗": "long gang", "宝安": "bao an", "龙华": "long hua", "坪山": "ping shan",
+                     "光明": "guang ming"},
+    ("广东", "佛山"): {"顺德": "shun de", "南海": "nan hai", "三水": "san shui", "高明": "gao ming",
+                     "禅城": "chan cheng"},
+    ("江苏", "苏州"): {"昆山": "kun shan", "吴江": "wu jiang", "常熟": "chang shu", "张家港": "zhang jia gang"},
+    ("浙江", "金华"): {"义乌": "yi wu"},
+    ("河北", "廊坊"): {"固安": "gu an"},
+    ("山东", "临沂"): {"兰山": "lan shan"},
+}
+
+# 市/区级差异（在省级默认上覆盖）：大城市租金更高，港口/钢铁/煤炭城市重卡密度更高
+PRESET_OVERRIDES = {
+    ("广东", "广州"): {"rent_yuan_per_sqm_month": 3.5, "service_fee_yuan_per_kwh": 0.45},
+    ("广东", "深圳"): {"rent_yuan_per_sqm_month": 5.0, "service_fee_yuan_per_kwh": 0.50, "kwh_per_gun_per_day": 1200.0},
+    ("广东", "东莞"): {"rent_yuan_per_sqm_month": 3.0},
+    ("广东", "佛山"): {"rent_yuan_per_sqm_month": 2.8},
+    ("江苏", "苏州"): {"rent_yuan_per_sqm_month": 3.0},
+    ("江苏", "连云港"): {"kwh_per_gun_per_day": 1300.0},
+    ("浙江", "杭州"): {"rent_yuan_per_sqm_month": 3.2, "service_fee_yuan_per_kwh": 0.45},
+    ("浙江", "宁波"): {"rent_yuan_per_sqm_month": 2.8, "kwh_per_gun_per_day": 1350.0},
+    ("浙江", "金华", "义乌"): {"kwh_per_gun_per_day": 1250.0},
+    ("山东", "青岛"): {"rent_yuan_per_sqm_month": 2.0, "kwh_per_gun_per_day": 1300.0},
+    ("山东", "日照"): {"kwh_per_gun_per_day": 1300.0},
+    ("山东", "临沂"): {"kwh_per_gun_per_day": 1250.0},
+    ("河北", "唐山"): {"kwh_per_gun_per_day": 1500.0, "days_per_year": 345},
+    ("河北", "邯郸"): {"kwh_per_gun_per_day": 1350.0},
+    ("山西", "大同"): {"kwh_per_gun_per_day": 1400.0},
+    ("山西", "吕梁"): {"kwh_per_gun_per_day": 1450.0},
+    ("内蒙古", "鄂尔多斯"): {"kwh_per_gun_per_day": 1500.0},
+    ("内蒙古", "包头"): {"kwh_per_gun_per_day": 1400.0},
+    ("陕西", "榆林"): {"kwh_per_gun_per_day": 1450.0},
+    ("四川", "成都"): {"rent_yuan_per_sqm_month": 2.0, "kwh_per_gun_per_day": 1050.0},
+    ("湖北", "武汉"): {"rent_yuan_per_sqm_month": 1.8},
+    ("河南", "郑州"): {"rent_yuan_per_sqm_month": 1.6, "kwh_per_gun_per_day": 1200.0},
+    ("福建", "厦门"): {"rent_yuan_per_sqm_month": 2.8},
+}
+
+LEVEL_NAMES = {0: "省", 1: "市", 2: "区县"}
+
+SUGGEST_LIMIT = 8
+SUGGEST_BUCKET = 20                   # 每个前缀键最多保留的候选数（按层级/名称长度排序后截断）
+# 模糊匹配的最短查询长度：两字地名错一字即与大量地名“相似”，汉字至少 3 字、拼音至少 4 个字母才做模糊
+FUZZY_MIN_HANZI = 3
+FUZZY_MIN_PINYIN = 4
+# 名称后缀：查询与匹配前去掉（“广州市白云区”→ 广州、白云）
+NAME_SUFFIXES = ("特别行政区", "自治区", "自治州", "新区", "省", "市", "区", "县")
+# 地名后紧跟这些字时是街道名（“中山路”“南京路”），不作为地区
+STREET_SUFFIXES = ("路", "街", "道", "巷", "大道", "大街", "大桥")
+
+
+def _strip_suffix(name: str) -> str:
+    for suffix in NAME_SUFFIXES:
+        if len(name) > len(suffix) + 1 and name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def _normalize(q: str) -> str:
+    """查询归一化：去空白、小写、去掉行政区划后缀"""
+    q = "".join((q or "").split()).lower()
+    return _strip_suffix(q)
+
+
+def _deletes(key: str) -> set:
+    """编辑距离 1 的删除变体（SymSpell）"""
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """a、b 之间是否最多一次插入/删除/替换/相邻交换"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        return i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    return a[i:] == b[i + 1:]
+
+
+def build_places() -> list:
+    """展开预设表：每个省/市/区一条，参数按 省 → 市 → 区 逐级覆盖"""
+    places = []
+
+    def add(level, province, city, district, pinyin, preset):
+        name = district or city or province
+        places.append({
+            "name": name,
+            "full_name": province + (city or "") + (district or ""),
+            "level": level,
+            "province": province,
+            "city": city,
+            "district": district,
+            "pinyin": pinyin.replace(" ", ""),
+            "initials": "".join(s[0] for s in pinyin.split()),
+            "preset": preset,
+        })
+
+    for province, (pinyin, rent, fee, kwh, days) in PROVINCE_PRESETS.items():
+        base = {
+            "rent_yuan_per_sqm_month": rent,
+            "service_fee_yuan_per_kwh": fee,
+            "kwh_per_gun_per_day": kwh,
+            "days_per_year": days,
+            "tariff_region": PROVINCE_TARIFFS.get(province),
+        }
+        add(0, province, None, None, pinyin, base)
+        for city, city_pinyin in CITIES.get(province, {}).items():
+            city_preset = {**base, **PRESET_OVERRIDES.get((province, city), {})}
+            add(1, province, city, None, city_pinyin, city_preset)
+            for district, district_pinyin in DISTRICTS.get((province, city), {}).items():
+                preset = {**city_preset, **PRESET_OVERRIDES.get((province, city, district), {})}
+                add(2, province, city, district, district_pinyin, preset)
+    return places
+
+
+class RegionIndex:
+    """
+    启动时一次性建立的内存索引，查询均为字典查找：
+    - 前缀索引：汉字名、全拼、首字母的每个前缀 → 已排好序的候选（省 > 市 > 区县，同级名称短者优先），每键截断；
+    - 模糊索引（SymSpell）：汉字名/全拼的“删一个字符”变体 → 候选，查询时取查询本身及其删除变体去查，
+      覆盖一次错字/漏字/多字/相邻颠倒，再按编辑距离复核；
+    - 位置解析：自由文本（如“佛山顺德物流园”）按已知地名最长匹配，优先更具体的层级。
+    """
+
+    def __init__(self, places: list):
+        self.places = places
+        self._prefix = {}
+        self._fuzzy = {}
+        self._names = {}
+        self._max_name_len = 0
+        order = sorted(range(len(places)), key=lambda i: (places[i]["level"], len(places[i]["name"]), i))
+        for i in order:
+            p = places[i]
+            names = {p["name"], p["full_name"]}
+            for key in names | {p["pinyin"], p["initials"]}:
+                for end in range(1, len(key) + 1):
+                    bucket = self._prefix.setdefault(key[:end], [])
+                    if len(bucket) < SUGGEST_BUCKET and i not in bucket:
+                        bucket.append(i)
+            for key in (p["name"], p["pinyin"]):
+                for variant in _deletes(key) | {key}:
+                    self._fuzzy.setdefault(variant, []).append((i, key))
+            for name in names:
+                self._names.setdefault(name, []).append(i)
+                self._max_name_len = max(self._max_name_len, len(name))
+        self._rank = {i: r for r, i in enumerate(order)}
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def _item(self, i: int, match: str) -> dict:
+        p = self.places[i]
+        return {
+            "name": p["name"],
+            "full_name": p["full_name"],
+            "level": LEVEL_NAMES[p["level"]],
+            "province": p["province"],
+            "city": p["city"],
+            "district": p["district"],
+            "pinyin": p["pinyin"],
+            "match": match,
+            "preset": p["preset"],
+        }
+
+    def suggest(self, q: str, limit: int = SUGGEST_LIMIT) -> list:
+        """输入联想：先按前缀，候选不足时补模糊匹配"""
+        key = _normalize(q)
+        if not key:
+            return []
+        hits = list(self._prefix.get(key, ()))[:limit]
+        items = [self._item(i, "prefix") for i in hits]
+        if len(items) < limit and len(key) >= (FUZZY_MIN_PINYIN if key.isascii() else FUZZY_MIN_HANZI):
+            seen = set(hits)
+            fuzzy = set()
+            for variant in _deletes(key) | {key}:
+                for i, target in self._fuzzy.get(variant, ()):
+                    if i not in seen and _within_one_edit(key, target):
+                        fuzzy.add(i)
+            for i in sorted(fuzzy, key=self._rank.__getitem__)[: limit - len(items)]:
+                items.append(self._item(i, "fuzzy"))
+        return items
+
+    def _matches(self, text: str) -> list:
+        """文本中的地名：[(起点, 终点, 候选 id)]，每处取最长匹配、互不重叠；紧跟“路/街”等的是街道名，不计"""
+        matches = []
+        n = len(text)
+        start = 0
+        while start < n:
+            for end in range(min(n, start + self._max_name_len), start, -1):
+                ids = self._names.get(text[start:end])
+                if ids:
+                    break
+            else:
+                start += 1
+                continue
+            if not text.startswith(STREET_SUFFIXES, end):
+                matches.append((start, end, ids))
+            start = end
+        return matches
+
+    def _contains(self, parent: int, child: int) -> bool:
+        """parent 是否为 child 本身或其上级"""
+        a, b = self.places[parent], self.places[child]
+        if a["level"] > b["level"] or a["province"] != b["province"]:
+            return False
+        return a["level"] == 0 or a["city"] == b["city"] and (a["level"] == 1 or a["district"] == b["district"])
+
+    def _compatible(self, a: int, b: int) -> bool:
+        return self._contains(a, b) or self._contains(b, a)
+
+    def _chain(self, text: str, matches: list, k: int, head: int) -> list:
+        """从第 k 处匹配的 head 起，向后接续相邻（中间只隔“省/市/区”等后缀）且为下级的地名"""
+        chain = [head]
+        end = matches[k][1]
+        for start, next_end, ids in matches[k + 1:]:
+            if text[end:start] not in ("",) + NAME_SUFFIXES:
+                break
+            child = next((i for i in ids if i != chain[-1] and self._contains(chain[-1], i)), None)
+            if child is None:
+                break
+            chain.append(child)
+            end = next_end
+        return chain
+
+    def resolve(self, text: str):
+        """
+        从自由文本中识别地区，只在无歧义时给出结果（用于自动补齐默认值）：
+        - 可信的命中：位于文本开头的地名，或“上级 + 下级”相邻出现的地名链（如“佛山顺德”“广东省佛山市”）；
+        - 不在开头、也没有上级佐证的地名不采用（“上海市南京东路”里的南京、“辽宁朝阳”里北京的朝阳）；
+        - 取最具体的一级；其他可信地名或文本中明确出现的省份与之矛盾时视为无法确定，返回 None
+          （由 candidates 给出候选，不自动填值）。
+        """
+        text = "".join((text or "").split())
+        matches = self._matches(text)
+        if not matches:
+            return None
+        confirmed = []
+        for k, (start, end, ids) in enumerate(matches):
+            # 同名地名（如省、市同名“吉林”）取接续最长的，其次取上级
+            chain = max((self._chain(text, matches, k, i) for i in ids), key=lambda c: (len(c), -self.places[c[0]]["level"]))
+            # 全称（“广东佛山”）本身就带上级
+            full = self.places[chain[0]]["level"] > 0 and text[start:end] == self.places[chain[0]]["full_name"]
+            if start == 0 or len(chain) >= 2 or full:
+                confirmed.append(chain)
+        if not confirmed:
+            return None
+        leaf = max((c[-1] for c in confirmed), key=lambda i: self.places[i]["level"])
+        # 其余可信地名链、以及文本中明确出现的省份，都须与结果一致
+        provinces = [ids[0] for _, _, ids in matches if len(ids) == 1 and self.places[ids[0]]["level"] == 0]
+        if any(not self._compatible(c[-1], leaf) for c in confirmed) or any(
+            not self._contains(i, leaf) for i in provinces
+        ):
+            return None
+        return self._item(leaf, "resolve")
+
+    def candidates(self, text: str, limit: int = SUGGEST_LIMIT) -> list:
+        """文本中出现的全部地名（无法确定地区时作为候选返回，不自动填值）"""
+        text = "".join((text or "").split())
+        seen = []
+        for _, _, ids in self._matches(text):
+            seen.extend(i for i in ids if i not in seen)
+        return [self._item(i, "mention") for i in seen[:limit]]
+
+
+# 启动时建立一次索引
+region_index = RegionIndex(build_places())
+
+
+def region_defaults(location: str, fields_set) -> dict:
+    """
+    按场站位置识别地区，给出请求中未显式填写的字段（fields_set 为 model_fields_set）应补齐的预设值。
+    识别不到地区或没有可填字段时返回 None；否则返回 {place, level, applied, note}。
+    所有测算入口都经 CalcRequest 校验（见 schemas.CalcRequest._fill_region_defaults），口径一致。
+    """
+    place = region_index.resolve(location)
+    if not place:
+        return None
+    applied = {
+        k: v for k, v in place["preset"].items()
+        if k not in fields_set and v is not None and (k != "tariff_region" or v in TARIFF_REGIONS)
+    }
+    if not applied:
+        return None
+    return {
+        "place": place["full_name"],
+        "level": place["level"],
+        "applied": applied,
+        "note": f"地区预设（{place['full_name']}）：已按当地口径填入"
+                + "、".join(PRESET_LABELS[k] for k in applied) + "，如有实际数据请直接填写覆盖",
+    }
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
+from typing import Dict, List, Optional
+
+from app.regions import region_defaults
 
 
 class CalcRequest(BaseModel):
@@ -24,12 +26,35 @@ class CalcRequest(BaseModel):
     service_fee_yuan_per_kwh: float = Field(0.3, ge=0)
     days_per_year: int = Field(330, ge=1, le=366)
 
+    # 分时电价（可选）：地区见 /api/tariffs；售电单价留空=按分时电价向司机收取电费
+    tariff_region: Optional[str] = Field(None, description="分时电价地区")
+    electricity_sell_yuan_per_kwh: Optional[float] = Field(None, ge=0)
+    charging_efficiency: float = Field(0.95, gt=0, le=1)
+
+    # 需求仿真（可选）：填写日均到站车辆数后，按离散事件仿真推算单枪日充电量
+    trucks_per_day: Optional[float] = Field(None, gt=0)
+
+    # 电网接入上限与储能（可选）：接入容量留空=不限电力；储能规模可由 /api/storage/optimize 给出
+    # （优化得到的可供电桩数、调度节省只在该接口内部带回 calc_plan，不作为请求字段）
+    grid_cap_kva: Optional[float] = Field(None, gt=0, description="可获批电网接入容量 kVA")
+    storage_kw: float = Field(0.0, ge=0)
+    storage_kwh: float = Field(0.0, ge=0)
+
+    # 设备选型（可选）：型号/桩数/变压器配置可由 /api/equipment/optimize 给出
+    pile_model: Optional[str] = Field(None, description="桩型号（见 /api/equipment）")
+    pile_count: Optional[int] = Field(None, ge=0, description="建设桩数（不超过布局/电力可支持桩数）")
+    transformer_kva: Optional[float] = Field(None, gt=0)
+    transformer_cost_yuan: float = Field(0.0, ge=0)
+    transformer_config: Optional[str] = None
+
     # =========================
     # 投资成本
     # =========================
     power_cost_yuan_per_kva: float = Field(600.0, ge=0)
     civil_cost_yuan_per_sqm: float = Field(200.0, ge=0)
     pile_cost_yuan_each: float = Field(45000.0, ge=0)
+    storage_cost_yuan_per_kw: float = Field(300.0, ge=0)
+    storage_cost_yuan_per_kwh: float = Field(900.0, ge=0)
 
     # =========================
     # 运营成本
@@ -42,4 +67,140 @@ class CalcRequest(BaseModel):
     # 03.01 新增：导出布局图到 Word
     # =========================
     layout_title: Optional[str] = None
-    layout_png_data_url: Optional[str] = None
\ No newline at end of file
+    layout_png_data_url: Optional[str] = None
+
+    # 地区预设的填入说明（不是请求字段）
+    _region_preset: Optional[dict] = PrivateAttr(None)
+
+    @model_validator(mode="after")
+    def _fill_region_defaults(self):
+        """
+        统一的输入规范化：按场站位置补齐未填写的地区参数（租金/服务费/单枪日电量/天数/电价地区），显式填写的不覆盖。
+        放在校验里，测算、报告、实时测算、项目库、批量筛选等所有入口拿到的输入都一致。
+        补齐的字段不计入 model_fields_set（规范查询串、再次校验时仍视为“未填写”）。
+        """
+        preset = region_defaults(self.site_location, self.model_fields_set)
+        if preset:
+            self.__dict__.update(preset["applied"])
+            self._region_preset = preset
+        return self
+
+class SimulateRequest(CalcRequest):
+    # =========================
+    # 需求仿真参数（留空按默认口径）
+    # =========================
+    hourly_profile: Optional[List[float]] = Field(None, min_length=24, max_length=24, description="0~23点到站权重")
+    weekday_factors: Optional[List[float]] = Field(None, min_length=7, max_length=7, description="周一~周日车流系数")
+    battery_mix: Optional[List[List[float]]] = Field(None, description="[[电池kWh, 占比], ...]")
+    arrival_soc_min: float = Field(0.10, ge=0, le=1)
+    arrival_soc_max: float = Field(0.35, ge=0, le=1)
+    target_soc: float = Field(0.90, gt=0, le=1)
+    max_c_rate: float = Field(1.0, gt=0)
+    handling_minutes: float = Field(5.0, ge=0)
+    patience_minutes: float = Field(30.0, ge=0)
+    seed: int = 0
+    include_hourly: bool = False
+
+    @field_validator("battery_mix")
+    @classmethod
+    def _check_battery_mix(cls, v):
+        """每行 [电池kWh > 0, 占比 ≥ 0]，占比合计须大于 0"""
+        if v is None:
+            return v
+        for row in v:
+            if len(row) != 2:
+                raise ValueError("battery_mix 每行应为 [电池kWh, 占比]")
+            if not row[0] > 0:
+                raise ValueError("电池容量须大于 0")
+            if not row[1] >= 0:
+                raise ValueError("占比不能为负")
+        if not sum(row[1] for row in v) > 0:
+            raise ValueError("battery_mix 占比合计须大于 0")
+        return v
+
+
+class SweepRequest(CalcRequest):
+    # =========================
+    # 情景扫描：factors=网格（字段→取值列表）；ranges+samples=蒙特卡洛（字段→[下限, 上限]）
+    # =========================
+    factors: Optional[Dict[str, List[float]]] = None
+    ranges: Optional[Dict[str, List[float]]] = None
+    samples: int = Field(0, ge=0, le=5_000_000)
+    seed: int = 0
+    chunk_size: int = Field(500, ge=1, le=20_000)
+
+
+class SobolRequest(CalcRequest):
+    # =========================
+    # 全局敏感性（Sobol 指数）：ranges=字段→[下限, 上限]；不填时基准值非零的数值字段取 基准 ±spread
+    # =========================
+    ranges: Optional[Dict[str, List[float]]] = None
+    spread: float = Field(0.2, gt=0, lt=1)
+    samples: int = Field(2048, ge=64, le=65_536)
+    seed: int = 0
+
+
+class VariantsRequest(CalcRequest):
+    # =========================
+    # 同一场地的经营变体：variants 每项为要覆盖的经营字段（如服务费、利用率、租金）；fields 为返回的结果字段
+    # =========================
+    variants: List[Dict[str, float]] = Field(..., min_length=1, max_length=20_000)
+    fields: Optional[List[str]] = None
+
+
+class HeatmapRequest(CalcRequest):
+    # =========================
+    # 容量热力图：在 (长, 宽) 网格上按同一成本口径计算桩数或回收期；site_length_m/site_width_m 为待标注的地块（可不填）
+    # =========================
+    site_length_m: float = Field(0.0, ge=0)
+    site_width_m: float = Field(0.0, ge=0)
+    metric: str = Field("n_layout", description="n_layout / payback_net_years / revenue_net_year_yuan")
+    length_min_m: float = Field(0.0, ge=0, le=500)
+    length_max_m: float = Field(500.0, ge=0, le=500)
+    width_min_m: float = Field(0.0, ge=0, le=500)
+    width_max_m: float = Field(500.0, ge=0, le=500)
+    step_m: float = Field(5.0, ge=0.5, le=100)
+
+
+class StorageRequest(CalcRequest):
+    # =========================
+    # 储能优化：grid_cap_kva 必填；负荷形状为 24 点日内权重或 8760 逐时电量（留空按默认充电负荷形状）
+    # =========================
+    hourly_load_profile: Optional[List[float]] = Field(None, description="24 或 8760 个值")
+    life_years: float = Field(10.0, gt=0, le=30)
+    unserved_tolerance: float = Field(0.005, ge=0, le=0.2)
+    max_storage_hours: float = Field(4.0, gt=0, le=12)
+
+
+class EquipmentRequest(CalcRequest):
+    # =========================
+    # 设备选型：桩型号 × 桩数 × 变压器组合，按净回收期或 NPV 择优
+    # =========================
+    objective: str = Field("payback", description="payback / npv")
+    discount_rate: float = Field(0.08, ge=0, le=1)
+    horizon_years: int = Field(10, ge=1, le=30)
+    models: Optional[List[str]] = Field(None, description="参与比选的桩型号（留空=全部）")
+
+
+class PhasingRequest(CalcRequest):
+    # =========================
+    # 分期建设规划：逐年需求（日电量或日车次，二选一），按 NPV 最大选择每年新增桩数
+    # =========================
+    ramp_kwh_per_day: Optional[List[float]] = Field(None, min_length=1, max_length=30, description="逐年日需求电量 kWh")
+    ramp_trucks_per_day: Optional[List[float]] = Field(None, min_length=1, max_length=30, description="逐年日到站车次")
+    discount_rate: float = Field(0.08, ge=0, le=1)
+    phase_fixed_cost_yuan: float = Field(50_000.0, ge=0, description="每期进场/报装/调试固定费用")
+    transformer_model: Optional[str] = Field(None, description="按整台扩容的变压器型号（留空=按 kVA 连续计）")
+    tail_years: int = Field(5, ge=0, le=30, description="期末终值按末年现金流再计的年数")
+
+
+class SizingRequest(CalcRequest):
+    # =========================
+    # 反算场地尺寸：给定目标桩数求面积最小的长宽；site_length_m/site_width_m 填写时视为固定边长（可都不填）
+    # =========================
+    site_length_m: Optional[float] = Field(None, gt=0, description="固定长度 m（留空=求解）")
+    site_width_m: Optional[float] = Field(None, gt=0, description="固定宽度 m（留空=求解）")
+    target_piles: int = Field(..., ge=1, le=5000, description="目标桩数")
+    aspect_min: Optional[float] = Field(None, gt=0, description="长宽比（长/宽）下限")
+    aspect_max: Optional[float] = Field(None, gt=0, description="长宽比（长/宽）上限")
+    pareto_max_piles: Optional[int] = Field(None, ge=1, le=2000, description="给出 1~该桩数范围的面积-桩数帕累托前沿")
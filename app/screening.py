@@ -0,0 +1,179 @@
+import codecs
+import csv
+import io
+
+from pydantic import ValidationError
+
+from app.calc import calc_plan
+from app.equipment import optimize_equipment
+from app.schemas import CalcRequest
+
+
+# =========================
+# 地块清单批量筛选（CSV 流式读入 → 逐块校验测算 → CSV 流式输出）
+# =========================
+# 表头可用 CalcRequest 字段名，或下列中文别名；其他列原样保留在输出中
+COLUMN_ALIASES = {
+    "位置": "site_location",
+    "地区": "site_location",
+    "场站位置": "site_location",
+    "地块": "site_location",
+    "长度": "site_length_m",
+    "长": "site_length_m",
+    "长度m": "site_length_m",
+    "长度(m)": "site_length_m",
+    "宽度": "site_width_m",
+    "宽": "site_width_m",
+    "宽度m": "site_width_m",
+    "宽度(m)": "site_width_m",
+    "租金": "rent_yuan_per_sqm_month",
+    "租金(元/㎡/月)": "rent_yuan_per_sqm_month",
+    "租金(元/平米/月)": "rent_yuan_per_sqm_month",
+    "服务费": "service_fee_yuan_per_kwh",
+    "电价地区": "tariff_region",
+}
+
+# 追加到每行末尾的结果列
+RESULT_FIELDS = (
+    "n_recommend",
+    "invest_total_yuan",
+    "revenue_net_year_yuan",
+    "payback_net_years",
+    "error",
+)
+
+# 开启设备选型（equipment=payback/npv）时追加的列
+EQUIPMENT_FIELDS = ("pile_model", "pile_count", "transformer_config")
+
+SCREEN_CHUNK_ROWS = 500               # 每块校验/测算的行数
+MAX_RECORD_CHARS = 64 * 1024          # 单条记录上限（未闭合引号时避免无限累积）
+SCREEN_ENCODINGS = ("utf-8-sig", "gbk", "gb18030")
+
+
+class ScreeningError(ValueError):
+    pass
+
+
+def map_header(header: list) -> list:
+    """表头 → CalcRequest 字段名（无法识别的列返回 None，原样透传）"""
+    fields = []
+    seen = set()
+    for name in header:
+        key = name.strip()
+        field = key if key in CalcRequest.model_fields else COLUMN_ALIASES.get(key)
+        if field in seen:
+            field = None
+        if field:
+            seen.add(field)
+        fields.append(field)
+    if "site_length_m" not in seen or "site_width_m" not in seen:
+        raise ScreeningError("CSV 表头缺少场地长度/宽度列（site_length_m/site_width_m 或 长度/宽度）")
+    return fields
+
+
+async def iter_records(byte_chunks, encoding: str = "utf-8-sig"):
+    """
+    增量解码 + 按引号配对切分记录：引号内的换行不切分，每次只保留未完成的一条记录。
+    产出的每个字符串是一条完整的 CSV 记录（可含引号内换行），交给 csv.reader 解析。
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="strict")
+    pending = ""
+    quotes = 0
+
+    def split(text: str, final: bool):
+        nonlocal pending, quotes
+        for line in text.splitlines(keepends=True):
+            pending += line
+            quotes += line.count('"')
+            if quotes % 2 == 0 and (line.endswith(("\n", "\r")) or final):
+                yield pending
+                pending = ""
+                quotes = 0
+            elif len(pending) > MAX_RECORD_CHARS:
+                raise ScreeningError("CSV 记录过长（可能存在未闭合的引号）")
+
+    async for chunk in byte_chunks:
+        try:
+            text = decoder.decode(chunk)
+        except UnicodeDecodeError:
+            raise ScreeningError(f"CSV 编码不是 {encoding}，请指定 encoding 参数（如 gbk）")
+        if pending:
+            # 上一段末尾未完成的记录与本段拼接后重新切分
+            text = pending + text
+            pending = ""
+            quotes = 0
+        for record in split(text, final=False):
+            yield record
+    text = pending + decoder.decode(b"", final=True)
+    pending = ""
+    quotes = 0
+    for record in split(text, final=True):
+        yield record
+    if pending:
+        raise ScreeningError("CSV 结尾存在未闭合的引号")
+
+
+def _fmt(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return value
+
+
+def validation_error_text(e: ValidationError) -> str:
+    """校验错误压成一行文字（字段: 原因; …），写入结果 CSV / 批量结果的 error 列"""
+    parts = []
+    for err in e.errors(include_url=False, include_context=False):
+        loc = ".".join(str(x) for x in err.get("loc", ()))
+        parts.append(f"{loc}: {err.get('msg')}")
+    return "; ".join(parts)
+
+
+def screen_rows(fields: list, rows: list, base: dict, equipment: str = None) -> str:
+    """校验并测算一块记录，返回该块的输出 CSV 文本（原始列 + [设备选型列] + 结果列）"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    width = len(fields)
+    blank = [""] * (len(RESULT_FIELDS) - 1 + (len(EQUIPMENT_FIELDS) if equipment else 0))
+    for row in rows:
+        if not any(cell.strip() for cell in row):
+            continue
+        data = dict(base)
+        for field, cell in zip(fields, row):
+            cell = cell.strip()
+            if field and cell != "":
+                data[field] = cell
+        out = list(row[:width]) + [""] * (width - len(row))
+
+        if len(row) > width:
+            writer.writerow(out + blank + [f"列数{len(row)}多于表头{width}"])
+            continue
+        try:
+            inputs = CalcRequest.model_validate(data).model_dump()
+        except ValidationError as e:
+            writer.writerow(out + blank + [validation_error_text(e)])
+            continue
+
+        # 批量筛选按给定经营口径测算，不做需求仿真
+        inputs["trucks_per_day"] = None
+        if equipment:
+            chosen = optimize_equipment(inputs, objective=equipment)
+            result = chosen["plan"] or calc_plan(inputs)
+            picked = chosen["best"] or {}
+            out += [_fmt(picked.get(k)) for k in EQUIPMENT_FIELDS]
+        else:
+            result = calc_plan(inputs)
+        writer.writerow(out + [_fmt(result.get(k)) for k in RESULT_FIELDS[:-1]] + [""])
+    return buf.getvalue()
+
+
+def header_line(header: list, equipment: str = None) -> str:
+    buf = io.StringIO()
+    extra = list(EQUIPMENT_FIELDS) if equipment else []
+    csv.writer(buf).writerow(list(header) + extra + list(RESULT_FIELDS))
+    return buf.getvalue()
+
+
+def parse_records(records: list) -> list:
+    return list(csv.reader(records))
@@ -0,0 +1,460 @@
+import heapq
+import math
+import random
+from collections import deque
+
+from app.calc import calc_plan, _f, _i
+
+
+# =========================
+# 需求仿真口径（重卡到站充电）
+# =========================
+MINUTES_PER_DAY = 24 * 60
+SIM_DAYS = 365
+
+# 到站时段分布（0~23 点的相对权重）：午间、夜间谷电时段集中
+DEFAULT_HOURLY_PROFILE = [
+    3.0, 3.0, 2.5, 2.0, 1.5, 1.5,
+    2.0, 3.0, 4.0, 4.5, 5.0, 6.0,
+    7.0, 6.5, 5.0, 4.5, 4.5, 5.0,
+    5.5, 5.0, 4.5, 4.0, 3.5, 3.0,
+]
+
+# 周一~周日的相对车流（周末物流车较少）
+DEFAULT_WEEKDAY_FACTORS = [1.0, 1.0, 1.0, 1.0, 1.0, 0.85, 0.7]
+
+# 电池容量分布：(kWh, 占比)
+DEFAULT_BATTERY_MIX = [
+    (282.0, 0.30),
+    (350.0, 0.40),
+    (423.0, 0.20),
+    (600.0, 0.10),
+]
+
+DEFAULT_ARRIVAL_SOC = (0.10, 0.35)   # 到站 SOC 均匀分布区间
+DEFAULT_TARGET_SOC = 0.90            # 充至 SOC
+DEFAULT_MAX_C_RATE = 1.0             # 车端最大接受倍率（kW/kWh）
+DEFAULT_HANDLING_MIN = 5.0           # 插拔枪、挪车占位时间（分钟）
+DEFAULT_PATIENCE_MIN = 30.0          # 排队等待超过该时长的车辆离开
+
+# 年到站车次超过该值时改用逐时聚合排队模型（逐车事件仿真约 1.5µs/车，15 万车约 0.2s）：
+# 大站车流大、枪多，逐时段的平稳排队近似足够准确，耗时与车流无关（全年 8760 个时段，约 40ms）
+SIM_EVENT_MAX_ARRIVALS = 150_000
+SERVICE_GRID = 256                   # 服务时长分布的 SOC 积分网格（逐时模型用）
+
+
+def _normalize(weights, n):
+    w = [max(0.0, _f(x)) for x in (weights or [])][:n]
+    if len(w) != n or sum(w) <= 0:
+        return None
+    s = sum(w)
+    return [x / s for x in w]
+
+
+def simulate_station(
+    n_piles: int,
+    guns_per_pile: int,
+    pile_kw: float,
+    trucks_per_day: float,
+    hourly_profile=None,
+    weekday_factors=None,
+    battery_mix=None,
+    arrival_soc=DEFAULT_ARRIVAL_SOC,
+    target_soc: float = DEFAULT_TARGET_SOC,
+    max_c_rate: float = DEFAULT_MAX_C_RATE,
+    handling_minutes: float = DEFAULT_HANDLING_MIN,
+    patience_minutes: float = DEFAULT_PATIENCE_MIN,
+    seed: int = 0,
+    include_hourly: bool = False,
+) -> dict:
+    """
+    离散事件仿真：按分钟分辨率模拟一年（365 天）重卡到站、排队、充电、离站。
+    充电枪为并行服务台，先到先服务；预计等待超过 patience_minutes 的车辆直接离开（计为流失）。
+    枪功率按桩功率在枪间均分，且不超过车端可接受功率。
+    年到站超过 SIM_EVENT_MAX_ARRIVALS 时改用逐时聚合排队模型（见 _simulate_hourly），输出字段相同，method 标明所用模型。
+    耗时（单核）：20 桩/300 车·日（事件仿真）约 0.2s；100 桩/1500 车·日、200 桩/3000 车·日（逐时模型）约 40ms。
+    """
+    n_guns = max(0, int(n_piles)) * max(1, int(guns_per_pile))
+    gun_kw = pile_kw / max(1, int(guns_per_pile))
+
+    hourly = _normalize(hourly_profile, 24) or _normalize(DEFAULT_HOURLY_PROFILE, 24)
+    weekday = [max(0.0, _f(x)) for x in (weekday_factors or DEFAULT_WEEKDAY_FACTORS)][:7]
+    if len(weekday) != 7 or sum(weekday) <= 0:
+        weekday = list(DEFAULT_WEEKDAY_FACTORS)
+    week_mean = sum(weekday) / 7.0
+    weekday = [x / week_mean for x in weekday]
+
+    mix = battery_mix or DEFAULT_BATTERY_MIX
+    sizes = [float(kwh) for kwh, _ in mix]
+    cum_weights = []
+    acc = 0.0
+    for _, p in mix:
+        acc += max(0.0, float(p))
+        cum_weights.append(acc)
+
+    soc_lo, soc_hi = arrival_soc
+    rng = random.Random(seed)
+    expovariate = rng.expovariate
+
+    if trucks_per_day * SIM_DAYS > SIM_EVENT_MAX_ARRIVALS and n_guns > 0:
+        out = _simulate_hourly(
+            n_guns, gun_kw, trucks_per_day, hourly, weekday, sizes, cum_weights,
+            (soc_lo, soc_hi), target_soc, max_c_rate, handling_minutes, patience_minutes, rng,
+        )
+        out.update({"n_piles": int(n_piles), "n_guns": n_guns, "gun_kw": gun_kw, "trucks_per_day": trucks_per_day})
+        if not include_hourly:
+            out.pop("hourly_kwh")
+        return out
+
+    # 1) 到站时刻：分时段（小时内恒定强度）的非齐次泊松过程，按分钟取整
+    arrival_minutes = []
+    append = arrival_minutes.append
+    for day in range(SIM_DAYS):
+        day_factor = trucks_per_day * weekday[day % 7]
+        day_start = day * MINUTES_PER_DAY
+        for hour in range(24):
+            rate = day_factor * hourly[hour] / 60.0      # 辆/分钟
+            if rate <= 0:
+                continue
+            base = day_start + hour * 60
+            t = expovariate(rate)
+            while t < 60.0:
+                append(base + int(t))
+                t += expovariate(rate)
+    arrivals = len(arrival_minutes)
+
+    # 2) 车辆属性批量抽样：电池容量、到站 SOC → 需求电量与充电时长
+    batteries = rng.choices(sizes, cum_weights=cum_weights, k=arrivals)
+    soc_span = soc_hi - soc_lo
+    socs = [soc_lo + soc_span * x for x in [rng.random() for _ in range(arrivals)]]
+    power_by_size = {kwh: min(gun_kw, kwh * max_c_rate) for kwh in sizes}
+    handling = int(handling_minutes)
+
+    # 3) 先到先服务的多服务台递推：到站即可知道最早空闲枪与等待时长
+    year_end = SIM_DAYS * MINUTES_PER_DAY
+    hourly_kwh = [0.0] * (SIM_DAYS * 24)
+    gun_free = [0] * n_guns          # 各枪空闲时刻（分钟），小根堆
+    waiting = deque()                # 已接受且仍在排队车辆的开始充电时刻（FIFO 下单调不减）
+    heapreplace = heapq.heapreplace
+    ceil = math.ceil
+
+    served = turned_away = 0
+    delivered_kwh = 0.0
+    charge_minutes = 0
+    wait_total = 0
+    waits = []
+    max_queue = 0
+
+    for now, battery, soc in zip(arrival_minutes, batteries, socs):
+        if n_guns == 0:
+            turned_away += 1
+            continue
+
+        start = gun_free[0]
+        if start <= now:
+            start = now
+            wait = 0
+        else:
+            wait = start - now
+            if wait > patience_minutes:
+                turned_away += 1
+                continue
+            while waiting and waiting[0] <= now:
+                waiting.popleft()
+            waiting.append(start)
+            if len(waiting) > max_queue:
+                max_queue = len(waiting)
+
+        energy = battery * (target_soc - soc)
+        if energy < 0:
+            energy = 0.0
+        power = power_by_size[battery]
+        minutes = int(ceil(energy / power * 60.0)) if power > 0 else 0
+        heapreplace(gun_free, start + minutes + handling)
+
+        served += 1
+        delivered_kwh += energy
+        charge_minutes += minutes
+        wait_total += wait
+        waits.append(wait)
+
+        # 分摊到小时（跨年部分截断）
+        if minutes > 0:
+            per_min = energy / minutes
+            m = start
+            end = start + minutes
+            if end > year_end:
+                end = year_end
+            while m < end:
+                nxt = (m // 60 + 1) * 60
+                if nxt > end:
+                    nxt = end
+                hourly_kwh[m // 60] += per_min * (nxt - m)
+                m = nxt
+
+    waits.sort()
+    p95_wait = waits[int(0.95 * (len(waits) - 1))] if waits else 0
+    gun_minutes = n_guns * SIM_DAYS * MINUTES_PER_DAY
+
+    out = {
+        "n_piles": int(n_piles),
+        "n_guns": n_guns,
+        "gun_kw": gun_kw,
+        "method": "event",
+        "sim_days": SIM_DAYS,
+        "trucks_per_day": trucks_per_day,
+        "arrivals": arrivals,
+        "served": served,
+        "turned_away": turned_away,
+        "turned_away_ratio": (turned_away / arrivals) if arrivals else 0.0,
+        "delivered_kwh": delivered_kwh,
+        "kwh_per_gun_per_day": (delivered_kwh / n_guns / SIM_DAYS) if n_guns else 0.0,
+        "utilization": (charge_minutes / gun_minutes) if gun_minutes else 0.0,
+        "wait_mean_minutes": (wait_total / served) if served else 0.0,
+        "wait_p95_minutes": p95_wait,
+        "queue_max": max_queue,
+    }
+    if include_hourly:
+        out["hourly_kwh"] = hourly_kwh
+    return out
+
+
+def _poisson(rng, lam: float) -> int:
+    """泊松抽样：均值小用乘积法，均值大用正态近似"""
+    if lam <= 0:
+        return 0
+    if lam > 30:
+        return max(0, int(round(rng.gauss(lam, math.sqrt(lam)))))
+    limit = math.exp(-lam)
+    k = 0
+    p = rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def _service_stats(gun_kw, sizes, cum_weights, arrival_soc, target_soc, max_c_rate, handling_minutes) -> dict:
+    """单车补电量、充电时长、占枪时长的均值，以及占枪时长的平方变异系数（按电池占比 × SOC 网格积分，与事件仿真同口径）"""
+    soc_lo, soc_hi = arrival_soc
+    handling = int(handling_minutes)
+    weights = [w - (cum_weights[i - 1] if i else 0.0) for i, w in enumerate(cum_weights)]
+    total_w = sum(weights) or 1.0
+    e_sum = c_sum = s_sum = s2_sum = 0.0
+    for kwh, w in zip(sizes, weights):
+        power = min(gun_kw, kwh * max_c_rate)
+        for j in range(SERVICE_GRID):
+            soc = soc_lo + (soc_hi - soc_lo) * (j + 0.5) / SERVICE_GRID
+            energy = max(0.0, kwh * (target_soc - soc))
+            minutes = math.ceil(energy / power * 60.0) if power > 0 else 0
+            occupy = minutes + handling
+            p = w / total_w / SERVICE_GRID
+            e_sum += p * energy
+            c_sum += p * minutes
+            s_sum += p * occupy
+            s2_sum += p * occupy * occupy
+    scv = (s2_sum - s_sum * s_sum) / (s_sum * s_sum) if s_sum > 0 else 1.0
+    return {"energy": e_sum, "charge_minutes": c_sum, "occupy_minutes": s_sum, "scv": max(0.0, scv)}
+
+
+def _erlang_c(c: int, a: float) -> float:
+    """M/M/c 到站需排队的概率（Erlang C），a 为到达负荷（Erlang），a ≥ c 时为 1"""
+    if a >= c:
+        return 1.0
+    b = 1.0
+    for k in range(1, c + 1):
+        b = a * b / (k + a * b)
+    return c * b / (c - a * (1 - b))
+
+
+def _simulate_hourly(
+    n_guns, gun_kw, trucks_per_day, hourly, weekday, sizes, cum_weights,
+    arrival_soc, target_soc, max_c_rate, handling_minutes, patience_minutes, rng,
+) -> dict:
+    """
+    逐时聚合排队模型（全年 8760 个时段，不逐车仿真）：
+    - 每小时到站数按泊松抽样；单车补电量/占枪时长取分布的均值（SOC 网格积分）；
+    - 时段内未过载（积压 + 新到工作量 ≤ 枪数×60 分钟）：按平稳 M/G/c 近似——Erlang C 排队概率，
+      等待时间按 Allen-Cunneen 以占枪时长变异系数修正，等待超过耐心时长的比例计为流失；
+    - 过载时段：按流体积压递推（积压工作量 / 枪数 = 等待），积压超过 枪数×耐心时长 的部分流失；
+    - 电量按开始充电所在小时计，充电时长跨入下一小时的部分顺延。
+    """
+    stats = _service_stats(gun_kw, sizes, cum_weights, arrival_soc, target_soc, max_c_rate, handling_minutes)
+    mean_energy = stats["energy"]
+    mean_charge = stats["charge_minutes"]
+    mean_occupy = stats["occupy_minutes"]
+    wait_factor = (1.0 + stats["scv"]) / 2.0
+    c = n_guns
+    capacity = c * 60.0
+    patience = float(patience_minutes)
+    # 电量跨小时顺延：开始时刻在小时内均匀分布，时长 D 分钟的充电在本小时内的比例
+    if mean_charge <= 60:
+        first_share = 1.0 - mean_charge / 120.0
+    else:
+        first_share = 30.0 / mean_charge
+    spill_hours = max(1, math.ceil(mean_charge / 60.0))
+
+    erlang_cache = {}
+
+    def stationary(rho: float) -> tuple:
+        """负荷率 rho（按 0.1% 取整缓存）→ (排队概率, 等待尾部衰减率 1/分钟)"""
+        key = round(rho, 3)
+        if key not in erlang_cache:
+            a = key * c
+            p_wait = _erlang_c(c, a) if a < c else 1.0
+            decay = (c - a) / (mean_occupy * wait_factor) if a < c and mean_occupy > 0 else 0.0
+            erlang_cache[key] = (p_wait, decay)
+        return erlang_cache[key]
+
+    hours = SIM_DAYS * 24
+    hourly_kwh = [0.0] * hours
+    arrivals = served = 0
+    served_f = lost_f = wait_total = 0.0
+    queue_max = 0.0
+    backlog = 0.0                     # 积压工作量（枪·分钟）
+    tails = {}                        # (排队概率, 衰减率) → 服务车次权重，用于 P95
+    fluid_waits = {}                  # 过载时段的等待（分钟，取整）→ 服务车次权重
+
+    for h in range(hours):
+        lam = trucks_per_day * weekday[(h // 24) % 7] * hourly[h % 24]
+        n = _poisson(rng, lam)
+        arrivals += n
+        if n == 0 and backlog == 0:
+            continue
+        total = backlog + n * mean_occupy
+        if total <= capacity:
+            p_wait, decay = stationary(total / capacity)
+            if decay > 0:
+                p_lost = p_wait * math.exp(-decay * patience)
+                # 服务车辆（等待 ≤ 耐心）的平均等待
+                w_served = p_wait * (1.0 / decay - math.exp(-decay * patience) * (patience + 1.0 / decay))
+            else:
+                p_lost, w_served = p_wait, 0.0
+            ok = n * (1.0 - p_lost)
+            if ok > 0:
+                wait_total += w_served * n
+                tails[(p_wait, decay)] = tails.get((p_wait, decay), 0.0) + ok
+            if decay > 0:
+                # 平均排队长度（M/M/c 的 Lq，经变异系数修正），不超过耐心时长内的到站数
+                lq = p_wait * (total / capacity) / (1 - total / capacity) * wait_factor
+                queue_max = max(queue_max, min(lq, lam * patience / 60.0))
+            backlog = 0.0
+        else:
+            new_backlog = total - capacity
+            limit = c * patience
+            lost_work = max(0.0, new_backlog - limit)
+            new_backlog -= lost_work
+            p_lost = min(1.0, lost_work / mean_occupy / n) if n else 0.0
+            ok = n * (1.0 - p_lost)
+            wait = (backlog + new_backlog) / 2.0 / c
+            wait_total += wait * ok
+            fluid_waits[round(wait)] = fluid_waits.get(round(wait), 0.0) + ok
+            queue_max = max(queue_max, new_backlog / mean_occupy)
+            backlog = new_backlog
+        served_f += ok
+        lost_f += n - ok
+        energy = ok * mean_energy
+        hourly_kwh[h] += energy * first_share
+        if first_share < 1.0:
+            rest = energy * (1.0 - first_share) / spill_hours
+            for k in range(1, spill_hours + 1):
+                if h + k < hours:
+                    hourly_kwh[h + k] += rest
+
+    served = int(round(served_f))
+
+    def share_above(t: float) -> float:
+        """服务车辆中等待超过 t 分钟的车次（排队等待按耐心时长截断的指数尾部）"""
+        x = 0.0
+        for (p_wait, decay), w in tails.items():
+            if decay > 0:
+                cut = p_wait * math.exp(-decay * patience)
+                x += w * max(0.0, p_wait * math.exp(-decay * t) - cut) / (1.0 - cut)
+        return x + sum(w for wait, w in fluid_waits.items() if wait > t)
+
+    p95_wait = 0.0
+    if served_f > 0 and share_above(0.0) > 0.05 * served_f:
+        lo, hi = 0.0, patience
+        for _ in range(30):
+            mid = (lo + hi) / 2
+            if share_above(mid) > 0.05 * served_f:
+                lo = mid
+            else:
+                hi = mid
+        p95_wait = hi
+
+    delivered_kwh = sum(hourly_kwh) if served_f else 0.0
+    gun_minutes = c * SIM_DAYS * MINUTES_PER_DAY
+    return {
+        "method": "hourly",
+        "sim_days": SIM_DAYS,
+        "arrivals": arrivals,
+        "served": served,
+        "turned_away": arrivals - served,
+        "turned_away_ratio": (lost_f / arrivals) if arrivals else 0.0,
+        "delivered_kwh": served_f * mean_energy,
+        "kwh_per_gun_per_day": served_f * mean_energy / c / SIM_DAYS,
+        "utilization": (served_f * mean_charge / gun_minutes) if gun_minutes else 0.0,
+        "wait_mean_minutes": (wait_total / served_f) if served_f else 0.0,
+        "wait_p95_minutes": p95_wait,
+        "queue_max": int(math.ceil(queue_max)),
+        "hourly_kwh": hourly_kwh,
+    }
+
+
+def mean_energy_per_truck(battery_mix=None, arrival_soc=DEFAULT_ARRIVAL_SOC, target_soc=DEFAULT_TARGET_SOC) -> float:
+    """单车平均补电量（kWh）= 平均电池容量 × (充至 SOC - 平均到站 SOC)"""
+    mix = battery_mix or DEFAULT_BATTERY_MIX
+    total_p = sum(p for _, p in mix) or 1.0
+    mean_battery = sum(kwh * p for kwh, p in mix) / total_p
+    lo, hi = arrival_soc
+    return mean_battery * (target_soc - (lo + hi) / 2.0)
+
+
+def simulate_for_plan(d: dict, result: dict, **params) -> dict:
+    """按 calc_plan 的推荐桩数/每桩枪数/单桩功率仿真；未给 trucks_per_day 时按输入的单枪日电量折算车流"""
+    n_piles = _i(result.get("n_recommend"), 0)
+    guns_per_pile = _i(d.get("guns_per_pile"), 2)
+    pile_kw = _f(d.get("pile_kva_per"), 400)
+
+    trucks_per_day = params.pop("trucks_per_day", None) or d.get("trucks_per_day")
+    if not trucks_per_day:
+        mean_energy = mean_energy_per_truck(
+            params.get("battery_mix"),
+            params.get("arrival_soc", DEFAULT_ARRIVAL_SOC),
+            params.get("target_soc", DEFAULT_TARGET_SOC),
+        )
+        demand = n_piles * guns_per_pile * _f(d.get("kwh_per_gun_per_day"), 1000)
+        trucks_per_day = demand / mean_energy if mean_energy > 0 else 0.0
+
+    return simulate_station(n_piles, guns_per_pile, pile_kw, float(trucks_per_day), **params)
+
+
+def calc_plan_simulated(d: dict, **params) -> dict:
+    """
+    先按布局算出推荐桩数，再仿真一年得到实际可交付电量，
+    按仿真日均折算为 kwh_per_gun_per_day 后重新计算经营指标（年电量 = 日均 × 年运营天数）。
+    """
+    base = calc_plan(d)
+    include_hourly = params.pop("include_hourly", False)
+    sim = simulate_for_plan(d, base, include_hourly=True, **params)
+    hourly_kwh = sim["hourly_kwh"] if include_hourly else sim.pop("hourly_kwh")
+
+    days_per_year = _i(d.get("days_per_year"), 330)
+    n_guns = sim["n_guns"]
+    data = dict(d)
+    if n_guns > 0:
+        # 仿真的是 SIM_DAYS 天的车流（日车次即每个运营日的车流），按仿真日均折算，
+        # 年电量 = 日均 × days_per_year，与 calc_plan 按单枪日电量 × 运营天数的口径一致
+        data["kwh_per_gun_per_day"] = sim["delivered_kwh"] / n_guns / SIM_DAYS
+    if data.get("tariff_region"):
+        data["hourly_load_kwh"] = hourly_kwh     # 分时电价按仿真的逐时负荷计价
+
+    result = calc_plan(data)
+    result["simulation"] = sim
+    result["notes"].append(
+        f"需求仿真：年到站{sim['arrivals']}辆，服务{sim['served']}辆，流失{sim['turned_away']}辆；"
+        f"枪利用率{sim['utilization'] * 100:.1f}%，平均等待{sim['wait_mean_minutes']:.1f}分钟；"
+        f"单枪日电量按仿真日均折算为{_f(data.get('kwh_per_gun_per_day')):.0f}kWh，年电量按{days_per_year}个运营日计。"
+    )
+    return result
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+from starlette.concurrency import run_in_threadpool
+
+
+# =========================
+# 请求合并（single flight）：相同 key 的并发调用只执行一次，所有等待者拿到同一结果
+# =========================
+class SingleFlight:
+    """
+    - 第一个请求（leader）把函数放到线程池执行，并登记为该 key 的在途任务；
+      同 key 的后续请求直接等待这个任务，不再重复执行。
+    - 等待用 asyncio.shield：某个请求被取消（客户端断开）只影响它自己，在途任务继续为其他等待者执行。
+    - 任务结束（成功或异常）即移除登记：异常会原样抛给当次所有等待者，但不缓存，下一次请求重新执行。
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.calls = 0            # 请求总数
+        self.executions = 0       # 实际执行次数
+        self.coalesced = 0        # 合并到在途任务的请求数
+        self.errors = 0           # 执行失败次数
+        self.cancelled = 0        # 等待中被取消的请求数
+        self.max_waiters = 0      # 单个在途任务的最大等待请求数
+
+    async def do(self, key, fn, *args):
+        with self._lock:
+            self.calls += 1
+            entry = self._inflight.get(key)
+            if entry is None:
+                self.executions += 1
+                task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+                entry = self._inflight[key] = {"task": task, "waiters": 1}
+                task.add_done_callback(lambda t, key=key: self._done(key, t))
+            else:
+                self.coalesced += 1
+                entry["waiters"] += 1
+            self.max_waiters = max(self.max_waiters, entry["waiters"])
+        try:
+            return await asyncio.shield(entry["task"])
+        except asyncio.CancelledError:
+            with self._lock:
+                self.cancelled += 1
+            raise
+
+    def _done(self, key, task):
+        with self._lock:
+            if self._inflight.get(key, {}).get("task") is task:
+                del self._inflight[key]
+            if not task.cancelled() and task.exception() is not None:
+                # 取出异常：所有等待者都已取消时也不会出现 "exception was never retrieved"
+                self.errors += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "cancelled": self.cancelled,
+                "in_flight": len(self._inflight),
+                "max_waiters": self.max_waiters,
+            }
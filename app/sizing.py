@@ -0,0 +1,187 @@
+import math
+
+from app.calc import (
+    REQ_LEN_MIN_M, STALL_WIDTH_M, TX_SLOTS_PER_ROW, TX_SLOTS_SINGLE_ROW, WIDTH_BANDS, WIDTH_MAX_M, calc_plan,
+    layout_geometry,
+)
+
+
+# =========================
+# 反算场地尺寸：给定目标桩数，求面积最小的 (长, 宽)
+# =========================
+# 布置口径下桩数只取决于两个整数：每排原始车位 s = floor(长/车位宽)、排数 r（宽度分段）。
+# - 多排：桩 = floor((s - 每排变压器占位) × r / 2)，达到目标 N 需 s ≥ 占位 + ceil(2N / r)；
+# - 单排：车位取偶数、中间留变压器，桩 = (s偶 - 2) / 2，需 s ≥ 2N + 2；
+# 两种情况桩数都随 s 单调不减，故每个宽度分段的最小长度 = 车位宽 × s_min，最小宽度 = 分段下限。
+# 逐分段解析求解（22 个分段即 22 次计算），再用 layout_geometry 复核。
+SIZING_MAX_PILES = 5000
+SIZING_PARETO_MAX_PILES = 2000        # 帕累托前沿最多扫到的桩数
+SIZING_ROUND_M = 0.01                 # 比例约束下的非整数尺寸向上取到 1cm
+
+
+def _ceil_to(x: float, step: float = SIZING_ROUND_M) -> float:
+    return math.ceil(x / step - 1e-9) * step
+
+
+def min_stalls_per_row(target: int, rows: int) -> int:
+    """r 排时达到 target 桩所需的最少每排原始车位数"""
+    if rows == 1:
+        return 2 * target + TX_SLOTS_SINGLE_ROW
+    return TX_SLOTS_PER_ROW + math.ceil(2 * target / rows)
+
+
+def _band_option(target: int, band: tuple, length=None, width=None, aspect_min=None, aspect_max=None):
+    """
+    单个宽度分段内的面积最小解（无解返回 None）。
+    约束：长 ≥ 车位宽×s_min、宽 ∈ [分段下限, 上限)、aspect_min ≤ 长/宽 ≤ aspect_max；面积对长、宽都单调，
+    故最优解为 宽 = max(分段下限, 最小长/aspect_max)，长 = max(最小长, aspect_min×宽)。
+    """
+    lo_w, hi_w, rows = band
+    inclusive = hi_w == WIDTH_MAX_M
+    s_min = min_stalls_per_row(target, rows)
+    l_min = max(REQ_LEN_MIN_M, STALL_WIDTH_M * s_min)
+    l_max = math.inf
+    if length is not None:
+        if length < l_min:
+            return None
+        l_min = l_max = float(length)
+    if width is not None:
+        if width < lo_w or width > hi_w or (width == hi_w and not inclusive):
+            return None
+        lo_w = hi_w = float(width)
+        inclusive = True
+
+    w = float(lo_w)
+    if aspect_max:
+        w = max(w, _ceil_to(l_min / aspect_max))
+    l = l_min
+    if aspect_min:
+        l = max(l, _ceil_to(aspect_min * w))
+    if l > l_max or w > hi_w or (w == hi_w and not inclusive):
+        return None
+    if aspect_max and l > aspect_max * w + 1e-9:
+        return None
+    return l, w
+
+
+def _option(target: int, length: float, width: float) -> dict:
+    """用布置口径复核并整理一个候选尺寸（复核不达标返回 None）"""
+    geo = layout_geometry(length, width)
+    if geo["n_layout"] < target:
+        return None
+    return {
+        "site_length_m": length,
+        "site_width_m": width,
+        "site_area_sqm": length * width,
+        "aspect_ratio": length / width,
+        "row_count": geo["row_count"],
+        "stalls_per_row_raw": geo["stalls_per_row_raw"],
+        "stalls_total": geo["stalls_total"],
+        "n_layout": geo["n_layout"],
+        "surplus_piles": geo["n_layout"] - target,
+        "sqm_per_pile": length * width / geo["n_layout"],
+    }
+
+
+def solve_min_site(target: int, length=None, width=None, aspect_min=None, aspect_max=None) -> list:
+    """各宽度分段的面积最小解，按面积升序（同面积取排数少者）"""
+    options = []
+    for band in WIDTH_BANDS:
+        dims = _band_option(target, band, length, width, aspect_min, aspect_max)
+        if dims is None:
+            continue
+        option = _option(target, *dims)
+        if option is not None:
+            option["band"] = f"{band[0]}~{band[1]}m"
+            options.append(option)
+    options.sort(key=lambda o: (o["site_area_sqm"], o["row_count"]))
+    return options
+
+
+def pareto_frontier(max_piles: int, length=None, width=None, aspect_min=None, aspect_max=None) -> list:
+    """
+    面积-桩数的帕累托前沿：对 1..max_piles 每个目标取最小面积解，保留“桩数更多则面积更大”的非劣点。
+    每个目标只做 22 个分段的解析计算、复核一次，数千个目标为毫秒级。
+    """
+    points = {}
+    for k in range(1, max_piles + 1):
+        candidates = [_band_option(k, band, length, width, aspect_min, aspect_max) for band in WIDTH_BANDS]
+        candidates = [dims for dims in candidates if dims is not None]
+        if not candidates:
+            continue
+        best = _option(k, *min(candidates, key=lambda d: d[0] * d[1]))
+        if best is None:
+            continue
+        # 按实际可布桩数去重，同桩数保留面积最小者
+        if best["n_layout"] not in points or best["site_area_sqm"] < points[best["n_layout"]]["site_area_sqm"]:
+            points[best["n_layout"]] = best
+    frontier = []
+    for n in sorted(points, reverse=True):
+        p = points[n]
+        if not frontier or p["site_area_sqm"] < frontier[-1]["site_area_sqm"] - 1e-9:
+            frontier.append(p)
+    frontier.reverse()
+    return [
+        {k: p[k] for k in ("n_layout", "site_length_m", "site_width_m", "site_area_sqm", "row_count", "sqm_per_pile")}
+        for p in frontier
+    ]
+
+
+def size_site(
+    target: int,
+    length=None,
+    width=None,
+    aspect_min=None,
+    aspect_max=None,
+    pareto_max_piles=None,
+    d: dict = None,
+) -> dict:
+    """
+    反算入口。d 为其余测算参数（电网接入容量等）：给出时逐个方案跑 calc_plan 得到推荐桩数，
+    电力不足时即使场地够大也达不到目标，在说明中提示。
+    """
+    if target < 1:
+        raise ValueError("目标桩数至少为 1")
+    if target > SIZING_MAX_PILES:
+        raise ValueError(f"目标桩数不超过 {SIZING_MAX_PILES}")
+    if aspect_min and aspect_max and aspect_min > aspect_max:
+        raise ValueError("长宽比下限不能大于上限")
+
+    options = solve_min_site(target, length, width, aspect_min, aspect_max)
+    notes = []
+    if d is not None:
+        for option in options:
+            plan = calc_plan({
+                **d,
+                "site_length_m": option["site_length_m"],
+                "site_width_m": option["site_width_m"],
+                "trucks_per_day": None,
+            })
+            option["n_recommend"] = plan["n_recommend"]
+        if options and options[0]["n_recommend"] < target:
+            notes.append(
+                f"场地可布 {options[0]['n_layout']} 桩，但按当前电力条件推荐桩数为 {options[0]['n_recommend']}："
+                "需提高电网接入容量或配置储能，增大场地无法解决。"
+            )
+    if not options:
+        notes.append("在给定的长/宽/长宽比约束下，当前布置口径无法达到目标桩数。")
+    elif options[0]["surplus_piles"]:
+        notes.append(
+            f"面积最小的方案可布 {options[0]['n_layout']} 桩（多出 {options[0]['surplus_piles']} 桩）："
+            "车位按整格计、多排每排扣变压器占位、单排需偶数车位，桩数不能任意取值。"
+        )
+    result = {
+        "target_piles": target,
+        "constraints": {
+            "site_length_m": length,
+            "site_width_m": width,
+            "aspect_min": aspect_min,
+            "aspect_max": aspect_max,
+        },
+        "best": options[0] if options else None,
+        "options": options,
+        "notes": notes,
+    }
+    if pareto_max_piles:
+        result["pareto"] = pareto_frontier(min(pareto_max_piles, SIZING_PARETO_MAX_PILES), length, width, aspect_min, aspect_max)
+    return result
@@ -0,0 +1,198 @@
+import math
+import random
+
+from app.calc import calc_variants
+from app.schemas import CalcRequest
+from app.sweep import FIELD_LABELS, SWEEP_FIELDS, cast_field
+
+
+# =========================
+# 全局敏感性分析（Sobol 指数）：各因子同时变化，含交互作用
+# =========================
+# 采样：加扰 Halton 准随机序列（每维、每位数字独立随机置换），A/B 两个 N×k 样本矩阵 + k 个交换列矩阵 AB_i，
+# 共 N×(k+2) 次测算；一阶指数用 Saltelli(2010) 估计，总效应指数用 Jansen 估计。
+# 测算走 calc_variants（几何缓存 + 只算经营阶段，不生成说明文字），按块计算只保留两个输出值。
+SOBOL_OUTPUTS = ("payback_net_years", "revenue_net_year_yuan")
+SOBOL_DEFAULT_SAMPLES = 2048
+SOBOL_DEFAULT_SPREAD = 0.2             # 未指定范围的因子：基准值 ±20%
+SOBOL_PAYBACK_CAP_YEARS = 30.0         # 无法回收（净现金流≤0）的情景按该回收期计入方差
+SOBOL_MAX_EVALUATIONS = 400_000
+SOBOL_BLOCK = 2048
+SOBOL_VAR_RTOL = 1e-12                 # 方差不超过 均值² × 该值视为浮点噪声（输出恒定），指数记 0
+
+
+def _primes(count: int) -> list:
+    primes = []
+    n = 2
+    while len(primes) < count:
+        if all(n % p for p in primes if p * p <= n):
+            primes.append(n)
+        n += 1
+    return primes
+
+
+def scrambled_halton(n: int, dims: int, seed: int = 0) -> list:
+    """
+    加扰 Halton 序列：返回 dims 列、每列 n 个 (0,1) 内的点。
+    每一维的每一位数字用独立的随机置换（高维 Halton 的相邻维相关性由此打散），首点从 1 开始。
+    """
+    rng = random.Random(seed)
+    columns = []
+    for base in _primes(dims):
+        digits = max(1, math.ceil(math.log(n + 1, base))) + 1
+        perms = [rng.sample(range(base), base) for _ in range(digits)]
+        shift = rng.random()
+        col = []
+        for i in range(1, n + 1):
+            x = 0.0
+            scale = 1.0 / base
+            k = i
+            for perm in perms:
+                k, d = divmod(k, base)
+                x += perm[d] * scale
+                scale /= base
+            # 末位以下补一个随机偏移，避免点落在 0 上
+            x += shift * scale * base
+            col.append(x - math.floor(x))
+        columns.append(col)
+    return columns
+
+
+def _field_limits(name: str) -> tuple:
+    """CalcRequest 字段的上下限（ge/gt/le/lt 约束；gt/lt 视同闭区间，取值范围只做截断）"""
+    lo, hi = -math.inf, math.inf
+    for c in CalcRequest.model_fields[name].metadata:
+        for attr in ("ge", "gt"):
+            if getattr(c, attr, None) is not None:
+                lo = max(lo, getattr(c, attr))
+        for attr in ("le", "lt"):
+            if getattr(c, attr, None) is not None:
+                hi = min(hi, getattr(c, attr))
+    return lo, hi
+
+
+def default_ranges(base: dict, spread: float = SOBOL_DEFAULT_SPREAD) -> dict:
+    """未指定范围时：基准值非零的数值字段取 基准 ±spread（截断到字段允许范围内）"""
+    ranges = {}
+    for name in SWEEP_FIELDS:
+        value = base.get(name)
+        if not value:
+            continue
+        limit_lo, limit_hi = _field_limits(name)
+        ranges[name] = (max(limit_lo, value * (1 - spread)), min(limit_hi, value * (1 + spread)))
+    return ranges
+
+
+def _outputs(result: dict) -> tuple:
+    payback = result.get("payback_net_years")
+    return (
+        SOBOL_PAYBACK_CAP_YEARS if payback is None else min(payback, SOBOL_PAYBACK_CAP_YEARS),
+        result.get("revenue_net_year_yuan") or 0.0,
+        payback is None,
+    )
+
+
+def _mean(xs) -> float:
+    return sum(xs) / len(xs) if xs else 0.0
+
+
+def sobol_indices(base: dict, ranges: dict, samples: int = SOBOL_DEFAULT_SAMPLES, seed: int = 0) -> dict:
+    names = list(ranges)
+    k = len(names)
+    if k == 0:
+        raise ValueError("没有可分析的因子（请指定 ranges，或给出非零的基准值）")
+    for name in names:
+        if name not in SWEEP_FIELDS:
+            raise ValueError(f"不支持分析的字段：{name}")
+    evaluations = samples * (k + 2)
+    if evaluations > SOBOL_MAX_EVALUATIONS:
+        raise ValueError(f"测算次数 {samples}×({k}+2)={evaluations} 超过上限 {SOBOL_MAX_EVALUATIONS}")
+
+    cols = scrambled_halton(samples, 2 * k, seed)
+    bounds = [(float(min(ranges[n])), float(max(ranges[n]))) for n in names]
+    # 先按字段类型取整/转换好各列，AB_i 直接复用 A/B 的列
+    a = [[cast_field(n, lo + (hi - lo) * u) for u in col] for n, col, (lo, hi) in zip(names, cols[:k], bounds)]
+    b = [[cast_field(n, lo + (hi - lo) * u) for u in col] for n, col, (lo, hi) in zip(names, cols[k:], bounds)]
+
+    def run(columns):
+        """按列给出的 N 个情景 → 两个输出序列（按块测算，不保留完整结果）"""
+        ys = ([], [])
+        unprofitable = 0
+        for start in range(0, samples, SOBOL_BLOCK):
+            block = zip(*(col[start:start + SOBOL_BLOCK] for col in columns))
+            for result in calc_variants(base, [dict(zip(names, row)) for row in block]):
+                payback, net, lost = _outputs(result)
+                ys[0].append(payback)
+                ys[1].append(net)
+                unprofitable += lost
+        return ys, unprofitable
+
+    f_a, lost_a = run(a)
+    f_b, _ = run(b)
+    f_ab = [run(a[:i] + [b[i]] + a[i + 1:])[0] for i in range(k)]
+
+    outputs = {}
+    for o, output in enumerate(SOBOL_OUTPUTS):
+        ya, yb = f_a[o], f_b[o]
+        pooled = ya + yb
+        mean = _mean(pooled)
+        var = _mean([(y - mean) ** 2 for y in pooled])
+        if var <= SOBOL_VAR_RTOL * mean * mean:
+            var = 0.0
+        ranking = []
+        for i, name in enumerate(names):
+            yab = f_ab[i][o]
+            if var > 0:
+                first = _mean([y_b * (y_ab - y_a) for y_a, y_b, y_ab in zip(ya, yb, yab)]) / var
+                total = _mean([(y_a - y_ab) ** 2 for y_a, y_ab in zip(ya, yab)]) / 2 / var
+            else:
+                first = total = 0.0
+            ranking.append({
+                "field": name,
+                "label": FIELD_LABELS.get(name, name),
+                "low": bounds[i][0],
+                "high": bounds[i][1],
+                # 估计误差可能使指数略出 [0,1]，输出时截断
+                "first_order": min(1.0, max(0.0, first)),
+                "total_effect": min(1.0, max(0.0, total)),
+            })
+        ranking.sort(key=lambda r: (-r["total_effect"], -r["first_order"]))
+        outputs[output] = {
+            "mean": mean,
+            "variance": var,
+            # 一阶之和明显小于 1 说明因子间交互作用显著
+            "first_order_sum": sum(r["first_order"] for r in ranking),
+            "ranking": ranking,
+        }
+
+    return {
+        "samples": samples,
+        "evaluations": evaluations,
+        "seed": seed,
+        "payback_cap_years": SOBOL_PAYBACK_CAP_YEARS,
+        "unprofitable_share": lost_a / samples,
+        "outputs": outputs,
+        "table": ranked_table(outputs),
+    }
+
+
+def ranked_table(outputs: dict) -> dict:
+    """报告可直接嵌入的排名表：按净回收期总效应排序，两个输出的一阶/总效应并列（百分比文本）"""
+    revenue = {r["field"]: r for r in outputs["revenue_net_year_yuan"]["ranking"]}
+    rows = []
+    for rank, r in enumerate(outputs["payback_net_years"]["ranking"], start=1):
+        rv = revenue[r["field"]]
+        rows.append([
+            str(rank),
+            r["label"],
+            f"{r['low']:g} ~ {r['high']:g}",
+            f"{r['first_order']:.1%}",
+            f"{r['total_effect']:.1%}",
+            f"{rv['first_order']:.1%}",
+            f"{rv['total_effect']:.1%}",
+        ])
+    return {
+        "title": "全局敏感性分析（Sobol 指数）",
+        "columns": ["排名", "因子", "取值范围", "回收期一阶", "回收期总效应", "净现金流一阶", "净现金流总效应"],
+        "rows": rows,
+    }
@@ -0,0 +1,178 @@
+import gzip
+import hashlib
+import mimetypes
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+try:
+    import brotli  # 见 requirements.txt；未安装时退化为只提供 gzip 变体
+except ImportError:
+    brotli = None
+
+
+# 文件名中带内容指纹（如 app.3f2a9c1b.js）的资源可长期缓存；其余资源每次都要协商（命中则 304）
+FINGERPRINT_RE = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+
+MIN_COMPRESS_BYTES = 256
+COMPRESSIBLE_TYPES = (
+    "text/", "application/javascript", "application/json", "application/xml", "image/svg+xml",
+)
+
+# 编码 → (预压缩文件后缀, ETag 后缀)
+ENCODINGS = {
+    "br": (".br", "-br"),
+    "gzip": (".gz", "-gz"),
+}
+
+
+def _compress(encoding: str, body: bytes):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11)
+    return None
+
+
+def _parse_accept_encoding(value: str) -> dict:
+    """解析 Accept-Encoding，返回 {编码: q值}"""
+    accepted = {}
+    for part in (value or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+class StaticAsset:
+    def __init__(self, path: Path, rel_path: str):
+        body = path.read_bytes()
+        mtime = path.stat().st_mtime
+
+        self.rel_path = rel_path
+        self.content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/"):
+            self.content_type += "; charset=utf-8"
+        self.etag_base = hashlib.sha256(body).hexdigest()[:32]
+        self.last_modified = formatdate(int(mtime), usegmt=True)
+        self.mtime = int(mtime)
+        self.cache_control = CACHE_IMMUTABLE if FINGERPRINT_RE.search(path.name) else CACHE_REVALIDATE
+
+        # identity 必有；压缩变体优先用构建期生成的 .br/.gz 同名文件，没有则启动时生成一次
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES and self.content_type.startswith(COMPRESSIBLE_TYPES):
+            for encoding, (suffix, _) in ENCODINGS.items():
+                prebuilt = path.with_name(path.name + suffix)
+                if prebuilt.is_file() and prebuilt.stat().st_mtime >= mtime:
+                    data = prebuilt.read_bytes()
+                else:
+                    data = _compress(encoding, body)
+                if data is not None and len(data) < len(body):
+                    self.variants[encoding] = data
+
+    def etag(self, encoding: str) -> str:
+        suffix = ENCODINGS[encoding][1] if encoding in ENCODINGS else ""
+        return f'"{self.etag_base}{suffix}"'
+
+    def choose_encoding(self, accept_encoding: str) -> str:
+        accepted = _parse_accept_encoding(accept_encoding)
+        best, best_q = "identity", 0.0
+        # 同 q 值时按 br > gzip 的顺序优先
+        for encoding in ENCODINGS:
+            if encoding not in self.variants:
+                continue
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+
+class PrecompressedStatic:
+    """
+    静态资源：启动时读入内存并预压缩（gzip / brotli），按 Accept-Encoding 协商；
+    强 ETag + Last-Modified，条件请求命中返回 304。
+    既可作为 ASGI app 挂载，也可通过 response() 给普通路由使用。
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.assets = {}
+        self.load()
+
+    def load(self):
+        assets = {}
+        if self.directory.is_dir():
+            for path in sorted(self.directory.rglob("*")):
+                if not path.is_file():
+                    continue
+                if path.suffix in {".gz", ".br"} and path.with_suffix("").is_file():
+                    continue  # 构建期预压缩产物，挂在原文件的变体上
+                rel_path = path.relative_to(self.directory).as_posix()
+                assets[rel_path] = StaticAsset(path, rel_path)
+        self.assets = assets
+
+    def _not_modified(self, asset: StaticAsset, etag: str, headers) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return asset.mtime <= int(parsedate_to_datetime(if_modified_since).timestamp())
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, rel_path: str, headers, method: str = "GET") -> Response:
+        asset = self.assets.get(rel_path)
+        if asset is None:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        encoding = asset.choose_encoding(headers.get("accept-encoding", ""))
+        etag = asset.etag(encoding)
+        resp_headers = {
+            "ETag": etag,
+            "Last-Modified": asset.last_modified,
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+
+        if self._not_modified(asset, etag, headers):
+            return Response(status_code=304, headers=resp_headers)
+
+        body = asset.variants[encoding]
+        if encoding != "identity":
+            resp_headers["Content-Encoding"] = encoding
+        if method == "HEAD":
+            resp_headers["Content-Length"] = str(len(body))
+            body = b""
+        return Response(content=body, media_type=asset.content_type, headers=resp_headers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        request = Request(scope, receive)
+        if request.method not in {"GET", "HEAD"}:
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+        else:
+            rel_path = scope.get("path_params", {}).get("path") or scope["path"]
+            root_path = scope.get("root_path", "")
+            if root_path and rel_path.startswith(root_path):
+                rel_path = rel_path[len(root_path):]
+            response = self.response(rel_path.lstrip("/"), request.headers, request.method)
+        await response(scope, receive, send)
@@ -0,0 +1,267 @@
+import math
+
+from app.calc import GRID_POWER_FACTOR, calc_plan, layout_geometry, _f, _i
+from app.tariff import (
+    HOURS_PER_YEAR,
+    TARIFF_REGIONS,
+    hourly_periods,
+    hourly_prices,
+    load_shape,
+    normalize_shape,
+)
+
+
+# =========================
+# 电网接入上限下的储能配置优化（逐时调度 8760 小时）
+# =========================
+STORAGE_ROUND_TRIP_EFF = 0.90        # 储能往返效率（充、放各取平方根）
+STORAGE_LIFE_YEARS = 10              # 比较口径：储能投资 + 寿命期内购电成本
+UNSERVED_TOLERANCE = 0.005           # 允许的缺供电量比例（超过视为电力不足）
+MAX_STORAGE_HOURS = 4.0              # 储能时长上限（kWh/kW）
+MAX_STORAGE_POWER_RATIO = 1.0        # 储能功率上限（相对接入有功）
+STORAGE_POWER_STEP_KW = 10.0
+STORAGE_ENERGY_STEP_KWH = 10.0
+DEFAULT_TARIFF_REGION = "national"   # 未选电价地区时按全国平均分时电价调度
+CHEAP_PERIODS = ("v", "f")           # 谷/平时段：储能可充满
+COARSE_POWER_LEVELS = 8              # 粗搜索的功率档数（再逐级二分加密）
+
+
+def _round_up(x: float, step: float) -> float:
+    return math.ceil(x / step - 1e-9) * step
+
+
+def _day_reserve(shortfall: list) -> list:
+    """当日剩余小时的缺口电量之和（高价时段放电套利时为其预留）"""
+    reserve = [0.0] * len(shortfall)
+    for day_end in range(len(shortfall), 0, -24):
+        acc = 0.0
+        for h in range(day_end - 1, day_end - 25, -1):
+            reserve[h] = acc
+            acc += shortfall[h]
+    return reserve
+
+
+def dispatch(demand_kw: list, cap_kw: float, power_kw: float, energy_kwh: float,
+             prices: tuple, periods: tuple, reserve: list,
+             round_trip_eff: float = STORAGE_ROUND_TRIP_EFF) -> dict:
+    """
+    逐时调度（1 小时步长，kWh 即小时平均 kW）：
+    - 负荷超出接入上限：储能放电补缺，补不上的计为缺供；
+    - 谷/平时段：用剩余接入容量充电至满；
+    - 峰/尖时段：只充到当日后续缺口所需，高于该预留的电量放电抵减购电（套利）。
+    """
+    eta = math.sqrt(round_trip_eff)
+    soc = 0.0
+    cost = 0.0
+    grid_kwh = 0.0
+    unserved = 0.0
+    unserved_cost = 0.0
+    throughput = 0.0
+    for load, price, period, need_later in zip(demand_kw, prices, periods, reserve):
+        if load > cap_kw:
+            need = load - cap_kw
+            dis = min(power_kw, need, soc * eta)
+            soc -= dis / eta
+            unserved += need - dis
+            unserved_cost += (need - dis) * price
+            throughput += dis
+            grid = cap_kw
+        else:
+            grid = load
+            target = energy_kwh if period in CHEAP_PERIODS else min(energy_kwh, need_later)
+            if soc < target:
+                ch = min(power_kw, cap_kw - load, (target - soc) / eta)
+                soc += ch * eta
+                grid += ch
+            elif soc > need_later and period not in CHEAP_PERIODS:
+                dis = min(power_kw, load, (soc - need_later) * eta)
+                soc -= dis / eta
+                grid -= dis
+                throughput += dis
+        grid_kwh += grid
+        cost += grid * price
+    return {
+        "energy_cost_year_yuan": cost,
+        "grid_kwh": grid_kwh,
+        "unserved_kwh": unserved,
+        "unserved_cost_yuan": unserved_cost,
+        "discharge_kwh": throughput,
+    }
+
+
+def _demand_shape(hourly_load_kwh) -> tuple:
+    return normalize_shape(hourly_load_kwh) if hourly_load_kwh else load_shape()
+
+
+def optimize_storage(
+    d: dict,
+    hourly_load_kwh=None,
+    life_years: float = STORAGE_LIFE_YEARS,
+    unserved_tolerance: float = UNSERVED_TOLERANCE,
+    max_hours: float = MAX_STORAGE_HOURS,
+) -> dict:
+    """
+    给定电网接入上限与充电负荷形状（24 点日内权重或 8760 逐时），
+    1) 在储能上限（功率≤接入有功、时长≤max_hours）内二分出可满足供电的最大桩数 → n_power；
+    2) 对该桩数由粗到细搜索储能功率/容量，使“储能投资 + 寿命期购电成本”最小（缺供超限的方案淘汰）；
+    3) 把 n_power_max 与储能规模带回 calc_plan，得到含储能投资的经营测算。
+    """
+    cap_kva = _f(d.get("grid_cap_kva"), 0)
+    if cap_kva <= 0:
+        raise ValueError("储能优化需要填写电网接入容量 grid_cap_kva")
+    cap_kw = cap_kva * GRID_POWER_FACTOR
+
+    region = str(d.get("tariff_region") or "").strip()
+    if region not in TARIFF_REGIONS:
+        region = DEFAULT_TARIFF_REGION
+    prices = hourly_prices(region)
+    periods = hourly_periods(region)
+
+    guns_per_pile = _i(d.get("guns_per_pile"), 2)
+    kwh_per_gun_per_day = _f(d.get("kwh_per_gun_per_day"), 1000)
+    days_per_year = _i(d.get("days_per_year"), 330)
+    eff = _f(d.get("charging_efficiency"), 0.95) or 1.0
+    service_fee = _f(d.get("service_fee_yuan_per_kwh"), 0.3)
+    sell = d.get("electricity_sell_yuan_per_kwh")
+    cost_kw = _f(d.get("storage_cost_yuan_per_kw"), 300)
+    cost_kwh = _f(d.get("storage_cost_yuan_per_kwh"), 900)
+
+    # 单桩全年购电负荷（kW，逐时），桩数为 n 时按比例放大
+    shape = _demand_shape(hourly_load_kwh)
+    pile_energy_grid = guns_per_pile * kwh_per_gun_per_day * days_per_year / eff
+    unit = [pile_energy_grid * w for w in shape]
+    total_unit = sum(unit)
+
+    n_layout = layout_geometry(_f(d.get("site_length_m"), 0), _f(d.get("site_width_m"), 0))["n_layout"]
+    p_limit = _round_up(cap_kw * MAX_STORAGE_POWER_RATIO, STORAGE_POWER_STEP_KW)
+    evaluated = 0
+
+    def run(n: int, power_kw: float, energy_kwh: float, demand=None, reserve=None):
+        nonlocal evaluated
+        evaluated += 1
+        if demand is None:
+            demand = [x * n for x in unit]
+            reserve = _day_reserve([max(0.0, x - cap_kw) for x in demand])
+        out = dispatch(demand, cap_kw, power_kw, energy_kwh, prices, periods, reserve)
+        out["unserved_ratio"] = out["unserved_kwh"] / (total_unit * n) if n > 0 and total_unit > 0 else 0.0
+        return out
+
+    def feasible(n: int) -> bool:
+        if n <= 0:
+            return True
+        if max(unit) * n - cap_kw > p_limit:
+            return False
+        return run(n, p_limit, p_limit * max_hours)["unserved_ratio"] <= unserved_tolerance
+
+    # 1) 最大可供电桩数：缺供比例随桩数单调，二分
+    lo, hi = 0, n_layout
+    if not feasible(hi):
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if feasible(mid):
+                lo = mid
+            else:
+                hi = mid - 1
+    n_power = hi
+
+    # 2) 储能规模：粗网格 → 在最优点附近逐级加密
+    demand = [x * n_power for x in unit]
+    shortfall = [max(0.0, x - cap_kw) for x in demand]
+    reserve = _day_reserve(shortfall)
+    peak_short = max(shortfall) if shortfall else 0.0
+    # 搜索范围取储能上限：峰谷套利也计入购电成本，最优规模可能大于补缺所需
+    p_hi = p_limit
+    e_hi = p_hi * max_hours
+
+    cache = {}
+
+    def score(power_kw: float, energy_kwh: float):
+        power_kw = min(p_hi, max(0.0, _round_up(power_kw, STORAGE_POWER_STEP_KW)))
+        energy_kwh = min(e_hi, max(0.0, _round_up(energy_kwh, STORAGE_ENERGY_STEP_KWH)))
+        if power_kw == 0 or energy_kwh == 0:
+            power_kw = energy_kwh = 0.0
+        key = (power_kw, energy_kwh)
+        if key not in cache:
+            out = run(n_power, power_kw, energy_kwh, demand, reserve)
+            capex = cost_kw * power_kw + cost_kwh * energy_kwh
+            objective = capex + life_years * out["energy_cost_year_yuan"]
+            if out["unserved_ratio"] > unserved_tolerance:
+                objective = math.inf
+            cache[key] = (objective, power_kw, energy_kwh, capex, out)
+        return cache[key]
+
+    coarse = [
+        score(p_hi * i / COARSE_POWER_LEVELS, p_hi * i / COARSE_POWER_LEVELS * h)
+        for i in range(0, COARSE_POWER_LEVELS + 1)
+        for h in (1.0, 2.0, 3.0, max_hours)
+    ]
+    best = min(coarse, key=lambda c: c[0])
+    step_p = p_hi / COARSE_POWER_LEVELS
+    step_e = max(best[2] / 2, STORAGE_ENERGY_STEP_KWH * 2)
+    while step_p >= STORAGE_POWER_STEP_KW or step_e >= STORAGE_ENERGY_STEP_KWH:
+        step_p /= 2
+        step_e /= 2
+        _, p0, e0, _, _ = best
+        for dp in (-step_p, 0.0, step_p):
+            for de in (-step_e, 0.0, step_e):
+                cand = score(p0 + dp, e0 + de)
+                if cand[0] < best[0]:
+                    best = cand
+    if math.isinf(best[0]):
+        best = score(p_limit, p_limit * max_hours)
+
+    objective, power_kw, energy_kwh, capex, out = best
+    # 相对“接入不限、无储能”的购电成本节省，只按实际供上的电量计（峰谷套利为正，纯补缺时为充放损耗的负值）；
+    # 缺供电量没有购电，也收不到服务费和电费
+    cost_unlimited = sum(x * p for x, p in zip(demand, prices))
+    saving = cost_unlimited - out["unserved_cost_yuan"] - out["energy_cost_year_yuan"]
+    unserved_sold = out["unserved_kwh"] * eff
+    lost_service = unserved_sold * service_fee
+    if sell is None:
+        lost_electricity = out["unserved_cost_yuan"] * eff
+    else:
+        lost_electricity = unserved_sold * _f(sell, 0)
+
+    # 3) 带回经营测算
+    data = dict(d)
+    data.update({
+        "storage_kw": power_kw,
+        "storage_kwh": energy_kwh,
+        "n_power_max": n_power,
+    })
+    # calc_plan 按满负荷电量计收入与购电成本，缺供部分在这里扣回
+    if d.get("tariff_region") in TARIFF_REGIONS:
+        # 经营测算已按分时电价计购电成本时，才计入储能调度带来的购电成本变化与缺供的电费价差
+        lost_margin = lost_service + lost_electricity - out["unserved_cost_yuan"]
+        data["storage_saving_year_yuan"] = saving - lost_margin
+    else:
+        lost_margin = lost_service
+        data["storage_saving_year_yuan"] = -lost_margin
+    if hourly_load_kwh and len(hourly_load_kwh) == HOURS_PER_YEAR:
+        data["hourly_load_kwh"] = hourly_load_kwh
+    plan = calc_plan(data)
+    plan["notes"].append(
+        f"储能优化：接入{cap_kva:.0f}kVA下最多可供电{n_power}桩（布局{n_layout}桩），"
+        f"储能{power_kw:.0f}kW/{energy_kwh:.0f}kWh，投资{capex:.0f}元；"
+        f"年购电成本{out['energy_cost_year_yuan']:.0f}元（{TARIFF_REGIONS[region]['name']}分时电价），"
+        f"缺供比例{out['unserved_ratio'] * 100:.2f}%。"
+    )
+
+    return {
+        "grid_cap_kva": cap_kva,
+        "tariff_region": region,
+        "n_layout": n_layout,
+        "n_power": n_power,
+        "storage_kw": power_kw,
+        "storage_kwh": energy_kwh,
+        "storage_capex_yuan": capex,
+        "energy_cost_year_yuan": out["energy_cost_year_yuan"],
+        "energy_saving_year_yuan": saving,
+        "unserved_margin_year_yuan": lost_margin,
+        "unserved_ratio": out["unserved_ratio"],
+        "peak_shortfall_kw": peak_short,
+        "life_years": life_years,
+        "objective_yuan": objective,
+        "evaluations": evaluated,
+        "plan": plan,
+    }
@@ -0,0 +1,271 @@
+import base64
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# =========================
+# 本地项目库（SQLite）
+# =========================
+# projects：一次测算 = 输入 + calc_plan 输出；常用筛选/排序字段单独成列并建索引
+# reports：项目的报告产物（docx/pdf），同一输入（inputs_hash）、同一报告版本（测算模型 + 报告模板）已生成过的直接复用
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    site_location TEXT NOT NULL DEFAULT '',
+    n_recommend INTEGER NOT NULL DEFAULT 0,
+    payback_net_years REAL,
+    invest_total_yuan REAL NOT NULL DEFAULT 0,
+    revenue_net_year_yuan REAL NOT NULL DEFAULT 0,
+    inputs_hash TEXT NOT NULL,
+    inputs_json TEXT NOT NULL,
+    result_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_location ON projects(site_location, id);
+CREATE INDEX IF NOT EXISTS idx_projects_created ON projects(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_projects_n ON projects(n_recommend, id);
+CREATE INDEX IF NOT EXISTS idx_projects_payback ON projects(payback_net_years, id);
+CREATE INDEX IF NOT EXISTS idx_projects_hash ON projects(inputs_hash);
+
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    content BLOB NOT NULL,
+    version TEXT NOT NULL DEFAULT '',
+    UNIQUE(project_id, kind)
+);
+"""
+
+# 旧库升级：按列补齐（新增列都带默认值，旧报告的 version 为空、不会被复用）
+MIGRATIONS = (
+    ("reports", "version", "ALTER TABLE reports ADD COLUMN version TEXT NOT NULL DEFAULT ''"),
+)
+
+# 可排序字段 → 列名（keyset 分页：(排序列, id) 复合索引）
+SORT_COLUMNS = {
+    "created_at": "created_at",
+    "n_recommend": "n_recommend",
+    "payback_net_years": "payback_net_years",
+}
+MAX_PAGE_SIZE = 200
+
+SUMMARY_COLUMNS = (
+    "id, created_at, site_location, n_recommend, payback_net_years, "
+    "invest_total_yuan, revenue_net_year_yuan"
+)
+
+
+def inputs_hash(inputs: dict) -> str:
+    """输入的规范化哈希（键排序、紧凑 JSON），用于识别“同一方案”"""
+    canonical = json.dumps(inputs, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _encode_cursor(value, row_id: int) -> str:
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return value, int(row_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+def _summary(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "created_at": row["created_at"],
+        "site_location": row["site_location"],
+        "n_recommend": row["n_recommend"],
+        "payback_net_years": row["payback_net_years"],
+        "invest_total_yuan": row["invest_total_yuan"],
+        "revenue_net_year_yuan": row["revenue_net_year_yuan"],
+    }
+
+
+class ProjectStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            for table, column, ddl in MIGRATIONS:
+                if column not in {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(ddl)
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程一条连接（sqlite3 连接不跨线程共享）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # ---------- 写入 ----------
+    def _row(self, inputs: dict, result: dict, created_at: float) -> tuple:
+        return (
+            created_at,
+            str(inputs.get("site_location") or "").strip(),
+            int(result.get("n_recommend") or 0),
+            result.get("payback_net_years"),
+            float(result.get("invest_total_yuan") or 0),
+            float(result.get("revenue_net_year_yuan") or 0),
+            inputs_hash(inputs),
+            json.dumps(inputs, ensure_ascii=False, default=str),
+            json.dumps(result, ensure_ascii=False, default=str),
+        )
+
+    _INSERT = (
+        "INSERT INTO projects (created_at, site_location, n_recommend, payback_net_years, "
+        "invest_total_yuan, revenue_net_year_yuan, inputs_hash, inputs_json, result_json) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    def save_project(self, inputs: dict, result: dict) -> dict:
+        created_at = time.time()
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(self._INSERT, self._row(inputs, result, created_at))
+        return {"id": cur.lastrowid, "created_at": created_at}
+
+    def bulk_save(self, items) -> list:
+        """批量写入（单事务 executemany），items 为 [(inputs, result), ...]；返回新 id 列表"""
+        created_at = time.time()
+        rows = [self._row(inputs, result, created_at) for inputs, result in items]
+        if not rows:
+            return []
+        conn = self._conn()
+        # BEGIN IMMEDIATE 先拿写锁：事务内 INTEGER PRIMARY KEY 从 MAX(id)+1 连续递增
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            first = conn.execute("SELECT COALESCE(MAX(id), 0) FROM projects").fetchone()[0]
+            conn.executemany(self._INSERT, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return list(range(first + 1, first + 1 + len(rows)))
+
+    # ---------- 查询 ----------
+    def get_project(self, project_id: int):
+        row = self._conn().execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+        if row is None:
+            return None
+        out = _summary(row)
+        out["inputs_hash"] = row["inputs_hash"]
+        out["inputs"] = json.loads(row["inputs_json"])
+        out["result"] = json.loads(row["result_json"])
+        out["reports"] = [
+            {"kind": r["kind"], "created_at": r["created_at"], "sha256": r["sha256"], "size": r["size"], "version": r["version"]}
+            for r in self._conn().execute(
+                "SELECT kind, created_at, sha256, size, version FROM reports WHERE project_id = ? ORDER BY kind",
+                (project_id,),
+            )
+        ]
+        return out
+
+    def query_projects(
+        self,
+        location_prefix: str = "",
+        n_min=None,
+        n_max=None,
+        payback_max=None,
+        created_from=None,
+        created_to=None,
+        sort: str = "created_at",
+        desc: bool = True,
+        limit: int = 50,
+        cursor: str = None,
+    ) -> dict:
+        """
+        条件查询 + keyset 分页（按 (排序列, id) 续翻，翻页代价与页码无关）。
+        按 payback_net_years 排序时不含回收期为空（净现金流<=0）的项目。
+        """
+        column = SORT_COLUMNS.get(sort)
+        if column is None:
+            raise ValueError(f"不支持的排序字段：{sort}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        where, params = [], []
+        if location_prefix:
+            # 前缀区间查询，可走 site_location 索引
+            where.append("site_location >= ? AND site_location < ?")
+            params += [location_prefix, location_prefix + "\uffff"]
+        if n_min is not None:
+            where.append("n_recommend >= ?")
+            params.append(int(n_min))
+        if n_max is not None:
+            where.append("n_recommend <= ?")
+            params.append(int(n_max))
+        if payback_max is not None:
+            where.append("payback_net_years IS NOT NULL AND payback_net_years <= ?")
+            params.append(float(payback_max))
+        if created_from is not None:
+            where.append("created_at >= ?")
+            params.append(float(created_from))
+        if created_to is not None:
+            where.append("created_at < ?")
+            params.append(float(created_to))
+        if column == "payback_net_years":
+            where.append("payback_net_years IS NOT NULL")
+
+        if cursor:
+            value, last_id = _decode_cursor(cursor)
+            op = "<" if desc else ">"
+            where.append(f"({column}, id) {op} (?, ?)")
+            params += [value, last_id]
+
+        order = "DESC" if desc else "ASC"
+        sql = f"SELECT {SUMMARY_COLUMNS} FROM projects"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {column} {order}, id {order} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._conn().execute(sql, params).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][column], rows[-1]["id"]) if has_more else None
+        return {"items": [_summary(r) for r in rows], "next_cursor": next_cursor}
+
+    # ---------- 报告产物 ----------
+    def get_report(self, project_id: int, kind: str, version: str):
+        """本项目已有报告，或相同输入的其他项目已生成过的报告；只复用同一报告版本生成的产物"""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT content FROM reports WHERE project_id = ? AND kind = ? AND version = ?",
+            (project_id, kind, version),
+        ).fetchone()
+        if row is None:
+            row = conn.execute(
+                "SELECT r.content FROM reports r JOIN projects p ON p.id = r.project_id "
+                "WHERE p.inputs_hash = (SELECT inputs_hash FROM projects WHERE id = ?) AND r.kind = ? "
+                "AND r.version = ? LIMIT 1",
+                (project_id, kind, version),
+            ).fetchone()
+        return bytes(row["content"]) if row is not None else None
+
+    def save_report(self, project_id: int, kind: str, content: bytes, version: str):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (project_id, kind, created_at, sha256, size, content, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (project_id, kind, time.time(), hashlib.sha256(content).hexdigest(), len(content), content, version),
+            )
@@ -0,0 +1,167 @@
+import itertools
+import math
+import random
+
+from app.calc import calc_variants
+
+
+# =========================
+# 情景扫描（网格 / 蒙特卡洛）：按块生成、按块计算，内存与情景总数无关
+# =========================
+# 可参与扫描的数值字段（与 CalcRequest 一致）
+SWEEP_FIELDS = {
+    "site_length_m": float,
+    "site_width_m": float,
+    "pile_kva_per": float,
+    "guns_per_pile": int,
+    "kwh_per_gun_per_day": float,
+    "service_fee_yuan_per_kwh": float,
+    "days_per_year": int,
+    "power_cost_yuan_per_kva": float,
+    "civil_cost_yuan_per_sqm": float,
+    "pile_cost_yuan_each": float,
+    "rent_yuan_per_sqm_month": float,
+    "staff_count": int,
+    "salary_yuan_per_month": float,
+    "charging_efficiency": float,
+    "electricity_sell_yuan_per_kwh": float,
+    "grid_cap_kva": float,
+}
+
+# 每行输出的结果字段
+ROW_FIELDS = (
+    "n_recommend",
+    "invest_total_yuan",
+    "revenue_year_yuan",
+    "revenue_net_year_yuan",
+    "payback_net_years",
+)
+
+
+# 字段中文名（导出表头、敏感性排名表）
+FIELD_LABELS = {
+    "idx": "序号",
+    "error": "错误",
+    "site_location": "场站位置",
+    "site_length_m": "场地长度(m)",
+    "site_width_m": "场地宽度(m)",
+    "pile_kva_per": "单桩功率(kW)",
+    "guns_per_pile": "每桩枪数",
+    "kwh_per_gun_per_day": "利用率(kWh/枪·天)",
+    "service_fee_yuan_per_kwh": "服务费(元/度)",
+    "days_per_year": "年运营天数",
+    "power_cost_yuan_per_kva": "电力投资(元/kVA)",
+    "civil_cost_yuan_per_sqm": "土建单价(元/㎡)",
+    "pile_cost_yuan_each": "单桩价格(元)",
+    "rent_yuan_per_sqm_month": "租金(元/㎡·月)",
+    "staff_count": "人员数",
+    "salary_yuan_per_month": "月薪(元)",
+    "charging_efficiency": "充电效率",
+    "electricity_sell_yuan_per_kwh": "售电单价(元/度)",
+    "grid_cap_kva": "电网接入容量(kVA)",
+    "n_recommend": "推荐桩数",
+    "invest_total_yuan": "总投资(元)",
+    "revenue_year_yuan": "年服务费收入(元)",
+    "revenue_net_year_yuan": "净年现金流(元)",
+    "payback_net_years": "净回收期(年)",
+}
+
+
+def _check_field(name: str):
+    if name not in SWEEP_FIELDS:
+        raise ValueError(f"不支持扫描的字段：{name}")
+
+
+def cast_field(name: str, value: float):
+    """扫描取值按字段类型取整（整数字段四舍五入），校验与逐行测算共用"""
+    return int(round(value)) if SWEEP_FIELDS[name] is int else float(value)
+
+
+def grid_size(factors: dict) -> int:
+    return math.prod(len(v) for v in factors.values()) if factors else 0
+
+
+def iter_grid(factors: dict):
+    """网格扫描：各因子取值的笛卡尔积（惰性生成）"""
+    for name in factors:
+        _check_field(name)
+    names = list(factors)
+    values = [[cast_field(n, v) for v in factors[n]] for n in names]
+    for combo in itertools.product(*values):
+        yield dict(zip(names, combo))
+
+
+def iter_monte_carlo(ranges: dict, samples: int, seed: int = 0):
+    """蒙特卡洛：各因子在 [lo, hi] 内均匀抽样（整数字段取整）"""
+    for name in ranges:
+        _check_field(name)
+    rng = random.Random(seed)
+    bounds = [(n, float(lo), float(hi)) for n, (lo, hi) in ranges.items()]
+    for _ in range(samples):
+        yield {n: cast_field(n, rng.uniform(lo, hi)) for n, lo, hi in bounds}
+
+
+def iter_chunks(scenarios, chunk_size: int):
+    chunk = []
+    for overrides in scenarios:
+        chunk.append(overrides)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def evaluate_chunk(base: dict, chunk, start_idx: int) -> list:
+    # 只改经营参数的情景共用同一几何结果，每行只算经营阶段（见 calc_variants）
+    rows = []
+    for offset, (overrides, result) in enumerate(zip(chunk, calc_variants(base, chunk))):
+        row = {"idx": start_idx + offset}
+        row.update(overrides)
+        for key in ROW_FIELDS:
+            row[key] = result.get(key)
+        rows.append(row)
+    return rows
+
+
+def _payback_score(row):
+    pb = row.get("payback_net_years")
+    return math.inf if pb is None else pb
+
+
+class SweepSummary:
+    """滚动汇总：最佳/最差情景（按净回收期，无法回收视为最差）与净现金流区间"""
+
+    def __init__(self):
+        self.count = 0
+        self.best = None
+        self.worst = None
+        self.net_min = None
+        self.net_max = None
+        self.unprofitable = 0
+
+    def update(self, rows):
+        for row in rows:
+            self.count += 1
+            score = _payback_score(row)
+            if self.best is None or score < _payback_score(self.best):
+                self.best = row
+            if self.worst is None or score > _payback_score(self.worst):
+                self.worst = row
+            net = row.get("revenue_net_year_yuan") or 0.0
+            if self.net_min is None or net < self.net_min:
+                self.net_min = net
+            if self.net_max is None or net > self.net_max:
+                self.net_max = net
+            if row.get("payback_net_years") is None:
+                self.unprofitable += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "best": self.best,
+            "worst": self.worst,
+            "net_min_yuan": self.net_min,
+            "net_max_yuan": self.net_max,
+            "unprofitable": self.unprofitable,
+        }
@@ -0,0 +1,230 @@
+import operator
+from datetime import date, timedelta
+from functools import lru_cache
+
+
+# =========================
+# 分时电价口径（8760 小时）
+# =========================
+# 时段代码：s=尖峰 p=高峰 f=平段 v=低谷；每个季节一条 24 字符串，第 i 位为 i 点~i+1 点所属时段
+# 电价为示例值（元/kWh，1-10kV 工商业），实际以当地最新分时电价文件为准
+HOURS_PER_YEAR = 8760
+TARIFF_YEAR = 2025                   # 取非闰年，按 365 天排布月份
+PERIOD_NAMES = {"s": "尖峰", "p": "高峰", "f": "平段", "v": "低谷"}
+
+TARIFF_REGIONS = {
+    "guangdong": {
+        "name": "广东（珠三角）",
+        "prices": {"s": 1.35, "p": 1.08, "f": 0.65, "v": 0.28},
+        "seasons": [
+            {"months": [7, 8, 9], "hours": "vvvvvvvvffpsffpssppfffff"},
+            {"months": [1, 2, 3, 4, 5, 6, 10, 11, 12], "hours": "vvvvvvvvffppffpppppfffff"},
+        ],
+    },
+    "jiangsu": {
+        "name": "江苏",
+        "prices": {"s": 1.22, "p": 1.02, "f": 0.62, "v": 0.30},
+        "seasons": [
+            {"months": [7, 8], "hours": "vvvvvvvvpppffssffppppfvv"},
+            {"months": [1, 12], "hours": "vvvvvvvvpppfffffffspppvv"},
+            {"months": [2, 3, 4, 5, 6, 9, 10, 11], "hours": "vvvvvvvvpppfffffffppppvv"},
+        ],
+    },
+    "zhejiang": {
+        "name": "浙江",
+        "prices": {"s": 1.25, "p": 1.00, "f": 0.68, "v": 0.33},
+        "seasons": [
+            {"months": [7, 8], "hours": "vvvvvvvvfpsppvvfppffffvv"},
+            {"months": [1, 2, 3, 4, 5, 6, 9, 10, 11, 12], "hours": "vvvvvvvvfpppfvvfppffffvv"},
+        ],
+    },
+    "shandong": {
+        "name": "山东",
+        "prices": {"s": 1.15, "p": 0.95, "f": 0.60, "v": 0.26},
+        "seasons": [
+            # 光伏大发：午间深谷
+            {"months": [6, 7, 8], "hours": "ffffffppfvvvvvvfpsspppff"},
+            {"months": [1, 2, 3, 4, 5, 9, 10, 11, 12], "hours": "ffffffppfvvvvvvfpppppfff"},
+        ],
+    },
+    "hebei": {
+        "name": "河北（南网）",
+        "prices": {"s": 1.10, "p": 0.92, "f": 0.60, "v": 0.31},
+        "seasons": [
+            {"months": [6, 7, 8], "hours": "vvvvvvvfffvvvffpsspppfff"},
+            {"months": [1, 2, 3, 4, 5, 9, 10, 11, 12], "hours": "vvvvvvvfffvvvffpppppffff"},
+        ],
+    },
+    "sichuan": {
+        "name": "四川",
+        "prices": {"s": 1.05, "p": 0.88, "f": 0.58, "v": 0.27},
+        "seasons": [
+            {"months": [7, 8], "hours": "vvvvvvvffpppfffpssppffvv"},
+            {"months": [1, 2, 3, 4, 5, 6, 9, 10, 11, 12], "hours": "vvvvvvvffpppfffpppppffvv"},
+        ],
+    },
+    "national": {
+        "name": "全国平均（示例）",
+        "prices": {"s": 1.15, "p": 0.95, "f": 0.62, "v": 0.30},
+        "seasons": [
+            {"months": list(range(1, 13)), "hours": "vvvvvvvvfppfffffpppppfff"},
+        ],
+    },
+}
+
+# 充电负荷日内形状（0~23 点相对权重）：到站分布向后平滑约 1 小时
+DEFAULT_LOAD_PROFILE = [
+    3.0, 3.0, 2.8, 2.3, 1.8, 1.5,
+    1.8, 2.5, 3.5, 4.3, 4.8, 5.5,
+    6.5, 6.8, 5.8, 4.8, 4.5, 4.8,
+    5.3, 5.3, 4.8, 4.3, 3.8, 3.3,
+]
+DEFAULT_LOAD_WEEKDAY = [1.0, 1.0, 1.0, 1.0, 1.0, 0.85, 0.7]
+
+
+def _month_of_hour():
+    start = date(TARIFF_YEAR, 1, 1)
+    months = []
+    for day in range(HOURS_PER_YEAR // 24):
+        months.extend([(start + timedelta(days=day)).month] * 24)
+    return months
+
+
+@lru_cache(maxsize=None)
+def hourly_periods(region: str) -> tuple:
+    """8760 小时的时段代码序列"""
+    cfg = TARIFF_REGIONS[region]
+    by_month = {}
+    for season in cfg["seasons"]:
+        hours = season["hours"]
+        if len(hours) != 24 or set(hours) - set(PERIOD_NAMES):
+            raise ValueError(f"电价时段配置错误：{region}")
+        for m in season["months"]:
+            by_month[m] = hours
+    return tuple(by_month[m][h % 24] for h, m in enumerate(_month_of_hour()))
+
+
+@lru_cache(maxsize=None)
+def hourly_prices(region: str) -> tuple:
+    """8760 小时的购电单价（元/kWh）"""
+    prices = TARIFF_REGIONS[region]["prices"]
+    return tuple(prices[code] for code in hourly_periods(region))
+
+
+@lru_cache(maxsize=64)
+def load_shape(hourly_profile: tuple = None, weekday_factors: tuple = None) -> tuple:
+    """全年 8760 小时充电负荷形状，归一化为总和=1（乘以年电量即为逐时 kWh）；负值按 0 计，全为 0 时取默认形状"""
+    profile = [max(0.0, float(x)) for x in (hourly_profile or DEFAULT_LOAD_PROFILE)]
+    weekday = [max(0.0, float(x)) for x in (weekday_factors or DEFAULT_LOAD_WEEKDAY)]
+    raw = [profile[h % 24] * weekday[(h // 24) % 7] for h in range(HOURS_PER_YEAR)]
+    total = sum(raw)
+    if total <= 0:
+        return load_shape()
+    return tuple(x / total for x in raw)
+
+
+@lru_cache(maxsize=8)
+def _default_peak_share() -> float:
+    return max(load_shape())
+
+
+def peak_load_share(hourly_kwh=None) -> float:
+    """负荷最高小时的电量占全年电量的比例（年电量 × 该比例 = 峰值小时平均功率 kW）"""
+    if hourly_kwh:
+        return max(normalize_shape(hourly_kwh))
+    return _default_peak_share()
+
+
+def normalize_shape(hourly_kwh) -> tuple:
+    """用户给出的负荷形状归一化：24 点视为日内权重展开到全年，其余按逐时（不足 8760 补 0）；口径同 load_shape"""
+    if len(hourly_kwh) == 24:
+        return load_shape(tuple(hourly_kwh))
+    values = [max(0.0, float(x)) for x in hourly_kwh][:HOURS_PER_YEAR]
+    values += [0.0] * (HOURS_PER_YEAR - len(values))
+    total = sum(values)
+    if total <= 0:
+        return load_shape()
+    return tuple(x / total for x in values)
+
+
+def _shape_weights(region: str, shape: tuple) -> dict:
+    """负荷形状在各时段的电量占比 + 加权平均电价（全年 8760 小时一次求和）"""
+    prices = hourly_prices(region)
+    periods = hourly_periods(region)
+    share = dict.fromkeys(PERIOD_NAMES, 0.0)
+    for code, w in zip(periods, shape):
+        share[code] += w
+    return {
+        "avg_price": sum(map(operator.mul, prices, shape)),
+        "share": share,
+    }
+
+
+@lru_cache(maxsize=256)
+def _default_shape_weights(region: str) -> dict:
+    return _shape_weights(region, load_shape())
+
+
+def tariff_economics(
+    energy_year_kwh: float,
+    region: str,
+    service_fee: float,
+    sell_price=None,
+    efficiency: float = 0.95,
+    hourly_kwh=None,
+) -> dict:
+    """
+    分时电价下的年度电费成本、电费收入与电费价差：
+    - 购电量 = 售电量 / 充电效率，逐时按分时电价计价；
+    - sell_price 为空：电费按分时电价向司机收取（价差仅为损耗成本）；否则按固定售电单价收取。
+    默认负荷形状下的时段权重按地区缓存，批量/敏感性计算为 O(1)。
+    """
+    if region not in TARIFF_REGIONS:
+        raise KeyError(region)
+
+    weights = _shape_weights(region, normalize_shape(hourly_kwh)) if hourly_kwh else _default_shape_weights(region)
+    eff = efficiency if efficiency and efficiency > 0 else 1.0
+    avg_price = weights["avg_price"]
+    prices = TARIFF_REGIONS[region]["prices"]
+
+    energy_cost = energy_year_kwh / eff * avg_price
+    if sell_price is None:
+        electricity_revenue = energy_year_kwh * avg_price
+    else:
+        electricity_revenue = energy_year_kwh * sell_price
+    service_revenue = energy_year_kwh * service_fee
+
+    by_period = []
+    for code, name in PERIOD_NAMES.items():
+        kwh = energy_year_kwh * weights["share"][code]
+        if kwh <= 0:
+            continue
+        by_period.append({
+            "period": name,
+            "price_yuan_per_kwh": prices[code],
+            "energy_kwh": kwh,
+            "cost_yuan": kwh / eff * prices[code],
+        })
+
+    return {
+        "region": region,
+        "region_name": TARIFF_REGIONS[region]["name"],
+        "avg_price_yuan_per_kwh": avg_price,
+        "energy_cost_year_yuan": energy_cost,
+        "electricity_revenue_year_yuan": electricity_revenue,
+        "service_revenue_year_yuan": service_revenue,
+        "energy_margin_year_yuan": electricity_revenue - energy_cost,
+        "by_period": by_period,
+    }
+
+
+def list_regions() -> list:
+    return [
+        {
+            "region": key,
+            "name": cfg["name"],
+            "prices": {PERIOD_NAMES[k]: v for k, v in cfg["prices"].items()},
+            "seasons": cfg["seasons"],
+        }
+        for key, cfg in TARIFF_REGIONS.items()
+    ]
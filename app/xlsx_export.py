@@ -0,0 +1,195 @@
+import math
+import zipfile
+from datetime import datetime, timezone
+
+from lxml import etree
+
+
+# =========================
+# 流式 XLSX 导出：逐行写工作表 XML → 直接压缩进 zip 输出流
+# =========================
+# 不构建内存表格模型、不用共享字符串表（文本用 inlineStr），每 XLSX_FLUSH_ROWS 行把已压缩的字节交给响应，
+# 内存与行数无关；zip 写在不可 seek 的输出流上（条目用数据描述符记录长度）。
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+XLSX_FLUSH_ROWS = 2000
+XLSX_MAX_ROWS = 1_048_576                 # Excel 单表行数上限（含表头）
+XLSX_COMPRESS_LEVEL = 1                   # XML 重复度高，低压缩级别已足够且更快
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>
+</Types>"""
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" Target="docProps/core.xml"/>
+</Relationships>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# 样式：0=默认，1=表头加粗+浅灰底，2=两位小数
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="#,##0.00"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="等线"/></font><font><b/><sz val="11"/><name val="等线"/></font></fonts>
+<fills count="3"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill>
+<fill><patternFill patternType="solid"><fgColor rgb="FFEDEDED"/><bgColor indexed="64"/></patternFill></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="3">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" applyFont="1" applyFill="1"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+
+def _workbook_xml(sheet_name: str) -> bytes:
+    root = etree.Element(f"{{{NS_MAIN}}}workbook", nsmap={None: NS_MAIN, "r": NS_REL})
+    sheets = etree.SubElement(root, f"{{{NS_MAIN}}}sheets")
+    etree.SubElement(sheets, f"{{{NS_MAIN}}}sheet", {"name": sheet_name[:31], "sheetId": "1", f"{{{NS_REL}}}id": "rId1"})
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def _core_xml() -> bytes:
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        '<dc:creator>trucksite</dc:creator>'
+        f'<dcterms:created xsi:type="dcterms:W3CDTF">{now}</dcterms:created>'
+        '</cp:coreProperties>'
+    ).encode("utf-8")
+
+
+# XML 1.0 不允许的控制字符（制表、换行、回车除外）
+_ILLEGAL_XML_CHARS = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+
+
+def _text(value) -> str:
+    return str(value).translate(_ILLEGAL_XML_CHARS)
+
+
+def _column_letters(n: int) -> list:
+    letters = []
+    for i in range(n):
+        s = ""
+        i += 1
+        while i:
+            i, r = divmod(i - 1, 26)
+            s = chr(65 + r) + s
+        letters.append(s)
+    return letters
+
+
+class _Sink:
+    """不可 seek 的输出缓冲：zipfile 写入的字节暂存在这里，由生成器逐段取走"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks = []
+        return out
+
+
+def stream_xlsx(columns, rows, sheet_name: str = "Sheet1", headers=None):
+    """
+    生成 XLSX 字节流。columns 为字段名（取每行 dict 的值），headers 为表头显示名（默认同字段名）；
+    rows 为可迭代的 dict（惰性生成即可，边算边写）。数字写为数值单元格，其他写为文本。
+    """
+    columns = list(columns)
+    headers = list(headers or columns)
+    letters = _column_letters(len(columns))
+    sink = _Sink()
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=XLSX_COMPRESS_LEVEL) as zf:
+        zf.writestr("[Content_Types].xml", CONTENT_TYPES)
+        zf.writestr("_rels/.rels", ROOT_RELS)
+        zf.writestr("docProps/core.xml", _core_xml())
+        zf.writestr("xl/workbook.xml", _workbook_xml(sheet_name))
+        zf.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", STYLES)
+        yield sink.drain()
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as member:
+            with etree.xmlfile(member, encoding="UTF-8", buffered=True) as xf:
+                xf.write_declaration(standalone=True)
+                with xf.element("worksheet", nsmap={None: NS_MAIN}):
+                    # 子元素不带命名空间：xmlfile 按文本写出，落在 worksheet 声明的默认命名空间下
+                    # 冻结表头行
+                    views = etree.Element("sheetViews")
+                    view = etree.SubElement(views, "sheetView", workbookViewId="0")
+                    etree.SubElement(view, "pane", ySplit="1", topLeftCell="A2", activePane="bottomLeft", state="frozen")
+                    xf.write(views)
+                    cols = etree.Element("cols")
+                    for i, h in enumerate(headers, start=1):
+                        width = max(10, min(40, len(str(h)) * 2 + 2))
+                        etree.SubElement(cols, "col", min=str(i), max=str(i), width=str(width), customWidth="1")
+                    xf.write(cols)
+
+                    with xf.element("sheetData"):
+                        header_row = etree.Element("row", r="1")
+                        for letter, h in zip(letters, headers):
+                            c = etree.SubElement(header_row, "c", r=f"{letter}1", t="inlineStr", s="1")
+                            etree.SubElement(etree.SubElement(c, "is"), "t").text = _text(h)
+                        xf.write(header_row)
+
+                        r = 1
+                        for item in rows:
+                            r += 1
+                            if r > XLSX_MAX_ROWS:
+                                break
+                            row = etree.Element("row", r=str(r))
+                            for letter, key in zip(letters, columns):
+                                value = item.get(key)
+                                if value is None or value == "":
+                                    continue
+                                ref = f"{letter}{r}"
+                                if isinstance(value, bool):
+                                    c = etree.SubElement(row, "c", r=ref, t="b")
+                                    etree.SubElement(c, "v").text = "1" if value else "0"
+                                elif isinstance(value, int):
+                                    c = etree.SubElement(row, "c", r=ref)
+                                    etree.SubElement(c, "v").text = str(value)
+                                elif isinstance(value, float):
+                                    if not math.isfinite(value):
+                                        continue
+                                    c = etree.SubElement(row, "c", r=ref, s="2")
+                                    etree.SubElement(c, "v").text = repr(value)
+                                else:
+                                    c = etree.SubElement(row, "c", r=ref, t="inlineStr")
+                                    etree.SubElement(etree.SubElement(c, "is"), "t").text = _text(value)
+                            xf.write(row)
+                            if r % XLSX_FLUSH_ROWS == 0:
+                                xf.flush()
+                                chunk = sink.drain()
+                                if chunk:
+                                    yield chunk
+        yield sink.drain()
+    yield sink.drain()
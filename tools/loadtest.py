@@ -0,0 +1,415 @@
+"""
+报告接口离线压测：/api/calculate、/api/report_word、/api/report_pdf
+
+用法（在仓库根目录）：
+    python tools/loadtest.py --concurrency 8 --requests 200 --mix calculate=6,report_word=3,report_pdf=1
+    python tools/loadtest.py --mode uvicorn --layout-kb 800 --product-images 3 --soffice-latency 1.5
+
+- inprocess：进程内直接驱动 ASGI app（不经网络），测单 worker 的事件循环表现；
+- uvicorn：本地起一个 uvicorn 子进程，用多线程 HTTP 客户端并发请求。
+PDF 转换使用假的 soffice（可调延迟/抖动，输出最小 PDF），不依赖 LibreOffice。
+输出：吞吐、各接口 p50/p95/p99 延迟、错误数、峰值 RSS、临时目录峰值增长。
+"""
+import argparse
+import asyncio
+import base64
+import http.client
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+ENDPOINTS = {
+    "calculate": "/api/calculate",
+    "report_word": "/api/report_word",
+    "report_pdf": "/api/report_pdf",
+}
+
+FAKE_SOFFICE = """#!{python}
+import os, random, sys, time
+args = sys.argv[1:]
+outdir = args[args.index("--outdir") + 1] if "--outdir" in args else "."
+src = args[-1]
+time.sleep(max(0.0, {latency} + random.uniform(-{jitter}, {jitter})))
+if random.random() < {fail_rate}:
+    sys.stderr.write("fake soffice failure\\n")
+    sys.exit(1)
+name = os.path.splitext(os.path.basename(src))[0] + ".pdf"
+with open(os.path.join(outdir, name), "wb") as f:
+    f.write(b"%PDF-1.4\\n1 0 obj<</Type/Catalog>>endobj\\ntrailer<</Root 1 0 R>>\\n%%EOF\\n")
+"""
+
+
+# =========================
+# 测试数据
+# =========================
+def make_png(target_bytes: int, seed: int = 0) -> bytes:
+    """生成约 target_bytes 大小的合法 PNG（随机噪声，不压缩）"""
+    rng = random.Random(seed)
+    width = 256
+    height = max(1, target_bytes // (width * 3 + 1))
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw, 0)) + chunk(b"IEND", b"")
+
+
+def make_payload(kind: str, layout_png_data_url: str, attachments: list, rng: random.Random) -> dict:
+    payload = {
+        "site_location": rng.choice(["佛山顺德", "广州白云", "深圳龙岗", "东莞"]),
+        "site_length_m": round(rng.uniform(40, 300), 1),
+        "site_width_m": round(rng.uniform(30, 200), 1),
+        "kwh_per_gun_per_day": rng.choice([800, 1000, 1200]),
+        "rent_yuan_per_sqm_month": rng.choice([0, 3, 5]),
+    }
+    if kind != "calculate":
+        payload["attachments_selected"] = list(attachments)
+        if "layout" in attachments and layout_png_data_url:
+            payload["layout_title"] = "附件1：场站布局示意图"
+            payload["layout_png_data_url"] = layout_png_data_url
+    return payload
+
+
+def parse_mix(text: str) -> list:
+    weights = []
+    for part in text.split(","):
+        name, _, w = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"未知接口：{name}（可选 {', '.join(ENDPOINTS)}）")
+        weights.append((name, float(w or 1)))
+    return weights
+
+
+# =========================
+# 资源采样：峰值 RSS、临时目录峰值增长
+# =========================
+def dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def rss_peak_kb(pid=None) -> int:
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class Sampler(threading.Thread):
+    def __init__(self, tmp_dir: Path, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.tmp_dir = tmp_dir
+        self.interval = interval
+        self.baseline = dir_size(tmp_dir)
+        self.peak = self.baseline
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, dir_size(self.tmp_dir))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.final = dir_size(self.tmp_dir)
+        self.peak = max(self.peak, self.final)
+
+
+# =========================
+# 请求驱动
+# =========================
+async def asgi_request(app, method: str, path: str, body: bytes) -> tuple:
+    """最小 ASGI 客户端：返回 (status, 响应体字节数)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 80),
+    }
+    sent = False
+    done = asyncio.Event()
+    status = 0
+    size = 0
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    return status, size
+
+
+async def run_inprocess(jobs, concurrency: int) -> list:
+    sys.path.insert(0, str(ROOT_DIR))
+    os.chdir(ROOT_DIR)
+    from app.main import app
+
+    results = []
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def worker():
+        while True:
+            try:
+                kind, body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            try:
+                status, size = await asgi_request(app, "POST", ENDPOINTS[kind], body)
+            except Exception:
+                status, size = 0, 0
+            results.append((kind, time.perf_counter() - t0, status, size))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def run_http(jobs, concurrency: int, port: int) -> list:
+    local = threading.local()
+
+    def call(job):
+        kind, body = job
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+        t0 = time.perf_counter()
+        try:
+            conn.request("POST", ENDPOINTS[kind], body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            size = len(resp.read())
+            status = resp.status
+        except Exception:
+            conn.close()
+            local.conn = None
+            status, size = 0, 0
+        return kind, time.perf_counter() - t0, status, size
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(call, jobs))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"uvicorn 未在 {timeout:.0f}s 内启动")
+
+
+# =========================
+# 统计
+# =========================
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(results: list, wall: float) -> dict:
+    out = {"wall_s": wall, "requests": len(results), "throughput_rps": len(results) / wall if wall else 0.0}
+    by_kind = {}
+    for kind, latency, status, size in results:
+        by_kind.setdefault(kind, []).append((latency, status, size))
+    out["endpoints"] = {}
+    for kind, rows in by_kind.items():
+        lat = sorted(r[0] for r in rows)
+        out["endpoints"][kind] = {
+            "count": len(rows),
+            "errors": sum(1 for r in rows if r[1] != 200),
+            "p50_ms": percentile(lat, 0.50) * 1000,
+            "p95_ms": percentile(lat, 0.95) * 1000,
+            "p99_ms": percentile(lat, 0.99) * 1000,
+            "max_ms": lat[-1] * 1000,
+            "avg_bytes": sum(r[2] for r in rows) / len(rows),
+        }
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="报告接口离线压测")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--mix", default="calculate=6,report_word=3,report_pdf=1")
+    parser.add_argument("--attachments", default="layout,product,finance", help="报告附件（逗号分隔，可为空）")
+    parser.add_argument("--layout-kb", type=int, default=300, help="布局图 PNG 大小（KB），0=不带布局图")
+    parser.add_argument("--product-images", type=int, default=0, help="临时产品图片数量（覆盖 assets/product）")
+    parser.add_argument("--product-kb", type=int, default=500, help="每张产品图片大小（KB）")
+    parser.add_argument("--soffice-latency", type=float, default=1.0, help="假 soffice 转换耗时（秒）")
+    parser.add_argument("--soffice-jitter", type=float, default=0.2)
+    parser.add_argument("--soffice-fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    work_dir = Path(tempfile.mkdtemp(prefix="trucksite_loadtest_"))
+    bin_dir = work_dir / "bin"
+    tmp_dir = work_dir / "tmp"
+    bin_dir.mkdir()
+    tmp_dir.mkdir()
+
+    try:
+        soffice = bin_dir / "soffice"
+        soffice.write_text(FAKE_SOFFICE.format(
+            python=sys.executable,
+            latency=args.soffice_latency,
+            jitter=args.soffice_jitter,
+            fail_rate=args.soffice_fail_rate,
+        ))
+        soffice.chmod(0o755)
+
+        env = dict(os.environ)
+        env["PATH"] = f"{bin_dir}{os.pathsep}{env.get('PATH', '')}"
+        env["TMPDIR"] = str(tmp_dir)
+        env.setdefault("TRUCKSITE_DB_PATH", str(work_dir / "loadtest.sqlite3"))
+
+        product_dir = None
+        if args.product_images > 0:
+            product_dir = work_dir / "product"
+            product_dir.mkdir()
+            for i in range(args.product_images):
+                (product_dir / f"product_{i:02d}.png").write_bytes(make_png(args.product_kb * 1024, seed=i))
+
+        layout_url = ""
+        if args.layout_kb > 0:
+            layout_url = "data:image/png;base64," + base64.b64encode(make_png(args.layout_kb * 1024)).decode()
+
+        attachments = [a.strip() for a in args.attachments.split(",") if a.strip()]
+        mix = parse_mix(args.mix)
+        names = [m[0] for m in mix]
+        weights = [m[1] for m in mix]
+        jobs = []
+        for _ in range(args.requests):
+            kind = rng.choices(names, weights=weights)[0]
+            body = json.dumps(make_payload(kind, layout_url, attachments, rng), ensure_ascii=False).encode()
+            jobs.append((kind, body))
+
+        sampler = Sampler(tmp_dir)
+        if args.mode == "inprocess":
+            os.environ.update({k: env[k] for k in ("PATH", "TMPDIR", "TRUCKSITE_DB_PATH")})
+            tempfile.tempdir = str(tmp_dir)
+            if product_dir is not None:
+                sys.path.insert(0, str(ROOT_DIR))
+                import app.main as main_module
+                main_module.PRODUCT_ASSETS_DIR = product_dir
+            sampler.start()
+            t0 = time.perf_counter()
+            results = asyncio.run(run_inprocess(jobs, args.concurrency))
+            wall = time.perf_counter() - t0
+            sampler.stop()
+            peak_rss_kb = rss_peak_kb()
+        else:
+            if product_dir is not None:
+                print("提示：uvicorn 模式下 --product-images 不生效（使用 assets/product）", file=sys.stderr)
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=str(ROOT_DIR),
+                env=env,
+                stdout=subprocess.DEVNULL,
+            )
+            try:
+                wait_port(port)
+                sampler.start()
+                t0 = time.perf_counter()
+                results = run_http(jobs, args.concurrency, port)
+                wall = time.perf_counter() - t0
+                sampler.stop()
+                peak_rss_kb = rss_peak_kb(server.pid)
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+
+        report = summarize(results, wall)
+        report.update({
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "peak_rss_mb": peak_rss_kb / 1024,
+            "tmp_growth_peak_mb": (sampler.peak - sampler.baseline) / 1024 / 1024,
+            "tmp_growth_final_mb": (sampler.final - sampler.baseline) / 1024 / 1024,
+        })
+
+        if args.json:
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            print(f"模式={report['mode']} 并发={report['concurrency']} 请求={report['requests']} "
+                  f"耗时={report['wall_s']:.2f}s 吞吐={report['throughput_rps']:.2f} req/s")
+            print(f"{'接口':<14}{'次数':>6}{'错误':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+            for kind, m in report["endpoints"].items():
+                print(f"{kind:<14}{m['count']:>6}{m['errors']:>6}{m['p50_ms']:>10.1f}{m['p95_ms']:>10.1f}"
+                      f"{m['p99_ms']:>10.1f}{m['max_ms']:>10.1f}")
+            print(f"峰值RSS={report['peak_rss_mb']:.1f}MB 临时目录峰值增长={report['tmp_growth_peak_mb']:.1f}MB "
+                  f"结束时残留={report['tmp_growth_final_mb']:.1f}MB")
+        return report
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()